@@ -0,0 +1,187 @@
+import multiprocessing
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from xlm.components.retriever.corpus_store import CorpusStore
+from xlm.components.retriever.ivf_index import IVFIndex
+from xlm.components.retriever.quantized_index import QuantizedIndex
+from xlm.components.retriever.sbert_retriever import SBERTRetriever
+from xlm.utils.vectors import normalize_rows
+
+
+def sample_embeddings(
+    topics: np.ndarray, num_embeddings: int, rng: np.random.Generator
+) -> np.ndarray:
+    # embeddings scattered around topics resemble real ones more than pure noise, the
+    # noise is large enough that neighbours often belong to other topics
+    embeddings = topics[rng.integers(0, len(topics), num_embeddings)]
+    return normalize_rows(embeddings + 1.5 * rng.standard_normal(embeddings.shape))
+
+
+def get_ids(results: List[List[dict]]) -> List[List[int]]:
+    return [[hit["corpus_id"] for hit in hits] for hits in results]
+
+
+def recall_at_k(expected: List[List[int]], found: List[List[int]]) -> float:
+    return float(
+        np.mean(
+            [
+                len(set(expected_ids) & set(found_ids)) / len(expected_ids)
+                for expected_ids, found_ids in zip(expected, found)
+            ]
+        )
+    )
+
+
+def benchmark(retriever: SBERTRetriever, queries: np.ndarray, top_k: int):
+    start = time.perf_counter()
+    results = [
+        retriever.search(query_embeddings=query, top_k=top_k)[0] for query in queries
+    ]
+    latency = (time.perf_counter() - start) / len(queries)
+    return get_ids(results), latency
+
+
+def resident_megabytes() -> Tuple[float, float]:
+    """
+    Private and file-backed resident memory of this process, read from /proc, so
+    Linux only. Pages of a memory-mapped corpus store are file-backed: they are
+    shared with the page cache and dropped by the kernel under memory pressure.
+    """
+    fields = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            fields[name] = value
+    return int(fields["RssAnon"].split()[0]) / 1024, int(
+        fields["RssFile"].split()[0]
+    ) / 1024
+
+
+def run_configuration(
+    store_path: str,
+    index_path: Optional[str],
+    num_candidates: Optional[int],
+    in_memory: bool,
+    queries: np.ndarray,
+    top_k: int,
+) -> Tuple[List[List[int]], float, float, float]:
+    # runs in a fresh process, so that only the memory of this configuration counts
+    private_start, mapped_start = resident_megabytes()
+    corpus_store = CorpusStore(store_path)
+    if in_memory:
+        retriever = SBERTRetriever(
+            encoder=None,
+            corpus_documents=corpus_store.documents,
+            corpus_embeddings=np.array(corpus_store.embeddings),
+        )
+    else:
+        # a saved index is used as is, the float vectors are only read for the
+        # candidates that are re-ranked
+        retriever = SBERTRetriever(
+            encoder=None,
+            corpus_store=corpus_store,
+            index=None if index_path is None else QuantizedIndex.load(index_path),
+            num_candidates=num_candidates,
+        )
+    found, latency = benchmark(retriever, queries, top_k)
+    private_end, mapped_end = resident_megabytes()
+    return found, latency, private_end - private_start, mapped_end - mapped_start
+
+
+def run_in_process(**kwargs) -> Tuple[List[List[int]], float, float, float]:
+    with ProcessPoolExecutor(
+        max_workers=1, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        return executor.submit(run_configuration, **kwargs).result()
+
+
+if __name__ == "__main__":
+    num_documents = 200000
+    num_topics = 1000
+    dimension = 384
+    num_queries = 200
+    top_k = 10
+
+    rng = np.random.default_rng(0)
+    topics = rng.standard_normal((num_topics, dimension))
+    corpus_embeddings = sample_embeddings(topics, num_documents, rng)
+    queries = sample_embeddings(topics, num_queries, rng)
+    corpus_documents = [f"document {idx}" for idx in range(num_documents)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        store_path = f"{directory}/store"
+        CorpusStore.create(
+            path=store_path,
+            documents=corpus_documents,
+            embeddings=corpus_embeddings,
+            model_name="synthetic",
+        )
+        index_paths = {}
+        for quantization in ["int8", "binary"]:
+            index = QuantizedIndex(quantization=quantization)
+            index.build(corpus_embeddings)
+            index_paths[quantization] = f"{directory}/{quantization}.npz"
+            index.save(index_paths[quantization])
+            print(f"{quantization} codes: {index.nbytes / 2**20:.1f}MB")
+
+        # resident memory grown while loading and searching: private memory is held by
+        # the process, mapped memory are page cache pages of the corpus store, which
+        # the kernel also maps around every row that is read and can drop at any time
+        expected = None
+        for name, quantization, num_candidates, in_memory in [
+            ("float in memory", None, None, True),
+            ("float mapped", None, None, False),
+            ("int8", "int8", top_k, False),
+            ("int8", "int8", 4 * top_k, False),
+            ("int8", "int8", 10 * top_k, False),
+            ("binary", "binary", 10 * top_k, False),
+            ("binary", "binary", 50 * top_k, False),
+            ("binary", "binary", 200 * top_k, False),
+        ]:
+            found, latency, private, mapped = run_in_process(
+                store_path=store_path,
+                index_path=index_paths.get(quantization),
+                num_candidates=num_candidates,
+                in_memory=in_memory,
+                queries=queries,
+                top_k=top_k,
+            )
+            expected = expected or found
+            candidates = (
+                "" if num_candidates is None else f" candidates={num_candidates}"
+            )
+            print(
+                f"{name}{candidates}: "
+                f"recall@{top_k}={recall_at_k(expected, found):.3f} "
+                f"latency={latency * 1000:.2f}ms "
+                f"private={private:.1f}MB mapped={mapped:.1f}MB"
+            )
+
+    for name, index, num_candidates in [
+        ("ivf", IVFIndex(), None),
+        ("ivf-pq", IVFIndex(num_subquantizers=48), 20 * top_k),
+    ]:
+        start = time.perf_counter()
+        retriever = SBERTRetriever(
+            encoder=None,
+            corpus_documents=corpus_documents,
+            corpus_embeddings=corpus_embeddings,
+            index=index,
+            num_candidates=num_candidates,
+        )
+        print(
+            f"{name}: built {index.num_lists} lists in {time.perf_counter() - start:.1f}s"
+        )
+        for nprobe in [1, 4, 16, 64]:
+            index.nprobe = nprobe
+            found, latency = benchmark(retriever, queries, top_k)
+            print(
+                f"{name} nprobe={nprobe}: "
+                f"recall@{top_k}={recall_at_k(expected, found):.3f} "
+                f"latency={latency * 1000:.2f}ms"
+            )
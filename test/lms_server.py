@@ -0,0 +1,83 @@
+import gzip
+import hashlib
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+
+def fake_embedding(text: str, dimension: int) -> np.ndarray:
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    return np.random.default_rng(seed).standard_normal(dimension).astype(np.float32)
+
+
+class LMSRequestHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in for the Language Model Service. `/vectorize` returns deterministic
+    pseudo-random embeddings, as JSON or as raw float32 when asked for
+    `application/octet-stream`; `/generate` echoes every prompt in upper case.
+    """
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        payload = json.loads(body)
+        self.server.requests.append((url.path, params, payload))
+
+        if url.path == "/vectorize":
+            embeddings = np.stack(
+                [fake_embedding(text, self.server.dimension) for text in payload]
+            )
+            if self.headers.get("Accept") == "application/octet-stream":
+                self.__respond(
+                    embeddings.astype("<f4").tobytes(), "application/octet-stream"
+                )
+            else:
+                self.__respond_json(embeddings.tolist())
+        elif url.path == "/generate":
+            self.__respond_json([text.upper() for text in payload])
+        else:
+            self.send_error(404)
+
+    def __respond_json(self, result):
+        self.__respond(json.dumps(result).encode("utf-8"), "application/json")
+
+    def __respond(self, content: bytes, content_type: str):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LMSServer:
+    def __init__(self, dimension: int = 8):
+        self.__server = ThreadingHTTPServer(("127.0.0.1", 0), LMSRequestHandler)
+        self.__server.dimension = dimension
+        self.__server.requests = []
+        self.__thread = Thread(target=self.__server.serve_forever, daemon=True)
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self.__server.server_address
+        return f"http://{host}:{port}"
+
+    @property
+    def requests(self) -> list:
+        return self.__server.requests
+
+    def __enter__(self) -> "LMSServer":
+        self.__thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.__server.shutdown()
+        self.__server.server_close()
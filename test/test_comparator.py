@@ -8,6 +8,7 @@ from xlm.modules.comparator.n_gram_overlap_comparator import NGramOverlapCompara
 from xlm.components.encoder.encoder import Encoder
 import pytest
 import numpy as np
+from test.lms_server import fake_embedding
 from test.utils import random_vector
 
 
@@ -39,6 +40,8 @@ def encoder():
     emb_a = random_vector(seed=42, dimension=dimension)
     emb_b = random_vector(seed=24, dimension=dimension)
     encoder.encode.return_value = [emb_a, emb_b]
+    encoder.encode_array = MagicMock()
+    encoder.encode_array.return_value = np.asarray([emb_a, emb_b], dtype=np.float32)
     return encoder
 
 
@@ -83,3 +86,21 @@ def test_n_gram_overlap_comparator(n_gram_overlap_comparator, reference_text, te
     assert isinstance(result, list)
     assert result[0] >= 0
     assert np.round(result[0], 4) == 0.6667
+
+
+def test_embedding_comparator_compare_batch():
+    encoder = MagicMock(spec=Encoder)
+    encoder.encode_array.side_effect = lambda texts: np.stack(
+        [fake_embedding(text, 8) for text in texts]
+    )
+    comparator = EmbeddingComparator(encoder)
+    reference_texts = ["I am a big fan", "hello"]
+    texts = [["I am a tennis fan", "I am a fan", "big fan"], []]
+
+    results = comparator.compare_batch(reference_texts=reference_texts, texts=texts)
+
+    assert encoder.encode_array.call_count == 1
+    assert results[1] == []
+    np.testing.assert_allclose(
+        results[0], comparator.compare(reference_texts[0], texts[0])
+    )
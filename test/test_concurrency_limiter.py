@@ -0,0 +1,88 @@
+import asyncio
+import threading
+import time
+from unittest.mock import MagicMock
+
+from requests import Session
+
+from xlm.components.client.concurrency_limiter import AdaptiveConcurrencyLimiter
+from xlm.components.client.lms_client import LMSClient
+
+
+def complete(limiter, latency, overloaded=False):
+    limiter.acquire()
+    limiter.release(start=time.monotonic() - latency, overloaded=overloaded)
+
+
+def test_limiter_grows_while_latency_is_flat():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=4)
+    for _ in range(20):
+        complete(limiter, latency=0.1)
+    assert limiter.limit == 4
+
+
+def test_limiter_backs_off_once_per_window():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=8)
+    starts = [limiter.acquire() for _ in range(2)]
+    for start in starts:
+        limiter.release(start=start, overloaded=True)
+    assert limiter.limit == 4
+
+    complete(limiter, latency=0, overloaded=True)
+    assert limiter.limit == 2
+
+
+def test_limiter_backs_off_on_latency_spike():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=8)
+    complete(limiter, latency=0.1)
+    complete(limiter, latency=0.1)
+    for _ in range(5):
+        complete(limiter, latency=2.0)
+    assert limiter.limit < 8
+
+
+def test_limiter_queues_requests_over_the_limit():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=1)
+    start = limiter.acquire()
+    acquired = threading.Event()
+    thread = threading.Thread(target=lambda: limiter.acquire() and acquired.set())
+    thread.start()
+
+    while limiter.queue_depth < 1:
+        time.sleep(0.01)
+    assert not acquired.is_set()
+
+    limiter.release(start=start)
+    thread.join(timeout=5)
+    assert acquired.is_set()
+    assert limiter.get_stats()["in_flight"] == 1
+
+
+def test_limiter_bounds_coroutines():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=2)
+    in_flight = []
+
+    async def request():
+        start = await limiter.aacquire()
+        in_flight.append(limiter.in_flight)
+        await asyncio.sleep(0.01)
+        limiter.release(start=start)
+
+    async def run():
+        await asyncio.gather(*[request() for _ in range(10)])
+
+    asyncio.run(run())
+    assert len(in_flight) == 10
+    assert max(in_flight) <= 2
+    assert limiter.in_flight == 0
+
+
+def test_lms_client_backs_off_on_overloaded_lms():
+    session = MagicMock(spec=Session)
+    session.post.return_value.status_code = 503
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=8)
+    client = LMSClient(session=session, concurrency_limiter=limiter)
+
+    client.post(url="http://lms/generate", json=["hi"])
+    assert limiter.limit == 4
+    assert limiter.in_flight == 0
@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from xlm.components.encoder.encoder import Encoder
+from xlm.components.retriever.corpus_ingest import CorpusIngester, split_passages
+from xlm.components.retriever.corpus_store import CorpusStore
+from test.lms_server import LMSServer, fake_embedding
+
+
+@pytest.fixture()
+def lms_server():
+    with LMSServer(dimension=16) as server:
+        yield server
+
+
+@pytest.fixture()
+def encoder(lms_server):
+    return Encoder(model_name="sentence-transformers", endpoint=lms_server.endpoint)
+
+
+@pytest.fixture()
+def data_path(tmp_path):
+    lines = [
+        f"line {idx} " + " ".join(f"w{idx}_{t}" for t in range(idx))
+        for idx in range(30)
+    ]
+    lines += ["", "line 3 w3_0 w3_1 w3_2", "  "]
+    path = tmp_path / "data.txt"
+    path.write_text("\n".join(lines), encoding="utf-8")
+    return str(path)
+
+
+def test_split_passages():
+    text = " ".join(str(idx) for idx in range(10))
+
+    assert split_passages(text, max_tokens=20, overlap=5) == [text]
+    assert split_passages("   ", max_tokens=4) == []
+    assert split_passages(text, max_tokens=4, overlap=1) == [
+        "0 1 2 3",
+        "3 4 5 6",
+        "6 7 8 9",
+    ]
+    with pytest.raises(ValueError):
+        split_passages(text, max_tokens=4, overlap=4)
+
+
+def test_corpus_ingester_ingest(encoder, data_path, tmp_path):
+    reports = []
+    ingester = CorpusIngester(
+        encoder=encoder,
+        max_tokens=8,
+        overlap=2,
+        batch_size=4,
+        num_workers=2,
+        report_interval=0,
+        progress_callback=lambda progress: reports.append(progress.model_copy()),
+    )
+    expected_passages = ingester.read_passages(data_path=data_path)
+
+    store = ingester.ingest(data_path=data_path, store_path=str(tmp_path / "store"))
+
+    assert list(store.documents) == expected_passages
+    assert len(set(expected_passages)) == len(expected_passages)
+    assert all(len(passage.split()) <= 8 for passage in expected_passages)
+    expected_embeddings = np.stack(
+        [fake_embedding(passage, 16) for passage in expected_passages]
+    )
+    expected_embeddings /= np.linalg.norm(expected_embeddings, axis=1, keepdims=True)
+    np.testing.assert_allclose(store.embeddings, expected_embeddings, rtol=1e-5)
+    assert store.matches(
+        model_name=encoder.model_name,
+        source_fingerprint=ingester.fingerprint(data_path),
+    )
+
+    assert reports[-1].num_passages == len(expected_passages)
+    assert reports[-1].num_duplicates == 1
+    assert reports[-1].num_bytes_read == reports[-1].total_bytes
+    assert [report.num_passages for report in reports] == sorted(
+        report.num_passages for report in reports
+    )
+
+
+def test_corpus_ingester_keeps_store_on_failure(encoder, data_path, tmp_path):
+    store_path = str(tmp_path / "store")
+    CorpusStore.create(
+        path=store_path,
+        documents=["old"],
+        embeddings=[[1.0, 0.0]],
+        model_name="old",
+    )
+
+    def fail(texts):
+        raise RuntimeError("LMS is down")
+
+    encoder.encode_array = fail
+    ingester = CorpusIngester(encoder=encoder, progress_callback=None)
+    with pytest.raises(RuntimeError):
+        ingester.ingest(data_path=data_path, store_path=store_path)
+
+    assert list(CorpusStore(store_path).documents) == ["old"]
@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+
+from xlm.components.encoder.encoder import Encoder
+from xlm.components.retriever.corpus_store import CorpusStore, CorpusStoreWriter
+from xlm.components.retriever.sbert_retriever import SBERTRetriever
+from xlm.registry.retriever import load_retriever
+from test.lms_server import LMSServer
+
+
+@pytest.fixture()
+def documents():
+    return ["first document", "zweites Dokument mit Ümlauten", "", "🌍 last one"]
+
+
+@pytest.fixture()
+def embeddings():
+    return np.random.default_rng(0).standard_normal((4, 8))
+
+
+def test_corpus_store_round_trip(tmp_path, documents, embeddings):
+    path = str(tmp_path / "store")
+    CorpusStore.create(
+        path=path, documents=documents, embeddings=embeddings, model_name="sbert"
+    )
+
+    store = CorpusStore(path)
+    assert len(store) == 4
+    assert list(store.documents) == documents
+    assert store.documents[-1] == documents[-1]
+    assert store.documents[1:3] == documents[1:3]
+    assert isinstance(store.embeddings, np.memmap)
+    assert not store.embeddings.flags["WRITEABLE"]
+    np.testing.assert_allclose(
+        store.embeddings,
+        embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True),
+        rtol=1e-6,
+    )
+    assert store.matches(model_name="sbert")
+    assert not store.matches(model_name="other")
+
+
+def test_corpus_store_writer_replaces_store_on_close(tmp_path, documents, embeddings):
+    path = str(tmp_path / "store")
+    CorpusStore.create(
+        path=path, documents=documents, embeddings=embeddings, model_name="sbert"
+    )
+
+    with pytest.raises(RuntimeError):
+        with CorpusStoreWriter(path=path, model_name="sbert") as writer:
+            writer.add(documents=documents[:2], embeddings=embeddings[:2])
+            raise RuntimeError("encoding failed")
+    assert len(CorpusStore(path)) == 4
+
+    with CorpusStoreWriter(path=path, model_name="sbert") as writer:
+        writer.add(documents=documents[:2], embeddings=embeddings[:2])
+        writer.add(documents=documents[2:3], embeddings=embeddings[2:3])
+    assert list(CorpusStore(path).documents) == documents[:3]
+
+
+def test_retriever_from_corpus_store(tmp_path, documents, embeddings):
+    store = CorpusStore.create(
+        path=str(tmp_path / "store"),
+        documents=documents,
+        embeddings=embeddings,
+        model_name="sbert",
+    )
+    retriever = SBERTRetriever.from_corpus_store(
+        encoder=Encoder(model_name="sbert"), corpus_store=store
+    )
+    assert retriever.corpus_embeddings is store.embeddings
+    hits = retriever.search(query_embeddings=embeddings[1], top_k=1)
+    assert hits[0][0]["corpus_id"] == 1
+
+    with pytest.raises(ValueError):
+        SBERTRetriever.from_corpus_store(
+            encoder=Encoder(model_name="other"), corpus_store=store
+        )
+
+
+def test_load_retriever_reuses_corpus_store(tmp_path, monkeypatch):
+    data_path = tmp_path / "data.txt"
+    data_path.write_text("alpha\n\nbeta\ngamma\n", encoding="utf-8")
+    store_path = str(tmp_path / "store")
+
+    with LMSServer() as server:
+
+        def load(rebuild: bool = False):
+            return load_retriever(
+                encoder_model_name="sentence-transformers",
+                lms_endpoint=server.endpoint,
+                data_path=str(data_path),
+                corpus_store_path=store_path,
+                rebuild=rebuild,
+            )
+
+        retriever = load()
+        num_requests = len(server.requests)
+        assert num_requests > 0
+        assert list(retriever.corpus_documents) == ["alpha", "beta", "gamma"]
+
+        # a warm start only compares the size and modification time of the source
+        with monkeypatch.context() as patch:
+            patch.setattr(
+                "xlm.components.retriever.corpus_ingest.fingerprint_file",
+                lambda path: pytest.fail("the source was hashed"),
+            )
+            reloaded_retriever = load()
+        assert len(server.requests) == num_requests
+        np.testing.assert_array_equal(
+            reloaded_retriever.corpus_embeddings, retriever.corpus_embeddings
+        )
+
+        assert list(load(rebuild=True).corpus_documents) == ["alpha", "beta", "gamma"]
+        assert len(server.requests) > num_requests
+        num_requests = len(server.requests)
+
+        data_path.write_text("alpha\ndelta\n", encoding="utf-8")
+        assert list(load().corpus_documents) == ["alpha", "delta"]
+        assert len(server.requests) > num_requests
@@ -1,8 +1,11 @@
+import asyncio
 from unittest.mock import MagicMock
 import pytest
 from requests import Session
 import numpy as np
+from xlm.components.encoder.embedding_cache import EmbeddingCache
 from xlm.components.encoder.encoder import Encoder
+from test.lms_server import LMSServer, fake_embedding
 from test.utils import random_vector
 
 
@@ -39,3 +42,118 @@ def test_encoder(encoder, texts):
     assert isinstance(encoded_text[1][0], np.float64)
     assert len(encoded_text) == len(texts)
     assert len(encoded_text[0]) == len(encoded_text[1]) == 384
+
+
+def echo_lengths(url, params, json, **kwargs):
+    response = MagicMock()
+    response.status_code = 200
+    response.json.return_value = [[float(len(text))] for text in json]
+    return response
+
+
+@pytest.fixture()
+def echo_session():
+    session = MagicMock(spec=Session)
+    session.post = MagicMock(side_effect=echo_lengths)
+    return session
+
+
+@pytest.mark.parametrize("num_threads", [1, 4])
+def test_encoder_batches_keep_input_order(echo_session, num_threads):
+    encoder = Encoder(
+        model_name="sentence-transformers",
+        endpoint="",
+        session=echo_session,
+        max_batch_size=2,
+        num_threads=num_threads,
+    )
+    texts = ["a b c d", "a", "a b c", "a b", "a b c d e"]
+    encoded_text = encoder.encode(texts)
+    assert encoded_text == [[float(len(text))] for text in texts]
+    assert echo_session.post.call_count == 3
+
+
+def test_encoder_batches_by_tokens(echo_session):
+    encoder = Encoder(
+        model_name="sentence-transformers",
+        endpoint="",
+        session=echo_session,
+        max_tokens_per_batch=4,
+    )
+    texts = ["a b c d", "a", "a", "a b"]
+    encoded_text = encoder.encode(texts)
+    assert encoded_text == [[float(len(text))] for text in texts]
+    sent_batches = [call.kwargs["json"] for call in echo_session.post.call_args_list]
+    assert sorted(map(len, sent_batches)) == [1, 1, 2]
+
+
+def test_encoder_cache_only_sends_misses(echo_session, tmp_path):
+    cache_path = str(tmp_path / "embeddings.sqlite")
+    encoder = Encoder(
+        model_name="sentence-transformers",
+        endpoint="",
+        session=echo_session,
+        cache=EmbeddingCache(path=cache_path),
+    )
+    assert encoder.encode(["a", "bb", "a"]) == [[1.0], [2.0], [1.0]]
+    assert echo_session.post.call_args.kwargs["json"] == ["a", "bb"]
+
+    assert encoder.encode(["bb", "ccc"]) == [[2.0], [3.0]]
+    assert echo_session.post.call_args.kwargs["json"] == ["ccc"]
+    assert encoder.cache.stats.hits == 1
+    assert encoder.cache.stats.misses == 3
+
+    restarted_encoder = Encoder(
+        model_name="sentence-transformers",
+        endpoint="",
+        session=echo_session,
+        cache=EmbeddingCache(path=cache_path),
+    )
+    assert restarted_encoder.encode(["a", "bb", "ccc"]) == [[1.0], [2.0], [3.0]]
+    assert echo_session.post.call_count == 2
+    assert restarted_encoder.cache.stats.hit_rate == 1.0
+
+
+@pytest.fixture()
+def lms_server():
+    with LMSServer(dimension=8) as server:
+        yield server
+
+
+@pytest.mark.parametrize("binary_transport", [False, True])
+@pytest.mark.parametrize("compress_requests", [False, True])
+def test_encoder_transport(lms_server, texts, binary_transport, compress_requests):
+    encoder = Encoder(
+        model_name="sentence-transformers",
+        endpoint=lms_server.endpoint,
+        session=Session(),
+        binary_transport=binary_transport,
+        compress_requests=compress_requests,
+    )
+    embeddings = encoder.encode_array(texts)
+    assert embeddings.dtype == np.float32
+    assert embeddings.flags["C_CONTIGUOUS"]
+    assert embeddings.shape == (len(texts), 8)
+    np.testing.assert_array_equal(embeddings[1], fake_embedding(texts[1], 8))
+    assert lms_server.requests[-1][2] == texts
+    assert encoder.encode(texts) == embeddings.tolist()
+
+
+def test_encoder_aencode(lms_server, texts):
+    encoder = Encoder(
+        model_name="sentence-transformers",
+        endpoint=lms_server.endpoint,
+        max_batch_size=1,
+        binary_transport=True,
+    )
+
+    async def run():
+        embeddings = await encoder.aencode_array(texts + texts)
+        await encoder.aclose()
+        return embeddings
+
+    embeddings = asyncio.run(run())
+    assert embeddings.shape == (2 * len(texts), 8)
+    np.testing.assert_array_equal(embeddings[2], fake_embedding(texts[0], 8))
+    # the repeated texts are in flight at the same time and share one request each
+    assert len(lms_server.requests) == len(texts)
@@ -0,0 +1,102 @@
+import asyncio
+import socket
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from xlm.components.client.endpoint_pool import EndpointPool
+from xlm.components.client.lms_client import LMSClient
+from xlm.components.generator.llm_generator import LLMGenerator
+from test.lms_server import LMSServer
+
+
+def ok(endpoint):
+    return MagicMock(status_code=200)
+
+
+def failing(endpoint):
+    return MagicMock(status_code=503)
+
+
+@pytest.fixture()
+def unused_endpoint():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        host, port = sock.getsockname()
+    return f"http://{host}:{port}"
+
+
+def test_endpoint_pool_routes_to_least_outstanding():
+    pool = EndpointPool(endpoints=["http://a", "http://b"])
+    first = pool.acquire()
+    second = pool.acquire()
+    assert {first, second} == {"http://a", "http://b"}
+    pool.release(endpoint=first, latency=0.1, success=True)
+    assert pool.acquire() == first
+
+
+def test_endpoint_pool_ejects_failing_endpoint():
+    pool = EndpointPool(endpoints=["http://a", "http://b"], max_failures=2)
+    for _ in range(2):
+        pool.release(
+            endpoint=pool.acquire(exclude={"http://b"}), latency=0.1, success=False
+        )
+
+    stats = {stat["endpoint"]: stat for stat in pool.get_stats()}
+    assert not stats["http://a"]["healthy"]
+    assert all(pool.acquire() == "http://b" for _ in range(3))
+
+
+def test_endpoint_pool_ejects_slow_endpoint():
+    pool = EndpointPool(endpoints=["http://a", "http://b"], min_samples=2)
+    for _ in range(2):
+        pool.release(
+            endpoint=pool.acquire(exclude={"http://b"}), latency=0.01, success=True
+        )
+    for _ in range(2):
+        pool.release(
+            endpoint=pool.acquire(exclude={"http://a"}), latency=1.0, success=True
+        )
+
+    stats = {stat["endpoint"]: stat for stat in pool.get_stats()}
+    assert stats["http://a"]["healthy"]
+    assert not stats["http://b"]["healthy"]
+
+
+def test_endpoint_pool_fails_over_to_other_endpoint():
+    pool = EndpointPool(endpoints=["http://a", "http://b"])
+    response = pool.request(
+        lambda endpoint: failing(endpoint) if endpoint == "http://a" else ok(endpoint)
+    )
+    assert response.status_code == 200
+    assert pool.request(failing).status_code == 503
+    assert sum(stat["num_failures"] for stat in pool.get_stats()) == 3
+
+
+def test_endpoint_pool_with_duplicate_endpoints():
+    pool = EndpointPool(endpoints=["http://a", "http://a/", "http://b", "http://a"])
+    assert pool.endpoints == ["http://a", "http://b"]
+
+    def raising(endpoint):
+        raise ConnectionError(endpoint)
+
+    # every url is tried once, then the last error is passed on
+    with pytest.raises(ConnectionError):
+        pool.request(raising)
+    with pytest.raises(ConnectionError):
+        asyncio.run(pool.arequest(AsyncMock(side_effect=raising)))
+    assert sum(stat["num_failures"] for stat in pool.get_stats()) == 4
+
+
+def test_generator_spreads_over_endpoints(unused_endpoint):
+    with LMSServer() as first, LMSServer() as second:
+        generator = LLMGenerator(
+            model_name="gpt-2",
+            endpoint=[first.endpoint, second.endpoint, unused_endpoint],
+            client=LMSClient(max_retries=0),
+            num_threads=4,
+        )
+        texts = [f"prompt {idx}" for idx in range(20)]
+        assert generator.generate(texts=texts) == [text.upper() for text in texts]
+        assert len(first.requests) > 0 and len(second.requests) > 0
+        assert len(first.requests) + len(second.requests) == len(texts)
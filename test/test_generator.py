@@ -1,8 +1,11 @@
+import asyncio
 import datetime
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock
 import pytest
 from requests import Session
 from xlm.components.generator.llm_generator import LLMGenerator
+from xlm.components.generator.response_cache import ResponseCache
+from test.lms_server import LMSServer
 
 
 @pytest.fixture
@@ -71,3 +74,193 @@ def test_llm_generator(llm_generator, texts):
     result = llm_generator.generate(texts=texts)
     assert isinstance(result, list)
     assert len(result) == len(texts)
+
+
+def test_llm_generator_agenerate():
+    texts = ["hi", "my name", "how are"]
+    with LMSServer() as server:
+        generator = LLMGenerator(
+            session=Session(), endpoint=server.endpoint, model_name="gpt-2"
+        )
+
+        async def run():
+            responses = await generator.agenerate(texts=texts)
+            await generator.aclose()
+            return responses
+
+        assert asyncio.run(run()) == ["HI", "MY NAME", "HOW ARE"]
+        assert server.requests[0][1]["split_lines"] == "True"
+
+
+@pytest.mark.parametrize("num_threads", [1, 4])
+def test_llm_generator_batched(num_threads):
+    texts = ["a", "b", "c", "d", "e"]
+    with LMSServer() as server:
+        generator = LLMGenerator(
+            session=Session(),
+            endpoint=server.endpoint,
+            model_name="gpt-2",
+            num_threads=num_threads,
+            batch_size=2,
+        )
+        assert generator.generate(texts=texts) == ["A", "B", "C", "D", "E"]
+        assert sorted(len(request[2]) for request in server.requests) == [1, 2, 2]
+
+
+def single_prompt_only(url, params, json, **kwargs):
+    response = MagicMock()
+    if len(json) > 1:
+        response.status_code = 422
+        response.json.return_value = {"detail": "only one prompt per request"}
+    else:
+        response.status_code = 200
+        response.json.return_value = [json[0].upper()]
+    return response
+
+
+def test_llm_generator_batched_fallback():
+    session = MagicMock(spec=Session)
+    session.post = MagicMock(side_effect=single_prompt_only)
+    generator = LLMGenerator(
+        session=session, endpoint="", model_name="gpt-2", batch_size=3
+    )
+    assert generator.generate(texts=["a", "b", "c"]) == ["A", "B", "C"]
+    assert session.post.call_count == 4
+
+
+def one_response_only(url, params, json, **kwargs):
+    # answers a batch with the response to its first prompt only
+    response = MagicMock()
+    response.status_code = 200
+    response.json.return_value = [json[0].upper()]
+    return response
+
+
+def test_llm_generator_batched_fallback_on_wrong_length(capsys):
+    session = MagicMock(spec=Session)
+    session.post = MagicMock(side_effect=one_response_only)
+    generator = LLMGenerator(
+        session=session, endpoint="", model_name="gpt-2", batch_size=3
+    )
+
+    assert generator.generate(texts=["a", "b", "c"]) == ["A", "B", "C"]
+    assert session.post.call_count == 4
+    assert "Expected 3 generated responses" in capsys.readouterr().out
+
+
+def test_llm_generator_abatched_fallback_on_wrong_length():
+    async def apost(url, params, json, **kwargs):
+        return one_response_only(url=url, params=params, json=json)
+
+    client = MagicMock()
+    client.apost = AsyncMock(side_effect=apost)
+    generator = LLMGenerator(
+        client=client, endpoint="", model_name="gpt-2", batch_size=3
+    )
+    assert asyncio.run(generator.agenerate(texts=["a", "b", "c"])) == ["A", "B", "C"]
+    assert client.apost.call_count == 4
+
+
+def test_llm_generator_batched_does_not_catch_other_errors():
+    session = MagicMock(spec=Session)
+    session.post = MagicMock(side_effect=ValueError("not a batch error"))
+    generator = LLMGenerator(
+        session=session, endpoint="", model_name="gpt-2", batch_size=3
+    )
+
+    with pytest.raises(ValueError, match="not a batch error"):
+        generator.generate(texts=["a", "b", "c"])
+    assert session.post.call_count == 1
+
+
+def test_llm_generator_abatched_fallback_on_timeout():
+    async def apost(url, params, json, **kwargs):
+        # a batch takes longer than the client timeout
+        if len(json) > 1:
+            raise asyncio.TimeoutError()
+        return single_prompt_only(url=url, params=params, json=json)
+
+    client = MagicMock()
+    client.apost = AsyncMock(side_effect=apost)
+    generator = LLMGenerator(
+        client=client, endpoint="", model_name="gpt-2", batch_size=3
+    )
+    assert asyncio.run(generator.agenerate(texts=["a", "b", "c"])) == ["A", "B", "C"]
+    assert client.apost.call_count == 4
+
+
+def test_llm_generator_cache(mock_session, tmp_path):
+    cache_path = str(tmp_path / "responses.sqlite")
+    generator = LLMGenerator(
+        session=mock_session,
+        endpoint="",
+        model_name="gpt-2",
+        num_threads=1,
+        cache=ResponseCache(path=cache_path),
+    )
+    generator.generate(texts=["hi", "hi", "ho"])
+    generator.generate(texts=["ho"])
+    assert mock_session.post.call_count == 2
+    assert generator.cache.stats.as_dict() == {
+        "hits": 1,
+        "misses": 2,
+        "hit_rate": 1 / 3,
+    }
+
+    restarted_generator = LLMGenerator(
+        session=mock_session,
+        endpoint="",
+        model_name="gpt-2",
+        cache=ResponseCache(path=cache_path),
+    )
+    assert restarted_generator.generate(texts=["hi"]) == ["Nope, never heard..."]
+    assert mock_session.post.call_count == 2
+
+    other_params_generator = LLMGenerator(
+        session=mock_session,
+        endpoint="",
+        model_name="gpt-2",
+        max_new_tokens=10,
+        cache=ResponseCache(path=cache_path),
+    )
+    other_params_generator.generate(texts=["hi"])
+    assert mock_session.post.call_count == 3
+
+
+def test_llm_generator_cache_bypassed_when_sampling(mock_session):
+    generator = LLMGenerator(
+        session=mock_session,
+        endpoint="",
+        model_name="gpt-2",
+        temperature=0.7,
+        cache=ResponseCache(),
+    )
+    generator.generate(texts=["hi"])
+    generator.generate(texts=["hi"])
+    assert mock_session.post.call_count == 2
+    assert len(generator.cache) == 0
+
+
+def upper_case(url, params, json, **kwargs):
+    response = MagicMock()
+    response.status_code = 200
+    response.json.return_value = [text.upper() for text in json]
+    return response
+
+
+@pytest.mark.parametrize("num_threads", [1, 4])
+@pytest.mark.parametrize("use_cache", [False, True])
+def test_llm_generator_deduplicates_prompts(num_threads, use_cache):
+    session = MagicMock(spec=Session)
+    session.post = MagicMock(side_effect=upper_case)
+    generator = LLMGenerator(
+        session=session,
+        endpoint="",
+        model_name="gpt-2",
+        num_threads=num_threads,
+        cache=ResponseCache() if use_cache else None,
+    )
+    texts = ["a", "b", "a", "c", "b", "a"]
+    assert generator.generate(texts=texts) == ["A", "B", "A", "C", "B", "A"]
+    assert session.post.call_count == 3
+    assert generator.num_saved_calls == 3
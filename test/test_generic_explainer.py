@@ -0,0 +1,388 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+from xlm.components.encoder.encoder import Encoder
+from xlm.components.generator.llm_generator import LLMGenerator
+from xlm.components.retriever.sbert_retriever import SBERTRetriever
+from xlm.dto.dto import ExplanationBudget, ExplanationGranularity
+from xlm.modules.comparator.embedding_comparator import EmbeddingComparator
+from xlm.modules.comparator.score_comaprator import ScoreComparator
+from xlm.modules.perturber.leave_one_out_perturber import LeaveOneOutPerturber
+from xlm.modules.tokenizer.tokenizer import Tokenizer
+from xlm.utils.categorizer import PercentileBasedCategorizer
+from xlm.utils.visualizer import Visualizer
+from test.lms_server import LMSServer
+
+
+class WhitespaceTokenizer(Tokenizer):
+    def tokenize(self, text: str, granularity: ExplanationGranularity) -> List[str]:
+        return text.split()
+
+
+@pytest.fixture()
+def lms_server():
+    with LMSServer(dimension=16) as server:
+        yield server
+
+
+@pytest.fixture()
+def retriever(lms_server):
+    encoder = Encoder(model_name="sentence-transformers", endpoint=lms_server.endpoint)
+    documents = [f"document number {idx}" for idx in range(10)]
+    return SBERTRetriever(encoder=encoder, corpus_documents=documents)
+
+
+@pytest.fixture()
+def retriever_explainer(retriever):
+    # the explainers load the spaCy models of their default tokenizer on import
+    from xlm.explainer.generic_retriever_explainer import GenericRetrieverExplainer
+
+    return GenericRetrieverExplainer(
+        perturber=LeaveOneOutPerturber(),
+        comparator=ScoreComparator(),
+        retriever=retriever,
+        tokenizer=WhitespaceTokenizer(),
+    )
+
+
+def test_retriever_explainer_keeps_corpus_and_aligns_scores(
+    retriever_explainer, retriever
+):
+    corpus_documents = list(retriever.corpus_documents)
+    user_input = "which document has number 3"
+    reference_text = "the third document has number 3"
+    (reference_score,) = retriever.score_documents(
+        text=user_input, documents=[reference_text]
+    )
+
+    explanation = retriever_explainer.explain(
+        user_input=user_input,
+        reference_text=reference_text,
+        reference_score=reference_score,
+        granularity=ExplanationGranularity.WORD_LEVEL,
+        do_normalize_comparator_scores=False,
+    )
+
+    assert list(retriever.corpus_documents) == corpus_documents
+    assert retriever.retrieve(text="document number 3", top_k=1) == [
+        "document number 3"
+    ]
+    for feature_importance in explanation.explanations:
+        perturbation = reference_text.replace(feature_importance.feature, "").strip()
+        (score,) = retriever.score_documents(text=user_input, documents=[perturbation])
+        assert feature_importance.score == pytest.approx(
+            1 - (reference_score - score), abs=1e-5
+        )
+
+
+@pytest.fixture()
+def generator_explainer(lms_server):
+    from xlm.explainer.generic_generator_explainer import GenericGeneratorExplainer
+
+    encoder = Encoder(model_name="sentence-transformers", endpoint=lms_server.endpoint)
+    return GenericGeneratorExplainer(
+        perturber=LeaveOneOutPerturber(),
+        comparator=EmbeddingComparator(encoder=encoder),
+        generator=LLMGenerator(model_name="gpt-2", endpoint=lms_server.endpoint),
+        tokenizer=WhitespaceTokenizer(),
+    )
+
+
+def test_generator_explainer_explain_batch(generator_explainer, lms_server):
+    user_inputs = ["first prompt about cats", "second prompt", ""]
+    reference_texts = [user_input.upper() for user_input in user_inputs]
+
+    num_requests = len(lms_server.requests)
+    explanations = generator_explainer.explain_batch(
+        user_inputs=user_inputs,
+        reference_texts=reference_texts,
+        granularity=ExplanationGranularity.WORD_LEVEL,
+    )
+    # the texts of all inputs are encoded with one request
+    vectorize_requests = [
+        path
+        for path, _, _ in lms_server.requests[num_requests:]
+        if path == "/vectorize"
+    ]
+    assert len(vectorize_requests) == 1
+
+    assert explanations[2].explanations == []
+    for user_input, reference_text, explanation in zip(
+        user_inputs[:2], reference_texts, explanations
+    ):
+        expected = generator_explainer.explain(
+            user_input=user_input,
+            reference_text=reference_text,
+            granularity=ExplanationGranularity.WORD_LEVEL,
+        )
+        assert explanation.input_text == user_input
+        assert [item.feature for item in explanation.explanations] == [
+            item.feature for item in expected.explanations
+        ]
+        assert [item.score for item in explanation.explanations] == pytest.approx(
+            [item.score for item in expected.explanations]
+        )
+
+
+def test_retriever_explainer_explain_batch(retriever_explainer, retriever):
+    user_inputs = ["which document has number 3", "document number 5"]
+    reference_texts = ["document number 3", "the fifth document, number 5"]
+    reference_scores = [
+        retriever.score_documents(text=user_input, documents=[reference_text])[0]
+        for user_input, reference_text in zip(user_inputs, reference_texts)
+    ]
+
+    explanations = retriever_explainer.explain_batch(
+        user_inputs=user_inputs,
+        reference_texts=reference_texts,
+        reference_scores=reference_scores,
+        granularity=ExplanationGranularity.WORD_LEVEL,
+    )
+
+    for user_input, reference_text, reference_score, explanation in zip(
+        user_inputs, reference_texts, reference_scores, explanations
+    ):
+        expected = retriever_explainer.explain(
+            user_input=user_input,
+            reference_text=reference_text,
+            reference_score=reference_score,
+            granularity=ExplanationGranularity.WORD_LEVEL,
+        )
+        assert [item.feature for item in explanation.explanations] == [
+            item.feature for item in expected.explanations
+        ]
+        assert [item.score for item in explanation.explanations] == pytest.approx(
+            [item.score for item in expected.explanations], abs=1e-5
+        )
+
+
+@pytest.mark.parametrize("do_normalize", [True, False])
+def test_generator_explainer_pipelined(generator_explainer, do_normalize):
+    user_input = "first prompt about some cats"
+    reference_text = "A RESPONSE ABOUT CATS"
+
+    explanations = [
+        generator_explainer.explain(
+            user_input=user_input,
+            reference_text=reference_text,
+            granularity=ExplanationGranularity.WORD_LEVEL,
+            do_normalize_comparator_scores=do_normalize,
+            pipelined=pipelined,
+        )
+        for pipelined in [False, True]
+    ]
+
+    expected, explanation = [
+        {item.feature: item.score for item in explanation.explanations}
+        for explanation in explanations
+    ]
+    assert set(explanation) == set(user_input.split())
+    assert explanation == pytest.approx(expected)
+
+
+def test_generator_explainer_explain_iter(generator_explainer):
+    user_input = "first prompt about some cats"
+    reference_text = "A RESPONSE ABOUT CATS"
+
+    explanations = list(
+        generator_explainer.explain_iter(
+            user_input=user_input,
+            reference_text=reference_text,
+            granularity=ExplanationGranularity.WORD_LEVEL,
+        )
+    )
+    expected = generator_explainer.explain(
+        user_input=user_input,
+        reference_text=reference_text,
+        granularity=ExplanationGranularity.WORD_LEVEL,
+    )
+
+    # one snapshot per scored feature, the last one with all features
+    assert len(explanations) == len(user_input.split())
+    assert [explanation.is_partial for explanation in explanations] == [True] * (
+        len(explanations) - 1
+    ) + [False]
+    for num_scored, explanation in enumerate(explanations, start=1):
+        assert len(explanation.explanations) == num_scored
+        assert explanation.input_text == user_input
+    assert {item.feature: item.score for item in explanations[-1].explanations} == (
+        pytest.approx({item.feature: item.score for item in expected.explanations})
+    )
+
+
+def test_explain_iter_without_features(generator_explainer):
+    explanations = list(
+        generator_explainer.explain_iter(
+            user_input="",
+            reference_text="A RESPONSE",
+            granularity=ExplanationGranularity.WORD_LEVEL,
+        )
+    )
+
+    assert len(explanations) == 1
+    assert explanations[0].explanations == []
+    assert not explanations[0].is_partial
+
+
+def test_explain_with_max_calls(generator_explainer, lms_server):
+    user_input = "first prompt about some cats"
+
+    num_requests = len(lms_server.requests)
+    explanation = generator_explainer.explain(
+        user_input=user_input,
+        reference_text="A RESPONSE ABOUT CATS",
+        granularity=ExplanationGranularity.WORD_LEVEL,
+        budget=ExplanationBudget(max_calls=2, patience=None),
+    )
+    generate_requests = [
+        path for path, _, _ in lms_server.requests[num_requests:] if path == "/generate"
+    ]
+
+    assert len(generate_requests) == 2
+    assert explanation.is_partial
+    assert {item.feature for item in explanation.explanations} == set(
+        user_input.split()
+    )
+    # the features shared with the reference come first and are the only ranked ones,
+    # the others follow without a score
+    assert [item.evaluated for item in explanation.explanations] == [True] * 2 + [
+        False
+    ] * 3
+    assert {item.feature for item in explanation.explanations[:2]} == {"about", "cats"}
+    assert all(item.score is not None for item in explanation.explanations[:2])
+    assert all(item.score is None for item in explanation.explanations[2:])
+
+    html = Visualizer().visualize(
+        segregator=PercentileBasedCategorizer(),
+        explanations=explanation,
+        output_from_explanations=user_input,
+        granularity=ExplanationGranularity.WORD_LEVEL,
+    )
+    assert html.count('title="not evaluated"') == 3
+    assert "not evaluated</span>" in html
+
+
+def test_explain_stops_when_ranking_is_stable(generator_explainer):
+    generator_explainer.comparator = MagicMock()
+    generator_explainer.comparator.compare.return_value = [0.5]
+
+    explanation = generator_explainer.explain(
+        user_input="one two three four five six",
+        reference_text="A RESPONSE",
+        granularity=ExplanationGranularity.WORD_LEVEL,
+        do_normalize_comparator_scores=False,
+        budget=ExplanationBudget(top_k=1, patience=2),
+    )
+
+    # the top feature is known after the first score and kept for two more
+    assert explanation.is_partial
+    assert sum(item.evaluated for item in explanation.explanations) == 3
+
+
+def test_explain_with_whole_budget(generator_explainer):
+    user_input = "first prompt about some cats"
+    reference_text = "A RESPONSE ABOUT CATS"
+
+    expected, explanation = [
+        generator_explainer.explain(
+            user_input=user_input,
+            reference_text=reference_text,
+            granularity=ExplanationGranularity.WORD_LEVEL,
+            budget=budget,
+        )
+        for budget in [None, ExplanationBudget(max_calls=10, patience=None)]
+    ]
+
+    assert not explanation.is_partial
+    assert all(item.evaluated for item in explanation.explanations)
+    assert {item.feature: item.score for item in explanation.explanations} == (
+        pytest.approx({item.feature: item.score for item in expected.explanations})
+    )
+
+
+def test_retriever_explainer_encodes_query_once(
+    retriever_explainer, retriever, lms_server
+):
+    user_input = "which document has number 3"
+    reference_text = "the third document has number 3"
+    (reference_score,) = retriever.score_documents(
+        text=user_input, documents=[reference_text]
+    )
+
+    num_requests = len(lms_server.requests)
+    explanation = retriever_explainer.explain(
+        user_input=user_input,
+        reference_text=reference_text,
+        reference_score=reference_score,
+        granularity=ExplanationGranularity.WORD_LEVEL,
+        pipelined=True,
+    )
+
+    # one request for the query, one for every perturbation
+    assert len(lms_server.requests) - num_requests == 1 + len(explanation.explanations)
+
+
+def test_retriever_explainer_encodes_queries_concurrently(retriever_explainer):
+    slow_query_started, slow_query_done = threading.Event(), threading.Event()
+
+    def encode_array(texts):
+        if texts == ["slow query"]:
+            slow_query_started.set()
+            slow_query_done.wait(timeout=10)
+        return np.ones((1, 4))
+
+    retriever = MagicMock()
+    retriever.encoder.encode_array = MagicMock(side_effect=encode_array)
+    retriever_explainer.retriever = retriever
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        slow_query = executor.submit(
+            retriever_explainer.get_post_perturbation_results,
+            input_text="slow query",
+            perturbations=["a"],
+        )
+        slow_query_started.wait(timeout=10)
+        # another query is not held up by the encoding of the first one
+        retriever_explainer.get_post_perturbation_results(
+            input_text="other query", perturbations=["a"]
+        )
+        assert not slow_query.done()
+        slow_query_done.set()
+        slow_query.result()
+
+    retriever_explainer.get_post_perturbation_results(
+        input_text="slow query", perturbations=["b"]
+    )
+    assert retriever.encoder.encode_array.call_count == 2
+
+
+def test_retriever_explainer_without_retrieved_documents(retriever_explainer):
+    retriever_explainer.retriever = MagicMock()
+    retriever_explainer.retriever.retrieve.return_value = [], []
+
+    with pytest.raises(ValueError, match="No document was retrieved"):
+        retriever_explainer.get_reference(input_text="unknown words")
+
+
+def test_generator_explainer_num_threads(lms_server):
+    from xlm.explainer.generic_generator_explainer import GenericGeneratorExplainer
+
+    def load(**kwargs):
+        return GenericGeneratorExplainer(
+            perturber=LeaveOneOutPerturber(),
+            comparator=ScoreComparator(),
+            generator=LLMGenerator(
+                model_name="gpt-2", endpoint=lms_server.endpoint, num_threads=32
+            ),
+            tokenizer=WhitespaceTokenizer(),
+            **kwargs,
+        )
+
+    # as many workers as the generator has threads, unless set explicitly
+    assert load().get_num_threads() == 32
+    assert load(num_threads=4).get_num_threads() == 4
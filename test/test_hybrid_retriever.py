@@ -0,0 +1,160 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from xlm.components.client.lms_client import LMSClient
+from xlm.components.encoder.encoder import Encoder
+from xlm.components.retriever.bm25_index import BM25Index
+from xlm.components.retriever.hybrid_retriever import HybridRetriever
+from test.lms_server import LMSServer
+
+
+@pytest.fixture
+def corpus_documents():
+    return [
+        "The cat sat on the mat.",
+        "Dogs are loyal animals.",
+        "A cat and a dog played in the garden.",
+        "Stock markets fell sharply today.",
+        "The weather is sunny and warm.",
+    ]
+
+
+@pytest.fixture()
+def lms_server():
+    with LMSServer(dimension=16) as server:
+        yield server
+
+
+@pytest.fixture()
+def encoder(lms_server):
+    return Encoder(model_name="sentence-transformers", endpoint=lms_server.endpoint)
+
+
+def test_bm25_index_ranks_matching_documents(corpus_documents):
+    index = BM25Index()
+    index.build(corpus_documents[:3])
+    index.add(corpus_documents[3:])
+
+    ids, scores = index.search(query="cat garden", top_k=10)
+
+    assert ids.tolist() == [2, 0]
+    assert scores[0] > scores[1] > 0
+    assert len(index.search(query="unknown words", top_k=10)[0]) == 0
+    assert index.search(query="markets", top_k=1)[0].tolist() == [3]
+
+
+def test_hybrid_retriever_without_encoder(corpus_documents):
+    retriever = HybridRetriever(encoder=None, corpus_documents=corpus_documents)
+
+    documents, scores = retriever.retrieve(
+        text="Where did the cat sit?", top_k=2, return_scores=True
+    )
+
+    assert documents[0] == "The cat sat on the mat."
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_hybrid_retriever_fuses_scores(encoder, corpus_documents):
+    retriever = HybridRetriever(
+        encoder=encoder, corpus_documents=corpus_documents, dense_weight=1.0
+    )
+
+    # only dense scores count, an exact match has cosine similarity 1
+    documents, scores = retriever.retrieve(
+        text="Dogs are loyal animals.", top_k=1, return_scores=True
+    )
+    assert documents == ["Dogs are loyal animals."]
+    assert scores[0] == pytest.approx(1.0, abs=1e-5)
+
+    # fewer lexical candidates than top_k, the whole corpus is scored
+    assert len(retriever.retrieve(text="sunny", top_k=3)) == 3
+    assert retriever.retrieve_batch(texts=["sunny", "cat"], top_k=2) == [
+        retriever.retrieve(text="sunny", top_k=2),
+        retriever.retrieve(text="cat", top_k=2),
+    ]
+
+
+def test_hybrid_retriever_falls_back_to_bm25(corpus_documents):
+    # nothing listens on port 9
+    encoder = Encoder(
+        model_name="sentence-transformers",
+        endpoint="http://127.0.0.1:9",
+        client=LMSClient(max_retries=0),
+    )
+    retriever = HybridRetriever(
+        encoder=encoder,
+        corpus_documents=corpus_documents,
+        corpus_embeddings=np.eye(len(corpus_documents), 16),
+    )
+
+    documents = retriever.retrieve(text="stock markets", top_k=1)
+
+    assert documents == ["Stock markets fell sharply today."]
+
+
+def test_bm25_index_scores_unindexed_documents(corpus_documents):
+    index = BM25Index()
+    index.build(corpus_documents)
+
+    ids, scores = index.search(query="cat garden", top_k=10)
+    document_scores = index.score_documents(
+        query="cat garden",
+        documents=[corpus_documents[idx] for idx in ids] + ["no match here"],
+    )
+
+    np.testing.assert_allclose(document_scores[:-1], scores, rtol=1e-5)
+    assert document_scores[-1] == 0
+
+
+@pytest.mark.parametrize("use_encoder", [True, False])
+def test_hybrid_retriever_scores_documents_like_retrieve(
+    encoder, corpus_documents, lms_server, use_encoder
+):
+    retriever = HybridRetriever(
+        encoder=encoder if use_encoder else None, corpus_documents=corpus_documents
+    )
+    documents, expected_scores = retriever.retrieve(
+        text="cat in the garden", top_k=3, return_scores=True
+    )
+
+    num_requests = len(lms_server.requests)
+    scores = retriever.score_documents(text="cat in the garden", documents=documents)
+
+    np.testing.assert_allclose(scores, expected_scores, rtol=1e-5)
+    # the query and the documents are encoded together
+    assert len(lms_server.requests) - num_requests == int(use_encoder)
+    assert retriever.corpus_documents == corpus_documents
+
+
+def test_bm25_index_merges_concurrent_first_searches(corpus_documents):
+    index = BM25Index()
+    index.build(corpus_documents)
+    expected = BM25Index()
+    expected.build(corpus_documents)
+    expected_ids, expected_scores = expected.search(query="cat garden", top_k=10)
+
+    # the first searches merge the pending postings, only one of them may do it
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(
+            executor.map(
+                lambda _: index.search(query="cat garden", top_k=10), range(32)
+            )
+        )
+
+    for ids, scores in results:
+        assert ids.tolist() == expected_ids.tolist()
+        np.testing.assert_allclose(scores, expected_scores)
+
+
+def test_hybrid_retriever_without_matching_terms(corpus_documents):
+    retriever = HybridRetriever(encoder=None, corpus_documents=corpus_documents)
+
+    documents, scores = retriever.retrieve(
+        text="unknown words", top_k=2, return_scores=True
+    )
+
+    assert documents == corpus_documents[:2]
+    assert scores == [0, 0]
+    assert len(retriever.retrieve(text="cat", top_k=10)) == len(corpus_documents)
@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+from xlm.components.retriever.ivf_index import IVFIndex
+from xlm.components.retriever.sbert_retriever import SBERTRetriever
+from xlm.utils.vectors import normalize_rows, top_k
+
+
+@pytest.fixture()
+def topics():
+    return np.random.default_rng(0).standard_normal((20, 16))
+
+
+def sample(topics, num_embeddings, seed):
+    rng = np.random.default_rng(seed)
+    embeddings = topics[rng.integers(0, len(topics), num_embeddings)]
+    return normalize_rows(embeddings + 0.3 * rng.standard_normal(embeddings.shape))
+
+
+@pytest.fixture()
+def corpus_embeddings(topics):
+    return sample(topics, 2000, seed=1)
+
+
+@pytest.fixture()
+def query_embeddings(topics):
+    return sample(topics, 20, seed=2)
+
+
+def recall(ids, expected_ids):
+    return np.mean([len(set(a) & set(b)) / len(b) for a, b in zip(ids, expected_ids)])
+
+
+@pytest.mark.parametrize("num_subquantizers", [None, 4])
+def test_ivf_index_recall(corpus_embeddings, query_embeddings, num_subquantizers):
+    index = IVFIndex(num_lists=20, nprobe=5, num_subquantizers=num_subquantizers)
+    index.build(corpus_embeddings)
+    assert len(index) == len(corpus_embeddings)
+
+    expected_ids, _ = top_k(query_embeddings @ corpus_embeddings.T, k=10)
+    ids, scores = index.search(query_embeddings, top_k=100)
+    assert ids.shape == scores.shape == (20, 100)
+    assert np.all(np.diff(scores, axis=1) <= 0)
+    assert recall(ids, expected_ids) > 0.9
+
+
+def test_ivf_index_pads_missing_hits(corpus_embeddings, query_embeddings):
+    index = IVFIndex(num_lists=2, nprobe=1)
+    index.build(corpus_embeddings[:10])
+    ids, scores = index.search(query_embeddings[:1], top_k=20)
+    assert (ids[0] == -1).sum() >= 10
+    assert np.all(np.isneginf(scores[0][ids[0] == -1]))
+
+
+def test_ivf_index_save_and_load(tmp_path, corpus_embeddings, query_embeddings):
+    for num_subquantizers in [None, 4]:
+        index = IVFIndex(num_lists=10, nprobe=3, num_subquantizers=num_subquantizers)
+        index.build(corpus_embeddings)
+        path = str(tmp_path / "index.npz")
+        index.save(path)
+
+        loaded_index = IVFIndex.load(path)
+        assert loaded_index.nprobe == 3
+        for expected, loaded in zip(
+            index.search(query_embeddings, top_k=5),
+            loaded_index.search(query_embeddings, top_k=5),
+        ):
+            np.testing.assert_array_equal(expected, loaded)
+
+
+def test_ivf_index_rejects_indivisible_dimension(corpus_embeddings):
+    with pytest.raises(ValueError):
+        IVFIndex(num_subquantizers=5).build(corpus_embeddings)
+
+
+def test_retriever_with_index_matches_brute_force(corpus_embeddings, query_embeddings):
+    documents = [str(idx) for idx in range(len(corpus_embeddings))]
+    brute_force = SBERTRetriever(
+        encoder=None, corpus_documents=documents, corpus_embeddings=corpus_embeddings
+    )
+    retriever = SBERTRetriever(
+        encoder=None,
+        corpus_documents=documents,
+        corpus_embeddings=corpus_embeddings,
+        index=IVFIndex(num_lists=20, nprobe=20, num_subquantizers=4),
+        num_candidates=200,
+    )
+    results = retriever.search(query_embeddings, top_k=5)
+    expected_results = brute_force.search(query_embeddings, top_k=5)
+    for hits, expected_hits in zip(results, expected_results):
+        assert [hit["corpus_id"] for hit in hits] == [
+            hit["corpus_id"] for hit in expected_hits
+        ]
+        np.testing.assert_allclose(
+            [hit["score"] for hit in hits],
+            [hit["score"] for hit in expected_hits],
+            rtol=1e-5,
+        )
+
+    retriever.corpus_embeddings = corpus_embeddings[:100]
+    assert len(retriever.index) == 100
@@ -0,0 +1,211 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+import pytest
+from aiohttp import ClientSession
+from requests import Session
+
+from xlm.components.client.lms_client import (
+    LMSClient,
+    get_client,
+    get_default_client,
+    set_default_client,
+)
+from xlm.components.encoder.encoder import Encoder
+from xlm.components.generator.llm_generator import LLMGenerator
+from xlm.utils import async_http
+from test.lms_server import LMSServer
+
+
+@pytest.fixture()
+def default_client():
+    previous_client = get_default_client()
+    client = LMSClient(pool_size=4)
+    set_default_client(client)
+    yield client
+    set_default_client(previous_client)
+
+
+def test_lms_client_pool_size():
+    client = LMSClient(pool_size=32, max_retries=5)
+    adapter = client.session.get_adapter("http://localhost:9985")
+    assert adapter._pool_maxsize == 32
+    assert adapter.max_retries.total == 5
+
+
+def test_lms_client_passes_timeout_and_headers():
+    session = MagicMock(spec=Session)
+    session.post.return_value.status_code = 200
+    client = LMSClient(
+        session=session, connect_timeout=1, read_timeout=2, keep_alive=False
+    )
+    client.post(url="http://lms/generate", params={"a": 1}, json=["hi"])
+    session.post.assert_called_once_with(
+        url="http://lms/generate",
+        params={"a": 1},
+        timeout=(1, 2),
+        json=["hi"],
+        headers={"Connection": "close"},
+    )
+
+
+def test_components_share_session_client(default_client):
+    session = MagicMock(spec=Session)
+    session.post.return_value.status_code = 200
+    session.post.return_value.json.return_value = ["HI"]
+    encoder = Encoder(model_name="sentence-transformers", session=session)
+    generator = LLMGenerator(model_name="gpt-2", session=session)
+
+    client = get_client(session=session)
+    client.post = MagicMock(wraps=client.post)
+    generator.generate(texts=["hi"])
+    encoder.encode(texts=["hi"])
+
+    # one client per session, limited with the limiter of the default client
+    assert client.post.call_count == 2
+    assert client.session is session
+    assert client.concurrency_limiter is default_client.concurrency_limiter
+    assert get_client(session=Session()) is not client
+
+
+def test_components_reject_session_and_client():
+    with pytest.raises(ValueError, match="either a session or a client"):
+        Encoder(
+            model_name="sentence-transformers", session=Session(), client=LMSClient()
+        )
+    with pytest.raises(ValueError, match="either a session or a client"):
+        LLMGenerator(model_name="gpt-2", session=Session(), client=LMSClient())
+
+
+def test_components_share_default_client(default_client):
+    with LMSServer() as server:
+        encoder = Encoder(model_name="sentence-transformers", endpoint=server.endpoint)
+        generator = LLMGenerator(model_name="gpt-2", endpoint=server.endpoint)
+        default_client.post = MagicMock(wraps=default_client.post)
+
+        encoder.encode(texts=["hi"])
+        generator.generate(texts=["hi"])
+        assert default_client.post.call_count == 2
+
+
+def test_lms_client_coalesces_identical_requests():
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_post(url, params, **kwargs):
+        started.set()
+        release.wait(timeout=5)
+        response = MagicMock(status_code=200)
+        response.json.return_value = kwargs["json"]
+        return response
+
+    session = MagicMock(spec=Session)
+    session.post.side_effect = slow_post
+    client = LMSClient(session=session)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        leader = executor.submit(
+            client.post, url="http://lms/vectorize", json=["hi"], coalesce=True
+        )
+        started.wait(timeout=5)
+        followers = [
+            executor.submit(
+                client.post, url="http://lms/vectorize", json=["hi"], coalesce=True
+            )
+            for _ in range(3)
+        ]
+        while client.num_coalesced_requests < 3:
+            time.sleep(0.01)
+        release.set()
+        responses = [leader.result()] + [future.result() for future in followers]
+
+    assert session.post.call_count == 1
+    assert all(response.json() == ["hi"] for response in responses)
+
+
+def test_lms_client_does_not_coalesce_by_default():
+    session = MagicMock(spec=Session)
+    session.post.return_value.status_code = 200
+    client = LMSClient(session=session)
+    client.post(url="http://lms/generate", json=["hi"])
+    client.post(url="http://lms/generate", json=["hi"])
+    assert session.post.call_count == 2
+    assert client.num_coalesced_requests == 0
+
+
+def test_lms_client_coalesces_async_requests():
+    client = LMSClient()
+
+    async def run():
+        with LMSServer() as server:
+            responses = await asyncio.gather(
+                *[
+                    client.apost(
+                        url=f"{server.endpoint}/generate",
+                        params={"model_name": "gpt-2"},
+                        json=["hi"],
+                        coalesce=True,
+                    )
+                    for _ in range(5)
+                ]
+            )
+            await client.aclose()
+            return responses, server.requests
+
+    responses, requests = asyncio.run(run())
+    assert [response.json() for response in responses] == [["HI"]] * 5
+    assert len(requests) == 1
+    assert client.num_coalesced_requests == 4
+
+
+@pytest.fixture()
+def client_sessions(monkeypatch):
+    sessions = []
+
+    def create_session(**kwargs):
+        sessions.append(ClientSession(**kwargs))
+        return sessions[-1]
+
+    monkeypatch.setattr(async_http.aiohttp, "ClientSession", create_session)
+    return sessions
+
+
+def test_lms_client_closes_session_of_finished_loop(client_sessions):
+    client = LMSClient()
+    with LMSServer() as server:
+
+        async def run():
+            response = await client.apost(
+                url=f"{server.endpoint}/generate", json=["hi"]
+            )
+            return response.json()
+
+        # every run has its own loop, the session of a loop is closed with it
+        assert asyncio.run(run()) == ["HI"]
+        assert asyncio.run(run()) == ["HI"]
+
+    assert len(client_sessions) == 2
+    assert all(session.closed for session in client_sessions)
+
+
+def test_lms_client_aclose_closes_sessions_of_all_loops(client_sessions):
+    client = LMSClient()
+    loop = asyncio.new_event_loop()
+    with LMSServer() as server:
+
+        async def run():
+            return await client.apost(url=f"{server.endpoint}/generate", json=["hi"])
+
+        try:
+            loop.run_until_complete(run())
+            asyncio.run(client.aclose())
+            # the session of the other loop is closed when that loop runs again
+            loop.run_until_complete(
+                asyncio.gather(*asyncio.all_tasks(loop), return_exceptions=True)
+            )
+            assert [session.closed for session in client_sessions] == [True]
+        finally:
+            loop.close()
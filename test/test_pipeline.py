@@ -0,0 +1,85 @@
+import threading
+import time
+
+import pytest
+
+from xlm.utils.pipeline import run_pipeline
+
+
+def test_run_pipeline_returns_every_item_with_its_position():
+    results = run_pipeline(
+        items=range(50),
+        stages=[(lambda x: x + 1, 1), (lambda x: x * 2, 4), (str, 2)],
+        queue_size=3,
+    )
+
+    assert sorted(results) == [(idx, str((idx + 1) * 2)) for idx in range(50)]
+
+
+def test_run_pipeline_without_items():
+    assert list(run_pipeline(items=[], stages=[(str, 2), (len, 3)])) == []
+
+
+def test_run_pipeline_overlaps_stages():
+    first_done = threading.Event()
+
+    def slow(x):
+        if x == 0:
+            # blocks until a later item has left the pipeline
+            assert first_done.wait(timeout=5)
+        return x
+
+    results = run_pipeline(items=range(4), stages=[(slow, 2), (lambda x: x, 1)])
+    idx, _ = next(results)
+    first_done.set()
+
+    assert idx != 0
+    assert sorted(i for i, _ in results) == sorted({0, 1, 2, 3} - {idx})
+
+
+def test_run_pipeline_bounds_queues():
+    started = []
+
+    def record(x):
+        started.append(x)
+        return x
+
+    results = run_pipeline(
+        items=range(100), stages=[(record, 1), (lambda x: x, 1)], queue_size=2
+    )
+    next(results)
+    time.sleep(0.2)
+
+    # items in the two queues between the stages and the result queue, plus one
+    # being processed by every stage
+    assert len(started) <= 3 * 2 + 2 + 1
+    results.close()
+
+
+def test_run_pipeline_raises_errors_of_stages():
+    def fail(x):
+        if x == 3:
+            raise ValueError("failed")
+        return x
+
+    with pytest.raises(ValueError, match="failed"):
+        list(run_pipeline(items=range(10), stages=[(fail, 2), (str, 1)]))
+
+
+def test_run_pipeline_stops_at_deadline():
+    def slow(x):
+        if x > 1:
+            time.sleep(5)
+        return x
+
+    start = time.monotonic()
+    results = list(
+        run_pipeline(
+            items=range(10),
+            stages=[(slow, 1)],
+            deadline=time.monotonic() + 0.5,
+        )
+    )
+
+    assert results == [(0, 0), (1, 1)]
+    assert time.monotonic() - start < 2
@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from xlm.components.retriever.quantized_index import QuantizedIndex
+from xlm.components.retriever.sbert_retriever import SBERTRetriever
+from xlm.utils.vectors import normalize_rows, top_k
+
+
+@pytest.fixture()
+def topics():
+    return np.random.default_rng(0).standard_normal((20, 64))
+
+
+def sample(topics, num_embeddings, seed):
+    rng = np.random.default_rng(seed)
+    embeddings = topics[rng.integers(0, len(topics), num_embeddings)]
+    return normalize_rows(embeddings + 0.3 * rng.standard_normal(embeddings.shape))
+
+
+@pytest.fixture()
+def corpus_embeddings(topics):
+    return sample(topics, 2000, seed=1)
+
+
+@pytest.fixture()
+def query_embeddings(topics):
+    return sample(topics, 20, seed=2)
+
+
+def recall(ids, expected_ids):
+    return np.mean([len(set(a) & set(b)) / len(b) for a, b in zip(ids, expected_ids)])
+
+
+@pytest.mark.parametrize("quantization, compression", [("int8", 4), ("binary", 32)])
+def test_quantized_index_recall(
+    corpus_embeddings, query_embeddings, quantization, compression
+):
+    index = QuantizedIndex(quantization=quantization, chunk_size=300)
+    index.build(corpus_embeddings[:1500])
+    index.add(corpus_embeddings[1500:])
+    assert len(index) == len(corpus_embeddings)
+    assert index.nbytes <= corpus_embeddings.nbytes / compression + 64 * 4
+
+    expected_ids, _ = top_k(query_embeddings @ corpus_embeddings.T, k=10)
+    ids, scores = index.search(query_embeddings, top_k=100)
+    assert ids.shape == scores.shape == (20, 100)
+    assert np.all(np.diff(scores, axis=1) <= 0)
+    assert recall(ids, expected_ids) > 0.9
+
+
+def test_quantized_index_pads_missing_hits(corpus_embeddings, query_embeddings):
+    index = QuantizedIndex(quantization="binary")
+    index.build(corpus_embeddings[:10])
+    ids, scores = index.search(query_embeddings[:1], top_k=20)
+    assert (ids[0] == -1).sum() == 10
+    assert np.all(np.isneginf(scores[0][10:]))
+
+
+def test_quantized_index_save_and_load(tmp_path, corpus_embeddings, query_embeddings):
+    for quantization in ["int8", "binary"]:
+        index = QuantizedIndex(quantization=quantization)
+        index.build(corpus_embeddings)
+        path = str(tmp_path / "index.npz")
+        index.save(path)
+        loaded = QuantizedIndex.load(path)
+        assert loaded.quantization == quantization
+        for expected, actual in zip(
+            index.search(query_embeddings, top_k=5),
+            loaded.search(query_embeddings, top_k=5),
+        ):
+            np.testing.assert_array_equal(expected, actual)
+
+
+def test_retriever_reranks_quantized_candidates(corpus_embeddings, query_embeddings):
+    brute_force = SBERTRetriever(
+        encoder=None,
+        corpus_documents=[str(idx) for idx in range(len(corpus_embeddings))],
+        corpus_embeddings=corpus_embeddings,
+    )
+    retriever = SBERTRetriever(
+        encoder=None,
+        corpus_documents=[str(idx) for idx in range(len(corpus_embeddings))],
+        corpus_embeddings=corpus_embeddings,
+        index=QuantizedIndex(quantization="int8"),
+        num_candidates=50,
+    )
+
+    expected = brute_force.search(query_embeddings=query_embeddings, top_k=5)
+    results = retriever.search(query_embeddings=query_embeddings, top_k=5)
+    # candidates are re-scored with the float vectors
+    for result, expected_result in zip(results, expected):
+        assert [hit["corpus_id"] for hit in result] == [
+            hit["corpus_id"] for hit in expected_result
+        ]
+        np.testing.assert_allclose(
+            [hit["score"] for hit in result],
+            [hit["score"] for hit in expected_result],
+            rtol=1e-5,
+        )
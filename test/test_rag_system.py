@@ -0,0 +1,43 @@
+import pytest
+
+from xlm.components.encoder.encoder import Encoder
+from xlm.components.generator.llm_generator import LLMGenerator
+from xlm.components.rag_system.rag_system import RagSystem
+from xlm.components.retriever.sbert_retriever import SBERTRetriever
+from test.lms_server import LMSServer
+
+
+@pytest.fixture()
+def lms_server():
+    with LMSServer(dimension=16) as server:
+        yield server
+
+
+@pytest.fixture()
+def rag_system(lms_server):
+    encoder = Encoder(model_name="sentence-transformers", endpoint=lms_server.endpoint)
+    retriever = SBERTRetriever(
+        encoder=encoder,
+        corpus_documents=[f"document number {idx}" for idx in range(10)],
+    )
+    generator = LLMGenerator(model_name="gpt-2", endpoint=lms_server.endpoint)
+    return RagSystem(
+        retriever=retriever,
+        generator=generator,
+        prompt_template="{context} {question}",
+        retriever_top_k=2,
+    )
+
+
+def test_rag_system_run_batch(rag_system):
+    user_inputs = ["document number 1", "document number 8"]
+
+    outputs = rag_system.run_batch(user_inputs=user_inputs)
+
+    assert len(outputs) == len(user_inputs)
+    for user_input, output in zip(user_inputs, outputs):
+        expected = rag_system.run(user_input=user_input)
+        assert output.retrieved_documents[0] == user_input
+        assert output.retrieved_documents == expected.retrieved_documents
+        assert output.prompt == expected.prompt
+        assert output.generated_responses == expected.generated_responses
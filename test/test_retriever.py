@@ -1,7 +1,12 @@
+import numpy as np
 import pytest
+import torch
+from sentence_transformers.util import semantic_search
 
 from xlm.components.encoder.encoder import Encoder
+from xlm.components.retriever.ivf_index import IVFIndex
 from xlm.components.retriever.sbert_retriever import SBERTRetriever
+from test.lms_server import LMSServer, fake_embedding
 
 
 @pytest.fixture
@@ -72,3 +77,175 @@ def test_retriever(retriever_with_corpus_embeddings, texts):
     documents = retriever_with_corpus_embeddings.retrieve(text=texts[1], top_k=1)
     assert len(documents) == 1
     assert documents[0] == "hello"
+
+
+@pytest.fixture()
+def lms_server():
+    with LMSServer(dimension=16) as server:
+        yield server
+
+
+@pytest.fixture()
+def lms_retriever(lms_server):
+    encoder = Encoder(model_name="sentence-transformers", endpoint=lms_server.endpoint)
+    documents = [f"document number {idx}" for idx in range(50)]
+    return SBERTRetriever(encoder=encoder, corpus_documents=documents)
+
+
+def test_retriever_holds_normalized_float32_corpus(lms_retriever):
+    corpus_embeddings = lms_retriever.corpus_embeddings
+    assert corpus_embeddings.dtype == np.float32
+    assert corpus_embeddings.flags["C_CONTIGUOUS"]
+    np.testing.assert_allclose(np.linalg.norm(corpus_embeddings, axis=1), 1, rtol=1e-5)
+
+
+def test_retriever_search_matches_semantic_search(lms_retriever):
+    queries = np.random.default_rng(0).standard_normal((3, 16)).astype(np.float32)
+    corpus = np.stack(
+        [fake_embedding(text, 16) for text in lms_retriever.corpus_documents]
+    )
+
+    results = lms_retriever.search(query_embeddings=queries, top_k=5)
+    expected = semantic_search(
+        torch.from_numpy(queries), torch.from_numpy(corpus), top_k=5
+    )
+    for result, expected_result in zip(results, expected):
+        assert [hit["corpus_id"] for hit in result] == [
+            hit["corpus_id"] for hit in expected_result
+        ]
+        np.testing.assert_allclose(
+            [hit["score"] for hit in result],
+            [hit["score"] for hit in expected_result],
+            rtol=1e-5,
+        )
+
+
+def test_retriever_retrieves_own_document(lms_retriever):
+    documents, scores = lms_retriever.retrieve(
+        text="document number 7", top_k=100, return_scores=True
+    )
+    assert documents[0] == "document number 7"
+    assert scores[0] == pytest.approx(1.0, abs=1e-5)
+    assert len(documents) == 50
+    assert scores == sorted(scores, reverse=True)
+
+
+@pytest.fixture(params=[None, "ivf"])
+def updatable_retriever(request, lms_server):
+    encoder = Encoder(model_name="sentence-transformers", endpoint=lms_server.endpoint)
+    documents = [f"document number {idx}" for idx in range(50)]
+    index = IVFIndex(num_lists=4, nprobe=4) if request.param else None
+    return SBERTRetriever(encoder=encoder, corpus_documents=documents, index=index)
+
+
+def test_retriever_add_documents(updatable_retriever):
+    ids = updatable_retriever.add_documents(documents=["new document"])
+    assert ids == [50]
+    assert updatable_retriever.num_documents == 51
+
+    documents = updatable_retriever.retrieve(text="new document", top_k=1)
+    assert documents == ["new document"]
+    hits = updatable_retriever.retrieve_documents_with_scores(
+        text="new document", top_k=1
+    )
+    assert hits[0][0]["corpus_id"] == 50
+
+    with pytest.raises(ValueError):
+        updatable_retriever.add_documents(documents=["again"], ids=[50])
+
+
+def test_retriever_remove_documents(updatable_retriever):
+    updatable_retriever.remove_documents(ids=[7])
+    assert updatable_retriever.num_documents == 49
+
+    documents = updatable_retriever.retrieve(text="document number 7", top_k=100)
+    assert "document number 7" not in documents
+    assert len(documents) == 49
+
+    with pytest.raises(ValueError):
+        updatable_retriever.remove_documents(ids=[7])
+
+
+def test_retriever_upsert_keeps_ids(updatable_retriever):
+    updatable_retriever.add_documents(documents=["first", "second"], ids=["a", "b"])
+    changed_ids = updatable_retriever.upsert(
+        documents=["first", "second, edited", "third"], ids=["a", "b", "c"]
+    )
+    assert changed_ids == ["b", "c"]
+    assert updatable_retriever.num_documents == 53
+
+    hits = updatable_retriever.retrieve_documents_with_scores(
+        text="second, edited", top_k=1
+    )
+    assert hits[0][0]["corpus_id"] == "b"
+    assert "second" not in updatable_retriever.retrieve(text="second", top_k=100)
+
+    # integer ids of the original documents are not affected
+    hits = updatable_retriever.retrieve_documents_with_scores(
+        text="document number 3", top_k=1
+    )
+    assert hits[0][0]["corpus_id"] == 3
+
+
+def test_retriever_compact(updatable_retriever):
+    updatable_retriever.remove_documents(ids=list(range(0, 50, 2)))
+    updatable_retriever.add_documents(documents=["new document"], ids=["new"])
+    updatable_retriever.compact()
+
+    assert len(updatable_retriever.corpus_embeddings) == 26
+    assert len(updatable_retriever.corpus_documents) == 26
+    hits = updatable_retriever.retrieve_documents_with_scores(
+        text="document number 9", top_k=1
+    )
+    assert hits[0][0]["corpus_id"] == 9
+    assert updatable_retriever.retrieve(text="new document", top_k=1) == [
+        "new document"
+    ]
+    assert updatable_retriever.add_documents(documents=["next"]) == [50]
+
+
+def test_retriever_retrieve_batch_encodes_once(lms_server, lms_retriever):
+    texts = ["document number 3", "document number 41", "something else"]
+    num_requests = len(lms_server.requests)
+
+    results = lms_retriever.retrieve_batch(texts=texts, top_k=5, return_scores=True)
+
+    assert len(lms_server.requests) == num_requests + 1
+    for text, (documents, scores) in zip(texts, results):
+        expected_documents, expected_scores = lms_retriever.retrieve(
+            text=text, top_k=5, return_scores=True
+        )
+        assert documents == expected_documents
+        np.testing.assert_allclose(scores, expected_scores, rtol=1e-5)
+    assert lms_retriever.retrieve_batch(texts=[]) == []
+
+
+def test_retriever_score_documents_keeps_corpus(lms_retriever):
+    corpus_embeddings = lms_retriever.corpus_embeddings.copy()
+    corpus_documents = list(lms_retriever.corpus_documents)
+    documents = ["document number 7", "something else", "document number"]
+
+    scores = lms_retriever.score_documents(
+        text="document number 7", documents=documents
+    )
+
+    expected_scores = [
+        lms_retriever.search(
+            query_embeddings=lms_retriever.encode_queries(text="document number 7"),
+            corpus_embeddings=lms_retriever.encode_corpus(texts=[document]),
+            top_k=1,
+        )[0][0]["score"]
+        for document in documents
+    ]
+    np.testing.assert_allclose(scores, expected_scores, rtol=1e-5)
+    assert scores[0] == pytest.approx(1.0, abs=1e-5)
+    query_embeddings = lms_retriever.encode_queries(text="document number 7")
+    np.testing.assert_allclose(
+        lms_retriever.score_documents(
+            text="", documents=documents, query_embeddings=query_embeddings
+        ),
+        scores,
+        rtol=1e-5,
+    )
+    np.testing.assert_array_equal(lms_retriever.corpus_embeddings, corpus_embeddings)
+    assert list(lms_retriever.corpus_documents) == corpus_documents
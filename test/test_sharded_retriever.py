@@ -0,0 +1,90 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from xlm.components.encoder.encoder import Encoder
+from xlm.components.retriever.corpus_store import CorpusStore
+from xlm.components.retriever.sbert_retriever import SBERTRetriever
+from xlm.components.retriever.sharded_retriever import ShardedRetriever
+from test.lms_server import LMSServer, fake_embedding
+
+
+@pytest.fixture()
+def lms_server():
+    with LMSServer(dimension=16) as server:
+        yield server
+
+
+@pytest.fixture()
+def corpus_documents():
+    return [f"document number {idx}" for idx in range(103)]
+
+
+@pytest.fixture()
+def corpus_store(tmp_path, corpus_documents):
+    return CorpusStore.create(
+        path=str(tmp_path / "store"),
+        documents=corpus_documents,
+        embeddings=np.stack([fake_embedding(text, 16) for text in corpus_documents]),
+        model_name="sentence-transformers",
+    )
+
+
+@pytest.fixture()
+def sharded_retriever(lms_server, corpus_store):
+    encoder = Encoder(model_name="sentence-transformers", endpoint=lms_server.endpoint)
+    with ShardedRetriever(
+        encoder=encoder, corpus_store=corpus_store, num_shards=4, num_workers=2
+    ) as retriever:
+        yield retriever
+
+
+def test_sharded_retriever_matches_single_search(sharded_retriever, corpus_store):
+    assert sharded_retriever.num_shards == 4
+    queries = np.random.default_rng(0).standard_normal((5, 16))
+    expected = SBERTRetriever(encoder=None, corpus_store=corpus_store).search(
+        query_embeddings=queries, top_k=10
+    )
+
+    results = sharded_retriever.search(query_embeddings=queries, top_k=10)
+
+    for result, expected_result in zip(results, expected):
+        assert [hit["corpus_id"] for hit in result] == [
+            hit["corpus_id"] for hit in expected_result
+        ]
+        np.testing.assert_allclose(
+            [hit["score"] for hit in result],
+            [hit["score"] for hit in expected_result],
+            rtol=1e-5,
+        )
+
+
+def test_sharded_retriever_retrieve(sharded_retriever):
+    documents, scores = sharded_retriever.retrieve(
+        text="document number 42", top_k=3, return_scores=True
+    )
+    assert documents[0] == "document number 42"
+    assert scores[0] == pytest.approx(1.0, abs=1e-5)
+
+    assert (
+        asyncio.run(sharded_retriever.aretrieve(text="document number 42", top_k=3))
+        == documents
+    )
+    assert sharded_retriever.retrieve_batch(
+        texts=["document number 1", "document number 99"], top_k=1
+    ) == [["document number 1"], ["document number 99"]]
+
+
+def test_sharded_retriever_score_documents(sharded_retriever, lms_server):
+    documents, expected_scores = sharded_retriever.retrieve(
+        text="document number 42", top_k=3, return_scores=True
+    )
+
+    num_requests = len(lms_server.requests)
+    scores = sharded_retriever.score_documents(
+        text="document number 42", documents=documents
+    )
+
+    np.testing.assert_allclose(scores, expected_scores, rtol=1e-5)
+    assert len(lms_server.requests) - num_requests == 1
@@ -0,0 +1,161 @@
+import asyncio
+import time
+from collections import deque
+from threading import Event, Lock
+from typing import Any, Dict, Optional
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Limits the number of requests in flight with additive-increase /
+    multiplicative-decrease (AIMD). Every successful request whose latency stays
+    within `latency_tolerance` times the best latency seen so far grows the limit by
+    `1 / limit`, i.e. by one per window of requests. The best latency slowly drifts
+    upwards, so that it follows lasting changes of the workload. An overloaded
+    response (429, 5xx), an exception or a smoothed latency above that tolerance
+    multiplies the limit by `backoff_factor`, at most once per window: requests that
+    were started before the last decrease do not decrease it again.
+
+    Requests over the limit wait in FIFO order, threads and coroutines alike.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 8,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        backoff_factor: float = 0.5,
+        latency_tolerance: float = 2.0,
+        latency_smoothing: float = 0.2,
+    ):
+        self.__limit = float(min(max(initial_limit, min_limit), max_limit))
+        self.__min_limit = min_limit
+        self.__max_limit = max_limit
+        self.__backoff_factor = backoff_factor
+        self.__latency_tolerance = latency_tolerance
+        self.__latency_smoothing = latency_smoothing
+        self.__in_flight = 0
+        self.__waiters = deque()
+        self.__min_latency: Optional[float] = None
+        self.__latency: Optional[float] = None
+        self.__last_decrease = 0.0
+        self.__lock = Lock()
+
+    @property
+    def limit(self) -> int:
+        return int(self.__limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self.__in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self.__waiters)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.__lock:
+            return {
+                "limit": int(self.__limit),
+                "in_flight": self.__in_flight,
+                "queue_depth": len(self.__waiters),
+                "latency": self.__latency,
+                "min_latency": self.__min_latency,
+            }
+
+    def acquire(self) -> float:
+        """
+        Blocks until the request may be sent.
+
+        Returns
+        -------
+        float The start time to pass to `release`.
+        """
+        with self.__lock:
+            if self.__try_acquire():
+                return time.monotonic()
+            event = Event()
+            self.__waiters.append(event.set)
+        event.wait()
+        return time.monotonic()
+
+    async def aacquire(self) -> float:
+        loop = asyncio.get_running_loop()
+        with self.__lock:
+            if self.__try_acquire():
+                return time.monotonic()
+            future = loop.create_future()
+
+            def wake():
+                loop.call_soon_threadsafe(
+                    lambda: future.done() or future.set_result(None)
+                )
+
+            self.__waiters.append(wake)
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self.__lock:
+                if wake in self.__waiters:
+                    self.__waiters.remove(wake)
+                    raise
+            # the slot was handed over before the cancellation arrived
+            self.__give_back()
+            raise
+        return time.monotonic()
+
+    def release(self, start: float, overloaded: bool = False):
+        """
+        Frees the slot of a request started at `start` and adapts the limit to its
+        outcome.
+        """
+        now = time.monotonic()
+        latency = now - start
+        with self.__lock:
+            self.__in_flight -= 1
+            if overloaded:
+                self.__decrease(start=start, now=now)
+            else:
+                self.__observe(latency=latency, start=start, now=now)
+            self.__wake_waiters()
+
+    def __try_acquire(self) -> bool:
+        if self.__in_flight < int(self.__limit) and not self.__waiters:
+            self.__in_flight += 1
+            return True
+        return False
+
+    def __give_back(self):
+        with self.__lock:
+            self.__in_flight -= 1
+            self.__wake_waiters()
+
+    def __wake_waiters(self):
+        # slots are handed over directly, so a newcomer cannot overtake a waiter
+        while self.__waiters and self.__in_flight < int(self.__limit):
+            self.__in_flight += 1
+            self.__waiters.popleft()()
+
+    def __observe(self, latency: float, start: float, now: float):
+        if self.__min_latency is None:
+            self.__min_latency = latency
+        else:
+            self.__min_latency = min(latency, self.__min_latency * 1.01)
+        if self.__latency is None:
+            self.__latency = latency
+        else:
+            self.__latency += self.__latency_smoothing * (latency - self.__latency)
+
+        if self.__latency > self.__latency_tolerance * self.__min_latency:
+            self.__decrease(start=start, now=now)
+        else:
+            self.__limit = min(self.__max_limit, self.__limit + 1 / self.__limit)
+
+    def __decrease(self, start: float, now: float):
+        if start < self.__last_decrease:
+            return
+        self.__limit = max(self.__min_limit, self.__limit * self.__backoff_factor)
+        self.__last_decrease = now
+        # the latency under the reduced load is measured afresh
+        self.__latency = None
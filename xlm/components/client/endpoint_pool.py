@@ -0,0 +1,196 @@
+import time
+from threading import Lock
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Union
+
+
+class _Endpoint:
+    def __init__(self, url: str):
+        self.url = url
+        self.outstanding = 0
+        self.latency = None
+        self.num_samples = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.num_requests = 0
+        self.num_failures = 0
+        self.num_ejections = 0
+
+    def is_healthy(self, now: float) -> bool:
+        return self.ejected_until <= now
+
+    def eject(self, until: float):
+        # an ejected endpoint starts over with a clean record once it is back
+        self.ejected_until = until
+        self.latency = None
+        self.num_samples = 0
+        self.consecutive_failures = 0
+        self.num_ejections += 1
+
+
+class EndpointPool:
+    """
+    Spreads requests over several LMS replicas. Every request goes to the healthy
+    endpoint with the fewest outstanding requests, ties are broken by the lower
+    average latency. An endpoint is ejected for `ejection_time` seconds after
+    `max_failures` consecutive failures (exceptions, 429 or 5xx responses) or when its
+    average latency exceeds `slow_factor` times the one of the fastest healthy
+    endpoint. If every endpoint is ejected, the one coming back first is used. LMS
+    calls are side-effect free, so a failed request is retried once on every other
+    endpoint before the failure is passed on.
+    """
+
+    def __init__(
+        self,
+        endpoints: Union[str, List[str]],
+        max_failures: int = 3,
+        ejection_time: float = 30.0,
+        slow_factor: float = 5.0,
+        min_samples: int = 5,
+        latency_smoothing: float = 0.2,
+    ):
+        if isinstance(endpoints, str):
+            endpoints = [endpoints]
+        if not endpoints:
+            raise ValueError("At least one LMS endpoint is required.")
+        # a url listed twice is one replica, a request tries every url once
+        urls = dict.fromkeys(url.rstrip("/") for url in endpoints)
+        self.__endpoints = [_Endpoint(url=url) for url in urls]
+        self.__max_failures = max_failures
+        self.__ejection_time = ejection_time
+        self.__slow_factor = slow_factor
+        self.__min_samples = min_samples
+        self.__latency_smoothing = latency_smoothing
+        self.__lock = Lock()
+
+    @property
+    def endpoints(self) -> List[str]:
+        return [endpoint.url for endpoint in self.__endpoints]
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        with self.__lock:
+            return [
+                {
+                    "endpoint": endpoint.url,
+                    "healthy": endpoint.is_healthy(now),
+                    "outstanding": endpoint.outstanding,
+                    "latency": endpoint.latency,
+                    "num_requests": endpoint.num_requests,
+                    "num_failures": endpoint.num_failures,
+                    "num_ejections": endpoint.num_ejections,
+                }
+                for endpoint in self.__endpoints
+            ]
+
+    def acquire(self, exclude: Optional[Set[str]] = None) -> str:
+        """
+        Picks the endpoint for the next request and counts it as outstanding until
+        `release` is called.
+        """
+        now = time.monotonic()
+        with self.__lock:
+            endpoints = [e for e in self.__endpoints if e.url not in (exclude or ())]
+            candidates = [e for e in endpoints if e.is_healthy(now)]
+            if candidates:
+                endpoint = min(
+                    candidates, key=lambda e: (e.outstanding, e.latency or 0.0)
+                )
+            else:
+                endpoint = min(endpoints, key=lambda e: e.ejected_until)
+            endpoint.outstanding += 1
+            endpoint.num_requests += 1
+            return endpoint.url
+
+    def release(self, endpoint: str, latency: float, success: bool):
+        now = time.monotonic()
+        with self.__lock:
+            state = next(e for e in self.__endpoints if e.url == endpoint)
+            state.outstanding -= 1
+            if not success:
+                state.num_failures += 1
+                state.consecutive_failures += 1
+                if state.consecutive_failures >= self.__max_failures:
+                    state.eject(until=now + self.__ejection_time)
+                return
+
+            state.consecutive_failures = 0
+            state.num_samples += 1
+            if state.latency is None:
+                state.latency = latency
+            else:
+                state.latency += self.__latency_smoothing * (latency - state.latency)
+            if self.__is_slow(state=state, now=now):
+                state.eject(until=now + self.__ejection_time)
+
+    def request(self, fn: Callable[[str], Any]) -> Any:
+        """
+        Calls `fn` with the endpoint picked for this request and records the outcome.
+        """
+        tried = set()
+        while True:
+            endpoint = self.acquire(exclude=tried)
+            tried.add(endpoint)
+            is_last_try = len(tried) == len(self.__endpoints)
+            start = time.monotonic()
+            try:
+                response = fn(endpoint)
+            except Exception:
+                self.release(
+                    endpoint=endpoint, latency=time.monotonic() - start, success=False
+                )
+                if is_last_try:
+                    raise
+                continue
+            success = self.__is_success(response)
+            self.release(
+                endpoint=endpoint, latency=time.monotonic() - start, success=success
+            )
+            if success or is_last_try:
+                return response
+
+    async def arequest(self, fn: Callable[[str], Awaitable[Any]]) -> Any:
+        tried = set()
+        while True:
+            endpoint = self.acquire(exclude=tried)
+            tried.add(endpoint)
+            is_last_try = len(tried) == len(self.__endpoints)
+            start = time.monotonic()
+            try:
+                response = await fn(endpoint)
+            except Exception:
+                self.release(
+                    endpoint=endpoint, latency=time.monotonic() - start, success=False
+                )
+                if is_last_try:
+                    raise
+                continue
+            success = self.__is_success(response)
+            self.release(
+                endpoint=endpoint, latency=time.monotonic() - start, success=success
+            )
+            if success or is_last_try:
+                return response
+
+    def __is_success(self, response) -> bool:
+        return response.status_code != 429 and response.status_code < 500
+
+    def __is_slow(self, state: _Endpoint, now: float) -> bool:
+        if state.num_samples < self.__min_samples:
+            return False
+        other_latencies = [
+            e.latency
+            for e in self.__endpoints
+            if e is not state
+            and e.is_healthy(now)
+            and e.num_samples >= self.__min_samples
+        ]
+        # the only measured endpoint has nothing to be compared to
+        if not other_latencies:
+            return False
+        return state.latency > self.__slow_factor * min(other_latencies)
+
+
+def as_endpoint_pool(endpoint: Union[str, List[str], EndpointPool]) -> EndpointPool:
+    if isinstance(endpoint, EndpointPool):
+        return endpoint
+    return EndpointPool(endpoints=endpoint)
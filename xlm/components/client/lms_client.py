@@ -0,0 +1,260 @@
+import json
+import weakref
+from threading import Lock
+from typing import Any, Dict, Optional
+
+from requests import Response, Session
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from xlm.components.client.concurrency_limiter import AdaptiveConcurrencyLimiter
+from xlm.components.client.endpoint_pool import EndpointPool
+from xlm.components.client.single_flight import SingleFlight
+from xlm.utils.async_http import AsyncHTTPClient, AsyncResponse
+from xlm.utils.cache import hash_key
+
+
+class LMSClient:
+    """
+    HTTP client for the Language Model Service. Owns one pooled `requests.Session`
+    for blocking calls and one `AsyncHTTPClient` for coroutine calls, so all
+    components talking to the LMS reuse the same keep-alive connections. All POSTs
+    pass through one adaptive concurrency limiter, so the number of requests in
+    flight follows the load the LMS can take rather than the thread counts of the
+    components.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = 64,
+        connect_timeout: float = 10,
+        read_timeout: float = 300,
+        max_retries: int = 3,
+        backoff_factor: float = 0.5,
+        keep_alive: bool = True,
+        session: Optional[Session] = None,
+        concurrency_limiter: Optional[AdaptiveConcurrencyLimiter] = None,
+    ):
+        self.__timeout = (connect_timeout, read_timeout)
+        self.__headers = {} if keep_alive else {"Connection": "close"}
+        self.__session = session or self.__build_session(
+            pool_size=pool_size, max_retries=max_retries, backoff_factor=backoff_factor
+        )
+        self.__async_client = AsyncHTTPClient(
+            max_concurrent_requests=pool_size, timeout=connect_timeout + read_timeout
+        )
+        self.__single_flight = SingleFlight()
+        self.__concurrency_limiter = concurrency_limiter or AdaptiveConcurrencyLimiter(
+            max_limit=pool_size
+        )
+
+    @property
+    def session(self) -> Session:
+        return self.__session
+
+    @property
+    def concurrency_limiter(self) -> AdaptiveConcurrencyLimiter:
+        return self.__concurrency_limiter
+
+    @property
+    def num_coalesced_requests(self) -> int:
+        return self.__single_flight.num_coalesced_calls
+
+    def post(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        coalesce: bool = False,
+        endpoints: Optional[EndpointPool] = None,
+        **kwargs,
+    ) -> Response:
+        """
+        With `coalesce`, identical requests (same url, params and body) issued while
+        one of them is in flight wait for it and share its response instead of being
+        sent again. Only use it for requests whose response is deterministic.
+
+        With `endpoints`, `url` is a path that is appended to the endpoint the pool
+        picks for this request.
+        """
+        kwargs = self.__with_headers(kwargs)
+
+        def send_to(endpoint: str) -> Response:
+            start = self.__concurrency_limiter.acquire()
+            overloaded = True
+            try:
+                response = self.__session.post(
+                    url=f"{endpoint}{url}",
+                    params=params,
+                    timeout=self.__timeout,
+                    **kwargs,
+                )
+                overloaded = self.__is_overloaded(response)
+                return response
+            finally:
+                self.__concurrency_limiter.release(start=start, overloaded=overloaded)
+
+        def send() -> Response:
+            if endpoints is None:
+                return send_to("")
+            return endpoints.request(send_to)
+
+        if not coalesce:
+            return send()
+        return self.__single_flight.do(
+            key=self.__get_request_key(
+                url=url, params=params, kwargs=kwargs, endpoints=endpoints
+            ),
+            fn=send,
+        )
+
+    def get(self, url: str, params: Optional[Dict[str, Any]] = None, **kwargs):
+        return self.__session.get(
+            url=url,
+            params=params,
+            timeout=self.__timeout,
+            **self.__with_headers(kwargs),
+        )
+
+    async def apost(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        coalesce: bool = False,
+        endpoints: Optional[EndpointPool] = None,
+        **kwargs,
+    ) -> AsyncResponse:
+        kwargs = self.__with_headers(kwargs)
+
+        async def send_to(endpoint: str) -> AsyncResponse:
+            start = await self.__concurrency_limiter.aacquire()
+            overloaded = True
+            try:
+                response = await self.__async_client.post(
+                    url=f"{endpoint}{url}", params=params, **kwargs
+                )
+                overloaded = self.__is_overloaded(response)
+                return response
+            finally:
+                self.__concurrency_limiter.release(start=start, overloaded=overloaded)
+
+        def send():
+            if endpoints is None:
+                return send_to("")
+            return endpoints.arequest(send_to)
+
+        if not coalesce:
+            return await send()
+        return await self.__single_flight.ado(
+            key=self.__get_request_key(
+                url=url, params=params, kwargs=kwargs, endpoints=endpoints
+            ),
+            fn=send,
+        )
+
+    async def aclose(self):
+        await self.__async_client.close()
+
+    def close(self):
+        self.__session.close()
+
+    def __is_overloaded(self, response) -> bool:
+        return response.status_code == 429 or response.status_code >= 500
+
+    def __get_request_key(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]],
+        kwargs: Dict[str, Any],
+        endpoints: Optional[EndpointPool],
+    ) -> str:
+        body = kwargs.get("data")
+        if body is None:
+            body = json.dumps(kwargs.get("json"), sort_keys=True)
+        # requests routed over a pool are interchangeable between its replicas
+        return hash_key(
+            endpoints.endpoints if endpoints is not None else "",
+            url,
+            sorted((params or {}).items()),
+            sorted(kwargs.get("headers", {}).items()),
+            body,
+        )
+
+    def __with_headers(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        if self.__headers:
+            kwargs["headers"] = {**self.__headers, **kwargs.get("headers", {})}
+        return kwargs
+
+    def __build_session(
+        self, pool_size: int, max_retries: int, backoff_factor: float
+    ) -> Session:
+        # LMS calls are side-effect free, so POSTs are retried as well
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=None,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+        )
+        session = Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+
+_default_client: Optional[LMSClient] = None
+_default_client_lock = Lock()
+
+
+def get_default_client() -> LMSClient:
+    """
+    Returns the process-wide LMS client, created on first use. Components without an
+    explicitly passed client resolve it on every request, so `set_default_client`
+    also applies to components created before it was called.
+    """
+    global _default_client
+    if _default_client is None:
+        with _default_client_lock:
+            if _default_client is None:
+                _default_client = LMSClient()
+    return _default_client
+
+
+def set_default_client(client: LMSClient):
+    global _default_client
+    with _default_client_lock:
+        _default_client = client
+
+
+# the clients of sessions are only kept while a component uses them, a client keeps
+# its session alive, so the id of a session is not reused while its client exists
+_session_clients: "weakref.WeakValueDictionary[int, LMSClient]" = (
+    weakref.WeakValueDictionary()
+)
+
+
+def get_client(
+    session: Optional[Session] = None, client: Optional[LMSClient] = None
+) -> Optional[LMSClient]:
+    """
+    Resolves the client of a component that accepts either a `requests.Session` or an
+    `LMSClient`. Components passing the same session share one client, which limits
+    its requests with the limiter of the default client. Without either, `None` is
+    returned and the component uses the default client.
+    """
+    if session is not None and client is not None:
+        raise ValueError("Pass either a session or a client, not both.")
+    if session is None:
+        return client
+    with _default_client_lock:
+        session_client = _session_clients.get(id(session))
+    if session_client is None:
+        limiter = get_default_client().concurrency_limiter
+        with _default_client_lock:
+            session_client = _session_clients.get(id(session))
+            if session_client is None:
+                session_client = LMSClient(session=session, concurrency_limiter=limiter)
+                _session_clients[id(session)] = session_client
+    return session_client
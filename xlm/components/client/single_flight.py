@@ -0,0 +1,74 @@
+import asyncio
+from concurrent.futures import Future
+from threading import Lock
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller executes the call,
+    callers arriving while it is in flight wait for it and share its result (or
+    exception). Nothing is cached once the call has finished.
+    """
+
+    def __init__(self):
+        self.__lock = Lock()
+        self.__calls: Dict[Hashable, Future] = {}
+        self.__async_calls: Dict[Tuple[int, Hashable], asyncio.Future] = {}
+        self.num_coalesced_calls = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self.__lock:
+            future = self.__calls.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = self.__calls[key] = Future()
+            else:
+                self.num_coalesced_calls += 1
+
+        if not is_leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self.__lock:
+                del self.__calls[key]
+
+    async def ado(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        loop = asyncio.get_running_loop()
+        # futures are bound to their loop, calls are only coalesced within one loop
+        loop_key = (id(loop), key)
+        with self.__lock:
+            future = self.__async_calls.get(loop_key)
+            is_leader = future is None
+            if is_leader:
+                future = self.__async_calls[loop_key] = loop.create_future()
+            else:
+                self.num_coalesced_calls += 1
+
+        if not is_leader:
+            return await asyncio.shield(future)
+
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # retrieve the exception so it is not reported if nobody else waited
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self.__lock:
+                del self.__async_calls[loop_key]
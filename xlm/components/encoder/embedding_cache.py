@@ -0,0 +1,43 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from xlm.utils.cache import TieredCache, hash_key
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache. Embeddings are keyed by a hash of the model name
+    and the text, kept in a bounded in-memory LRU and optionally persisted as float32
+    in a SQLite file at `path`, so they survive restarts.
+    """
+
+    def __init__(self, max_size: int = 100000, path: Optional[str] = None):
+        self.__cache = TieredCache(
+            serialize=lambda embedding: np.asarray(embedding, dtype="<f4").tobytes(),
+            deserialize=lambda raw: np.frombuffer(raw, dtype="<f4"),
+            max_size=max_size,
+            path=path,
+        )
+
+    @property
+    def stats(self):
+        return self.__cache.stats
+
+    def get_many(self, model_name: str, texts: List[str]) -> Dict[str, np.ndarray]:
+        keys = {hash_key(model_name, text): text for text in texts}
+        found = self.__cache.get_many(keys=keys.keys())
+        return {keys[key]: embedding for key, embedding in found.items()}
+
+    def put_many(
+        self, model_name: str, texts: List[str], embeddings: List[List[float]]
+    ):
+        self.__cache.put_many(
+            {
+                hash_key(model_name, text): np.array(embedding, dtype=np.float32)
+                for text, embedding in zip(texts, embeddings)
+            }
+        )
+
+    def __len__(self) -> int:
+        return len(self.__cache)
@@ -1,31 +1,275 @@
-from typing import List
+import asyncio
+import gzip
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import aiohttp
+import numpy as np
 from requests import Session
 
+from xlm.components.encoder.embedding_cache import EmbeddingCache
+from xlm.components.client.endpoint_pool import EndpointPool, as_endpoint_pool
+from xlm.components.client.lms_client import (
+    LMSClient,
+    get_client,
+    get_default_client,
+)
 from xlm.registry import DEFAULT_LMS_ENDPOINT
+from xlm.utils.batching import make_batches
+
+# raised by the encoder if the LMS cannot be reached or answers with an error
+ENCODER_ERRORS = (OSError, ValueError, aiohttp.ClientError)
 
 
 class Encoder:
     def __init__(
         self,
         model_name: str,
-        session: Session = Session(),
-        endpoint: str = DEFAULT_LMS_ENDPOINT,
+        session: Optional[Session] = None,
+        endpoint: Union[str, List[str], EndpointPool] = DEFAULT_LMS_ENDPOINT,
+        max_batch_size: Optional[int] = None,
+        max_tokens_per_batch: Optional[int] = None,
+        num_threads: int = 4,
+        cache: Optional[EmbeddingCache] = None,
+        binary_transport: bool = False,
+        compress_requests: bool = False,
+        client: Optional[LMSClient] = None,
     ):
-        self.__session = session
-        self.__endpoint = endpoint
+        """
+        Requests are sent with `client`, or with the client shared by all components
+        passing the same `session`, or else with the default client. Passing both a
+        session and a client raises a ValueError.
+        """
+        self.__client = get_client(session=session, client=client)
+        self.__endpoints = as_endpoint_pool(endpoint)
+        self.__max_batch_size = max_batch_size
+        self.__max_tokens_per_batch = max_tokens_per_batch
+        self.__num_threads = num_threads
+        self.__executor = (
+            ThreadPoolExecutor(max_workers=num_threads) if num_threads > 1 else None
+        )
+        self.__cache = cache
+        self.__binary_transport = binary_transport
+        self.__compress_requests = compress_requests
         self.model_name = model_name
 
+    @property
+    def cache(self) -> Optional[EmbeddingCache]:
+        return self.__cache
+
     def encode(self, texts: List[str]) -> List[List[float]]:
-        response = self.__session.post(
-            url=f"{self.__endpoint}/vectorize",
+        embeddings = self.__encode(texts=texts)
+        if isinstance(embeddings, np.ndarray):
+            return embeddings.tolist()
+        return embeddings
+
+    def encode_array(self, texts: List[str]) -> np.ndarray:
+        """
+        Returns
+        -------
+        np.ndarray C-contiguous float32 matrix of shape (len(texts), dimension).
+        """
+        embeddings = self.__encode(texts=texts)
+        return np.ascontiguousarray(embeddings, dtype=np.float32)
+
+    async def aencode(self, texts: List[str]) -> List[List[float]]:
+        embeddings = await self.__aencode(texts=texts)
+        if isinstance(embeddings, np.ndarray):
+            return embeddings.tolist()
+        return embeddings
+
+    async def aencode_array(self, texts: List[str]) -> np.ndarray:
+        embeddings = await self.__aencode(texts=texts)
+        return np.ascontiguousarray(embeddings, dtype=np.float32)
+
+    async def aclose(self):
+        await self.__get_client().aclose()
+
+    def __get_client(self) -> LMSClient:
+        return self.__client or get_default_client()
+
+    def __encode(self, texts: List[str]) -> Union[List[List[float]], np.ndarray]:
+        if self.__cache is None or not texts:
+            return self.__encode_uncached(texts=texts)
+
+        embeddings, missing_texts = self.__lookup_cache(texts=texts)
+        if missing_texts:
+            self.__update_cache(
+                embeddings=embeddings,
+                texts=missing_texts,
+                new_embeddings=self.__encode_uncached(texts=missing_texts),
+            )
+        return np.stack([embeddings[text] for text in texts])
+
+    async def __aencode(self, texts: List[str]) -> Union[List[List[float]], np.ndarray]:
+        if self.__cache is None or not texts:
+            return await self.__aencode_uncached(texts=texts)
+
+        embeddings, missing_texts = self.__lookup_cache(texts=texts)
+        if missing_texts:
+            self.__update_cache(
+                embeddings=embeddings,
+                texts=missing_texts,
+                new_embeddings=await self.__aencode_uncached(texts=missing_texts),
+            )
+        return np.stack([embeddings[text] for text in texts])
+
+    def __lookup_cache(
+        self, texts: List[str]
+    ) -> Tuple[Dict[str, np.ndarray], List[str]]:
+        embeddings = self.__cache.get_many(model_name=self.model_name, texts=texts)
+        missing_texts = [
+            text for text in dict.fromkeys(texts) if text not in embeddings
+        ]
+        return embeddings, missing_texts
+
+    def __update_cache(
+        self,
+        embeddings: Dict[str, np.ndarray],
+        texts: List[str],
+        new_embeddings: Union[List[List[float]], np.ndarray],
+    ):
+        new_embeddings = np.asarray(new_embeddings, dtype=np.float32)
+        self.__cache.put_many(
+            model_name=self.model_name, texts=texts, embeddings=new_embeddings
+        )
+        embeddings.update(zip(texts, new_embeddings))
+
+    def __encode_uncached(
+        self, texts: List[str]
+    ) -> Union[List[List[float]], np.ndarray]:
+        batches = self.__get_batches(texts=texts)
+        if len(batches) <= 1:
+            return self.__vectorize(texts=texts)
+
+        batch_texts = [[texts[idx] for idx in batch] for batch in batches]
+        if self.__executor is None:
+            batch_results = [self.__vectorize(texts=chunk) for chunk in batch_texts]
+        else:
+            batch_results = self.__executor.map(
+                lambda chunk: self.__vectorize(texts=chunk), batch_texts
+            )
+        return self.__collate(
+            num_texts=len(texts), batches=batches, batch_results=batch_results
+        )
+
+    async def __aencode_uncached(
+        self, texts: List[str]
+    ) -> Union[List[List[float]], np.ndarray]:
+        batches = self.__get_batches(texts=texts)
+        if len(batches) <= 1:
+            return await self.__avectorize(texts=texts)
+
+        batch_results = await asyncio.gather(
+            *[
+                self.__avectorize(texts=[texts[idx] for idx in batch])
+                for batch in batches
+            ]
+        )
+        return self.__collate(
+            num_texts=len(texts), batches=batches, batch_results=batch_results
+        )
+
+    def __get_batches(self, texts: List[str]) -> List[List[int]]:
+        if not self.__max_batch_size and not self.__max_tokens_per_batch:
+            return [list(range(len(texts)))]
+        return make_batches(
+            texts=texts,
+            max_batch_size=self.__max_batch_size,
+            max_tokens_per_batch=self.__max_tokens_per_batch,
+        )
+
+    def __collate(
+        self,
+        num_texts: int,
+        batches: List[List[int]],
+        batch_results: Iterable[Union[List[List[float]], np.ndarray]],
+    ) -> Union[List[List[float]], np.ndarray]:
+        result = None
+        for batch, embeddings in zip(batches, batch_results):
+            if isinstance(embeddings, np.ndarray):
+                if result is None:
+                    result = np.empty(
+                        (num_texts, embeddings.shape[1]), dtype=np.float32
+                    )
+                result[batch] = embeddings
+            else:
+                if result is None:
+                    result = [None] * num_texts
+                for idx, embedding in zip(batch, embeddings):
+                    result[idx] = embedding
+        return result
+
+    def __vectorize(self, texts: List[str]) -> Union[List[List[float]], np.ndarray]:
+        response = self.__get_client().post(
+            url="/vectorize",
+            endpoints=self.__endpoints,
+            params={
+                "model_name": self.model_name,
+            },
+            coalesce=True,
+            **self.__get_request_body(texts=texts),
+        )
+        return self.__parse_response(response=response, num_texts=len(texts))
+
+    async def __avectorize(
+        self, texts: List[str]
+    ) -> Union[List[List[float]], np.ndarray]:
+        response = await self.__get_client().apost(
+            url="/vectorize",
+            endpoints=self.__endpoints,
             params={
                 "model_name": self.model_name,
             },
-            json=texts,
+            coalesce=True,
+            **self.__get_request_body(texts=texts),
         )
+        return self.__parse_response(response=response, num_texts=len(texts))
+
+    def __parse_response(
+        self, response, num_texts: int
+    ) -> Union[List[List[float]], np.ndarray]:
         if response.status_code == 200:
-            result = response.json()
+            if self.__is_binary_response(response=response):
+                result = self.__parse_binary_response(
+                    content=response.content, num_texts=num_texts
+                )
+            else:
+                result = response.json()
         else:
             raise ValueError(response.json())
 
         return result
+
+    def __get_request_body(self, texts: List[str]) -> dict:
+        headers = {}
+        if self.__binary_transport:
+            headers["Accept"] = "application/octet-stream"
+
+        if self.__compress_requests:
+            headers["Content-Type"] = "application/json"
+            headers["Content-Encoding"] = "gzip"
+            body = {"data": gzip.compress(json.dumps(texts).encode("utf-8"))}
+        else:
+            body = {"json": texts}
+
+        if headers:
+            body["headers"] = headers
+        return body
+
+    def __is_binary_response(self, response) -> bool:
+        # servers without binary support answer with JSON, which is parsed as usual
+        content_type = response.headers.get("Content-Type", "")
+        return self.__binary_transport and content_type.startswith(
+            "application/octet-stream"
+        )
+
+    def __parse_binary_response(self, content: bytes, num_texts: int) -> np.ndarray:
+        if content[:6] == b"\x93NUMPY":
+            embeddings = np.load(io.BytesIO(content), allow_pickle=False)
+            return np.ascontiguousarray(embeddings, dtype=np.float32)
+        # one copy to get a writable array, parsing JSON floats costs several
+        embeddings = np.frombuffer(content, dtype="<f4").copy()
+        return embeddings.reshape(num_texts, -1)
@@ -1,3 +1,4 @@
+import asyncio
 from abc import ABC, abstractmethod
 from typing import List
 
@@ -5,3 +6,6 @@ from typing import List
 class Generator(ABC):
     @abstractmethod
     def generate(self, texts: List[str]) -> List[str]: ...
+
+    async def agenerate(self, texts: List[str]) -> List[str]:
+        return await asyncio.to_thread(self.generate, texts)
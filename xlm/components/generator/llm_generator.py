@@ -1,86 +1,285 @@
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import List, Dict
-from requests import Session
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Any, Callable, List, Dict, Optional, Tuple, Union
+from aiohttp import ClientError
+from requests import RequestException, Session
 
 from xlm.components.generator.generator import Generator
+from xlm.components.generator.response_cache import ResponseCache
+from xlm.components.client.endpoint_pool import EndpointPool, as_endpoint_pool
+from xlm.components.client.lms_client import (
+    LMSClient,
+    get_client,
+    get_default_client,
+)
 from xlm.registry import DEFAULT_LMS_ENDPOINT
+from xlm.utils.batching import deduplicate
 
 
 class LLMGenerator(Generator):
     def __init__(
         self,
         model_name: str,
-        session: Session = Session(),
-        endpoint: str = DEFAULT_LMS_ENDPOINT,
+        session: Optional[Session] = None,
+        endpoint: Union[str, List[str], EndpointPool] = DEFAULT_LMS_ENDPOINT,
         max_new_tokens: int = 100,
         split_lines: bool = True,
         temperature: float = 0,
         frequency_penalty: float = 2.0,
         presence_penalty: float = 2.0,
-        num_threads: int = 10,
+        num_threads: int = 64,
+        client: Optional[LMSClient] = None,
+        batch_size: int = 1,
+        cache: Optional[ResponseCache] = None,
     ):
-        self.__session = session
-        self.__endpoint = endpoint
+        """
+        Requests are sent with `client`, or with the client shared by all components
+        passing the same `session`, or else with the default client. Passing both a
+        session and a client raises a ValueError.
+        """
+        self.__client = get_client(session=session, client=client)
+        self.__endpoints = as_endpoint_pool(endpoint)
         self.__max_new_tokens = max_new_tokens
         self.__split_lines = split_lines
         self.__temperature = temperature
         self.__frequency_penalty = frequency_penalty
         self.__presence_penalty = presence_penalty
         self.__num_threads = num_threads
+        self.__batch_size = batch_size
+        self.__cache = cache
+        self.__executor = (
+            ThreadPoolExecutor(max_workers=num_threads) if num_threads > 1 else None
+        )
+        self.__lock = Lock()
+        self.__num_saved_calls = 0
         self.model_name = model_name
 
+    @property
+    def num_threads(self) -> int:
+        return self.__num_threads
+
+    @property
+    def cache(self) -> Optional[ResponseCache]:
+        return self.__cache
+
+    @property
+    def num_saved_calls(self) -> int:
+        """
+        Number of prompts that were not sent to the LMS because an identical prompt
+        was part of the same `generate` call.
+        """
+        return self.__num_saved_calls
+
     def generate(self, texts: List[str]) -> List[str]:
-        if self.__num_threads == 1:
-            return [
-                self.__generate(text=text, model_name=self.model_name) for text in texts
-            ]
-        else:
-            return self.__generate_multi_thread(texts=texts, model_name=self.model_name)
+        unique_texts, inverse = self.__deduplicate(texts=texts)
+        if not self.__use_cache():
+            responses = self.__generate_unique(texts=unique_texts)
+            return [responses[idx] for idx in inverse]
+
+        responses, missing_texts = self.__lookup_cache(texts=unique_texts)
+        if missing_texts:
+            self.__update_cache(
+                responses=responses,
+                texts=missing_texts,
+                new_responses=self.__generate_unique(texts=missing_texts),
+            )
+        return [responses[unique_texts[idx]] for idx in inverse]
+
+    async def agenerate(self, texts: List[str]) -> List[str]:
+        unique_texts, inverse = self.__deduplicate(texts=texts)
+        if not self.__use_cache():
+            responses = await self.__agenerate_unique(texts=unique_texts)
+            return [responses[idx] for idx in inverse]
+
+        responses, missing_texts = self.__lookup_cache(texts=unique_texts)
+        if missing_texts:
+            self.__update_cache(
+                responses=responses,
+                texts=missing_texts,
+                new_responses=await self.__agenerate_unique(texts=missing_texts),
+            )
+        return [responses[unique_texts[idx]] for idx in inverse]
+
+    async def aclose(self):
+        await self.__get_client().aclose()
+
+    def __get_client(self) -> LMSClient:
+        return self.__client or get_default_client()
+
+    def __use_cache(self) -> bool:
+        # sampled responses are not reproducible, so they are never cached
+        return self.__cache is not None and self.__is_deterministic()
+
+    def __is_deterministic(self) -> bool:
+        return self.__temperature <= 0
+
+    def __lookup_cache(self, texts: List[str]) -> Tuple[Dict[str, str], List[str]]:
+        responses = self.__cache.get_many(
+            params=self.__get_params(model_name=self.model_name), texts=texts
+        )
+        missing_texts = [text for text in texts if text not in responses]
+        return responses, missing_texts
+
+    def __update_cache(
+        self, responses: Dict[str, str], texts: List[str], new_responses: List[str]
+    ):
+        self.__cache.put_many(
+            params=self.__get_params(model_name=self.model_name),
+            texts=texts,
+            responses=new_responses,
+        )
+        responses.update(zip(texts, new_responses))
+
+    def __generate_unique(self, texts: List[str]) -> List[str]:
+        if self.__batch_size > 1:
+            return self.__generate_batched(texts=texts, model_name=self.model_name)
+        return self.__map(
+            lambda text: self.__generate(text=text, model_name=self.model_name),
+            texts,
+        )
+
+    async def __agenerate_unique(self, texts: List[str]) -> List[str]:
+        if self.__batch_size > 1:
+            batches = await asyncio.gather(
+                *[
+                    self.__agenerate_batch(texts=batch, model_name=self.model_name)
+                    for batch in self.__get_batches(texts=texts)
+                ]
+            )
+            return [response for batch in batches for response in batch]
+        return list(
+            await asyncio.gather(
+                *[
+                    self.__agenerate(text=text, model_name=self.model_name)
+                    for text in texts
+                ]
+            )
+        )
+
+    def __deduplicate(self, texts: List[str]) -> Tuple[List[str], List[int]]:
+        # before the cache lookup, so that duplicates are counted with and without it
+        unique_texts, inverse = deduplicate(texts=texts)
+        with self.__lock:
+            self.__num_saved_calls += len(texts) - len(unique_texts)
+        return unique_texts, inverse
+
+    def __map(self, fn: Callable, items: List) -> List:
+        if self.__executor is None or len(items) <= 1:
+            return [fn(item) for item in items]
+        return list(self.__executor.map(fn, items))
 
     def __generate(
         self,
         text: str,
         model_name: str,
     ) -> str:
-        response = self.__session.post(
-            url=f"{self.__endpoint}/generate",
-            params={
-                "model_name": model_name,
-                "max_new_tokens": self.__max_new_tokens,
-                "split_lines": self.__split_lines,
-                "temperature": self.__temperature,
-                "frequency_penalty": self.__frequency_penalty,
-                "presence_penalty": self.__presence_penalty,
-            },
+        response = self.__get_client().post(
+            url="/generate",
+            endpoints=self.__endpoints,
+            params=self.__get_params(model_name=model_name),
             json=[text],
+            coalesce=self.__is_deterministic(),
         )
+        return self.__parse_response(response=response)[0]
 
-        if response.status_code == 200:
-            result = response.json()
-            return result[0]
+    async def __agenerate(
+        self,
+        text: str,
+        model_name: str,
+    ) -> str:
+        response = await self.__get_client().apost(
+            url="/generate",
+            endpoints=self.__endpoints,
+            params=self.__get_params(model_name=model_name),
+            json=[text],
+            coalesce=self.__is_deterministic(),
+        )
+        return self.__parse_response(response=response)[0]
+
+    def __generate_batched(self, texts: List[str], model_name: str) -> List[str]:
+        results = self.__map(
+            lambda batch: self.__generate_batch(texts=batch, model_name=model_name),
+            self.__get_batches(texts=texts),
+        )
+        return [response for batch in results for response in batch]
+
+    def __generate_batch(self, texts: List[str], model_name: str) -> List[str]:
+        try:
+            response = self.__get_client().post(
+                url="/generate",
+                endpoints=self.__endpoints,
+                params=self.__get_params(model_name=model_name),
+                json=texts,
+                coalesce=self.__is_deterministic(),
+            )
+        except RequestException as e:
+            error = e
         else:
-            raise ValueError(response.json())
+            try:
+                return self.__parse_batch_response(response=response, texts=texts)
+            except ValueError as e:
+                error = e
+        self.__warn_batch_fallback(texts=texts, error=error)
+        return [self.__generate(text=text, model_name=model_name) for text in texts]
 
-    def __generate_multi_thread(self, texts: List[str], model_name: str) -> List[str]:
-        with ThreadPoolExecutor(max_workers=self.__num_threads) as executor:
-            futures = [
-                executor.submit(self.__run_generator, input_text, model_name)
-                for input_text in texts
-            ]
-        result = [future.result() for future in as_completed(futures)]
-        responses_dict = {
-            list(res.items())[0][0]: list(res.items())[0][1] for res in result
-        }
-        responses = self.__collate(responses_dict=responses_dict, inputs=texts)
-        return responses
+    async def __agenerate_batch(self, texts: List[str], model_name: str) -> List[str]:
+        try:
+            response = await self.__get_client().apost(
+                url="/generate",
+                endpoints=self.__endpoints,
+                params=self.__get_params(model_name=model_name),
+                json=texts,
+                coalesce=self.__is_deterministic(),
+            )
+        except (ClientError, asyncio.TimeoutError) as e:
+            error = e
+        else:
+            try:
+                return self.__parse_batch_response(response=response, texts=texts)
+            except ValueError as e:
+                error = e
+        self.__warn_batch_fallback(texts=texts, error=error)
+        return list(
+            await asyncio.gather(
+                *[self.__agenerate(text=text, model_name=model_name) for text in texts]
+            )
+        )
 
-    def __run_generator(self, input_text: str, model_name: str) -> Dict[str, str]:
-        response = self.__generate(text=input_text, model_name=model_name)
-        return {input_text: response}
+    def __parse_batch_response(self, response, texts: List[str]) -> List[str]:
+        # raises a ValueError if the LMS rejected the batch, e.g. a model that takes a
+        # single prompt, or did not answer with one response per prompt
+        result = self.__parse_response(response=response)
+        if not isinstance(result, list) or len(result) != len(texts):
+            raise ValueError(
+                f"Expected {len(texts)} generated responses, got: {result}"
+            )
+        return result
 
-    def __collate(
-        self,
-        responses_dict: Dict[str, str],
-        inputs: List[str],
-    ):
-        return [responses_dict[inp] for inp in inputs]
+    def __warn_batch_fallback(self, texts: List[str], error: Exception):
+        print(
+            f"Warning: batched generation of {len(texts)} prompts failed ({error}), "
+            f"falling back to one request per prompt."
+        )
+
+    def __get_batches(self, texts: List[str]) -> List[List[str]]:
+        return [
+            texts[start : start + self.__batch_size]
+            for start in range(0, len(texts), self.__batch_size)
+        ]
+
+    def __get_params(self, model_name: str) -> Dict[str, Any]:
+        return {
+            "model_name": model_name,
+            "max_new_tokens": self.__max_new_tokens,
+            "split_lines": self.__split_lines,
+            "temperature": self.__temperature,
+            "frequency_penalty": self.__frequency_penalty,
+            "presence_penalty": self.__presence_penalty,
+        }
+
+    def __parse_response(self, response) -> List[str]:
+        if response.status_code == 200:
+            return response.json()
+        else:
+            raise ValueError(response.json())
@@ -0,0 +1,42 @@
+from typing import Any, Dict, List, Optional
+
+from xlm.utils.cache import TieredCache, hash_key
+
+
+class ResponseCache:
+    """
+    Cache for generated responses, keyed by a hash of the generation parameters
+    (model name, sampling settings, ...) and the prompt. Kept in a bounded in-memory
+    LRU and optionally persisted in a SQLite file at `path`.
+    """
+
+    def __init__(self, max_size: int = 10000, path: Optional[str] = None):
+        self.__cache = TieredCache(
+            serialize=lambda response: response.encode("utf-8"),
+            deserialize=lambda raw: raw.decode("utf-8"),
+            max_size=max_size,
+            path=path,
+        )
+
+    @property
+    def stats(self):
+        return self.__cache.stats
+
+    def get_many(self, params: Dict[str, Any], texts: List[str]) -> Dict[str, str]:
+        keys = {self.__get_key(params=params, text=text): text for text in texts}
+        found = self.__cache.get_many(keys=keys.keys())
+        return {keys[key]: response for key, response in found.items()}
+
+    def put_many(self, params: Dict[str, Any], texts: List[str], responses: List[str]):
+        self.__cache.put_many(
+            {
+                self.__get_key(params=params, text=text): response
+                for text, response in zip(texts, responses)
+            }
+        )
+
+    def __get_key(self, params: Dict[str, Any], text: str) -> str:
+        return hash_key(*sorted(params.items()), text)
+
+    def __len__(self) -> int:
+        return len(self.__cache)
@@ -1,3 +1,5 @@
+from typing import List
+
 from xlm.components.generator.generator import Generator
 from xlm.components.retriever.retriever import Retriever
 from xlm.dto.dto import RagOutput
@@ -21,19 +23,85 @@ class RagSystem:
             text=user_input, top_k=self.retriever_top_k, return_scores=True
         )
 
-        prompt = self.prompt_template.format(
-            context="\n".join(retrieved_documents), question=user_input
+        prompt = self.get_prompt(
+            user_input=user_input, retrieved_documents=retrieved_documents
         )
 
         generated_responses = self.generator.generate(texts=[prompt])
 
+        return self.get_rag_output(
+            retrieved_documents=retrieved_documents,
+            retriever_scores=retriever_scores,
+            prompt=prompt,
+            generated_responses=generated_responses,
+        )
+
+    def run_batch(self, user_inputs: List[str]) -> List[RagOutput]:
+        """
+        Runs several questions at once: their documents are retrieved with one
+        `retrieve_batch` call and all prompts are sent to the generator together.
+        """
+        retrieved = self.retriever.retrieve_batch(
+            texts=user_inputs, top_k=self.retriever_top_k, return_scores=True
+        )
+        prompts = [
+            self.get_prompt(user_input=user_input, retrieved_documents=documents)
+            for user_input, (documents, _) in zip(user_inputs, retrieved)
+        ]
+
+        generated_responses = self.generator.generate(texts=prompts)
+
+        return [
+            self.get_rag_output(
+                retrieved_documents=documents,
+                retriever_scores=scores,
+                prompt=prompt,
+                generated_responses=[generated_response],
+            )
+            for (documents, scores), prompt, generated_response in zip(
+                retrieved, prompts, generated_responses
+            )
+        ]
+
+    async def arun(self, user_input: str) -> RagOutput:
+        retrieved_documents, retriever_scores = await self.retriever.aretrieve(
+            text=user_input, top_k=self.retriever_top_k, return_scores=True
+        )
+
+        prompt = self.get_prompt(
+            user_input=user_input, retrieved_documents=retrieved_documents
+        )
+
+        generated_responses = await self.generator.agenerate(texts=[prompt])
+
+        return self.get_rag_output(
+            retrieved_documents=retrieved_documents,
+            retriever_scores=retriever_scores,
+            prompt=prompt,
+            generated_responses=generated_responses,
+        )
+
+    def get_prompt(self, user_input: str, retrieved_documents: List[str]) -> str:
+        return self.prompt_template.format(
+            context="\n".join(retrieved_documents), question=user_input
+        )
+
+    def get_rag_output(
+        self,
+        retrieved_documents: List[str],
+        retriever_scores: List[float],
+        prompt: str,
+        generated_responses: List[str],
+    ) -> RagOutput:
+        # a BM25-only retriever has no encoder
+        encoder = getattr(self.retriever, "encoder", None)
         return RagOutput(
             retrieved_documents=retrieved_documents,
             retriever_scores=retriever_scores,
             prompt=prompt,
             generated_responses=generated_responses,
             metadata=dict(
-                retriever_model_name=self.retriever.encoder.model_name,
+                retriever_model_name=encoder.model_name if encoder else None,
                 top_k=self.retriever_top_k,
                 generator_model_name=self.generator.model_name,
                 prompt_template=self.prompt_template,
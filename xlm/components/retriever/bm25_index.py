@@ -0,0 +1,179 @@
+import re
+from collections import Counter
+from threading import Lock
+from typing import Dict, List, Set, Tuple
+
+import numpy as np
+
+from xlm.utils.vectors import top_k as select_top_k
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    In-memory inverted index with Okapi BM25 scoring. The postings of all terms are
+    stored as one CSR structure: the documents and term frequencies of a term are a
+    contiguous slice, so a query only touches the postings of its own terms. Added
+    documents are merged into the postings on the next search. The index is safe to
+    use from several threads.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        # guards the postings, so that concurrent first searches merge them once
+        self.__lock = Lock()
+        self.__reset()
+
+    def build(self, documents: List[str]):
+        with self.__lock:
+            self.__reset()
+            self.__add(documents)
+
+    def add(self, documents: List[str]):
+        """
+        Appends documents, their ids follow the existing ones.
+        """
+        with self.__lock:
+            self.__add(documents)
+
+    def search(self, query: str, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns
+        -------
+        Tuple[np.ndarray, np.ndarray] Ids and BM25 scores of the at most `top_k`
+        documents sharing a term with `query`, best first.
+        """
+        with self.__lock:
+            self.__merge_pending()
+            return self.__search(query=query, top_k=top_k)
+
+    def score_documents(self, query: str, documents: List[str]) -> np.ndarray:
+        """
+        BM25 scores of `documents` that are not part of the index, with the term and
+        length statistics of the indexed documents.
+
+        Returns
+        -------
+        np.ndarray The score of every document, in the order of `documents`.
+        """
+        with self.__lock:
+            self.__merge_pending()
+            return self.__score_documents(query=query, documents=documents)
+
+    def __len__(self) -> int:
+        return len(self.__document_lengths)
+
+    def __add(self, documents: List[str]):
+        for document in documents:
+            terms = [
+                self.__vocabulary.setdefault(token, len(self.__vocabulary))
+                for token in tokenize(document)
+            ]
+            term_ids, frequencies = np.unique(
+                np.array(terms, dtype=np.int64), return_counts=True
+            )
+            document_ids = np.full(
+                len(term_ids), len(self.__document_lengths), dtype=np.int64
+            )
+            self.__pending.append((term_ids, document_ids, frequencies))
+            self.__document_lengths.append(len(terms))
+
+    def __search(self, query: str, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        term_ids = self.__get_term_ids(query)
+        if not term_ids:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        documents, scores = [], []
+        for term_id in term_ids:
+            start, end = self.__offsets[term_id], self.__offsets[term_id + 1]
+            postings = self.__postings[start:end]
+            documents.append(postings)
+            scores.append(
+                self.__score(
+                    term_ids=term_id,
+                    frequencies=self.__frequencies[start:end],
+                    lengths=self.__lengths[postings],
+                )
+            )
+
+        # sum up the scores of every document over the query terms
+        documents, inverse = np.unique(np.concatenate(documents), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(scores)).astype(np.float32)
+        best, best_scores = select_top_k(scores=scores, k=top_k)
+        return documents[best[0]], best_scores[0]
+
+    def __score_documents(self, query: str, documents: List[str]) -> np.ndarray:
+        term_ids = self.__get_term_ids(query)
+        scores = np.zeros(len(documents), dtype=np.float32)
+        for idx, document in enumerate(documents):
+            tokens = tokenize(document)
+            counts = Counter(
+                self.__vocabulary[token]
+                for token in tokens
+                if self.__vocabulary.get(token) in term_ids
+            )
+            if counts:
+                scores[idx] = self.__score(
+                    term_ids=np.array(list(counts.keys()), dtype=np.int64),
+                    frequencies=np.array(list(counts.values()), dtype=np.float32),
+                    lengths=np.float32(len(tokens)),
+                ).sum()
+        return scores
+
+    def __get_term_ids(self, query: str) -> Set[int]:
+        return {
+            self.__vocabulary[token]
+            for token in tokenize(query)
+            if token in self.__vocabulary
+        }
+
+    def __score(
+        self,
+        term_ids: int | np.ndarray,
+        frequencies: np.ndarray,
+        lengths: np.ndarray,
+    ) -> np.ndarray:
+        num_postings = self.__offsets[term_ids + 1] - self.__offsets[term_ids]
+        idf = np.log(
+            1
+            + (len(self.__document_lengths) - num_postings + 0.5) / (num_postings + 0.5)
+        )
+        average_length = max(self.__lengths.mean(), 1e-9)
+        norms = self.k1 * (1 - self.b + self.b * lengths / average_length)
+        return idf * frequencies * (self.k1 + 1) / (frequencies + norms)
+
+    def __reset(self):
+        self.__vocabulary: Dict[str, int] = {}
+        self.__document_lengths: List[int] = []
+        # (term, document, frequency) triples not merged into the postings yet
+        self.__pending: List[Tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+        self.__offsets = np.zeros(1, dtype=np.int64)
+        self.__postings = np.empty(0, dtype=np.int64)
+        self.__frequencies = np.empty(0, dtype=np.float32)
+        self.__lengths = np.empty(0, dtype=np.float32)
+
+    def __merge_pending(self):
+        if not self.__pending:
+            return
+        term_ids, document_ids, frequencies = (
+            np.concatenate(arrays) for arrays in zip(*self.__pending)
+        )
+        counts = np.diff(self.__offsets)
+        term_ids = np.concatenate([np.repeat(np.arange(len(counts)), counts), term_ids])
+        document_ids = np.concatenate([self.__postings, document_ids])
+        frequencies = np.concatenate([self.__frequencies, frequencies])
+
+        # postings stay sorted by term, then by document
+        order = np.lexsort((document_ids, term_ids))
+        self.__postings = document_ids[order]
+        self.__frequencies = frequencies[order].astype(np.float32)
+        counts = np.bincount(term_ids, minlength=len(self.__vocabulary))
+        self.__offsets = np.concatenate([[0], np.cumsum(counts)])
+        self.__lengths = np.array(self.__document_lengths, dtype=np.float32)
+        self.__pending = []
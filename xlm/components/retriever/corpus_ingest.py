@@ -0,0 +1,192 @@
+import hashlib
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from xlm.components.encoder.encoder import Encoder
+from xlm.components.retriever.corpus_store import (
+    CorpusStore,
+    CorpusStoreWriter,
+    fingerprint_file,
+    stat_file,
+)
+from xlm.dto.dto import IngestProgress
+
+
+def split_passages(text: str, max_tokens: int, overlap: int = 0) -> List[str]:
+    """
+    Splits `text` into passages of at most `max_tokens` whitespace-separated tokens,
+    consecutive passages sharing `overlap` tokens. Texts within the budget are
+    returned as they are.
+    """
+    if overlap >= max_tokens:
+        raise ValueError(f"Overlap {overlap} must be smaller than {max_tokens}.")
+    tokens = text.split()
+    if len(tokens) <= max_tokens:
+        return [text] if tokens else []
+    stride = max_tokens - overlap
+    return [
+        " ".join(tokens[start : start + max_tokens])
+        for start in range(0, len(tokens) - overlap, stride)
+    ]
+
+
+def print_progress(progress: IngestProgress):
+    total = f"/{progress.total_bytes}" if progress.total_bytes else ""
+    print(
+        f"Ingested {progress.num_passages} passages "
+        f"({progress.num_duplicates} duplicates skipped, "
+        f"{progress.num_bytes_read}{total} bytes read) "
+        f"in {progress.elapsed_seconds:.1f}s, "
+        f"{progress.passages_per_second:.1f} passages/s"
+    )
+
+
+class CorpusIngester:
+    """
+    Streams a text file into a corpus store without holding it in memory: every
+    non-empty line is split into overlapping passages of at most `max_tokens` tokens,
+    repeated passages are skipped, and batches of `batch_size` passages are encoded by
+    `num_workers` threads while earlier batches are written to the store. At most
+    twice `num_workers` batches are in flight, which bounds the memory independently
+    of the size of the file. Progress is reported every `report_interval` seconds.
+    """
+
+    def __init__(
+        self,
+        encoder: Encoder,
+        max_tokens: int = 192,
+        overlap: int = 32,
+        batch_size: int = 256,
+        num_workers: int = 4,
+        report_interval: float = 10.0,
+        progress_callback: Optional[Callable[[IngestProgress], None]] = print_progress,
+    ):
+        if overlap >= max_tokens:
+            raise ValueError(f"Overlap {overlap} must be smaller than {max_tokens}.")
+        self.encoder = encoder
+        self.max_tokens = max_tokens
+        self.overlap = overlap
+        self.batch_size = batch_size
+        self.num_workers = num_workers
+        self.report_interval = report_interval
+        self.progress_callback = progress_callback
+
+    def fingerprint(self, data_path: str) -> str:
+        """
+        Fingerprint of the file and the passage settings, a store built with other
+        settings does not match.
+        """
+        return (
+            f"{fingerprint_file(data_path)}:passages={self.max_tokens},{self.overlap}"
+        )
+
+    def stat(self, data_path: str) -> Dict[str, Any]:
+        """
+        Size and modification time of the file with the passage settings, a cheap
+        check whether a store still matches that does not read the file.
+        """
+        return {**stat_file(data_path), "passages": [self.max_tokens, self.overlap]}
+
+    def iter_passages(self, data_path: str) -> Iterator[str]:
+        return self.__iter_passages(data_path=data_path)
+
+    def read_passages(self, data_path: str) -> List[str]:
+        return list(self.iter_passages(data_path=data_path))
+
+    def ingest(self, data_path: str, store_path: str) -> CorpusStore:
+        """
+        Returns
+        -------
+        CorpusStore The store written to `store_path`, which is only replaced once
+        all passages are encoded.
+        """
+        # taken before reading, so that a store is not reused after a change that
+        # raced with ingesting
+        source_stat = self.stat(data_path)
+        progress = IngestProgress(total_bytes=source_stat["size"])
+        start = time.perf_counter()
+        last_report = start
+        pending = deque()
+
+        def write(writer: CorpusStoreWriter):
+            passages, future = pending.popleft()
+            writer.add(documents=passages, embeddings=future.result())
+            progress.num_passages += len(passages)
+
+        with ThreadPoolExecutor(max_workers=self.num_workers) as executor:
+            try:
+                with CorpusStoreWriter(
+                    path=store_path,
+                    model_name=self.encoder.model_name,
+                    source_fingerprint=self.fingerprint(data_path),
+                    source_stat=source_stat,
+                ) as writer:
+                    for passages in self.__iter_batches(
+                        data_path=data_path, progress=progress
+                    ):
+                        future = executor.submit(
+                            self.encoder.encode_array, texts=passages
+                        )
+                        pending.append((passages, future))
+                        # batches are written in order, so that encoding one slow
+                        # batch does not let the others pile up in memory
+                        while len(pending) >= 2 * self.num_workers:
+                            write(writer)
+                        if time.perf_counter() - last_report >= self.report_interval:
+                            last_report = time.perf_counter()
+                            self.__report(progress=progress, start=start)
+                    while pending:
+                        write(writer)
+            finally:
+                for _, future in pending:
+                    future.cancel()
+
+        self.__report(progress=progress, start=start)
+        return CorpusStore(store_path)
+
+    def __iter_batches(
+        self, data_path: str, progress: IngestProgress
+    ) -> Iterator[List[str]]:
+        batch = []
+        for passage in self.__iter_passages(data_path=data_path, progress=progress):
+            batch.append(passage)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def __iter_passages(
+        self, data_path: str, progress: Optional[IngestProgress] = None
+    ) -> Iterator[str]:
+        # 16 byte digests instead of the passages keep the memory for deduplication
+        # small even for large corpora
+        seen = set()
+        with open(data_path, "rb") as f:
+            for line in f:
+                if progress is not None:
+                    progress.num_bytes_read += len(line)
+                for passage in split_passages(
+                    line.decode("utf-8").strip(),
+                    max_tokens=self.max_tokens,
+                    overlap=self.overlap,
+                ):
+                    digest = hashlib.blake2b(
+                        passage.encode("utf-8"), digest_size=16
+                    ).digest()
+                    if digest in seen:
+                        if progress is not None:
+                            progress.num_duplicates += 1
+                        continue
+                    seen.add(digest)
+                    yield passage
+
+    def __report(self, progress: IngestProgress, start: float):
+        progress.elapsed_seconds = time.perf_counter() - start
+        progress.passages_per_second = progress.num_passages / max(
+            progress.elapsed_seconds, 1e-9
+        )
+        if self.progress_callback is not None:
+            self.progress_callback(progress)
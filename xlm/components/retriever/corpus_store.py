@@ -0,0 +1,274 @@
+import hashlib
+import json
+import os
+import shutil
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from xlm.utils.vectors import normalize_rows
+
+FORMAT_VERSION = 1
+META_FILE = "meta.json"
+EMBEDDINGS_FILE = "embeddings.f32"
+DOCUMENTS_FILE = "documents.utf8"
+OFFSETS_FILE = "offsets.i64"
+
+
+def fingerprint_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def stat_file(path: str) -> Dict[str, int]:
+    """
+    Size and modification time of a file, which change with its contents but are
+    read without reading the file.
+    """
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+class DocumentList(Sequence):
+    """
+    Read-only list of the documents of a corpus store, decoded from the memory-mapped
+    UTF-8 blob on access.
+    """
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.__blob = blob
+        self.__offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.__offsets) - 1
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(idx)
+        start, end = self.__offsets[idx], self.__offsets[idx + 1]
+        return self.__blob[start:end].tobytes().decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        return (self[idx] for idx in range(len(self)))
+
+
+class CorpusStore:
+    """
+    Corpus persisted in a directory: the documents as one UTF-8 blob with offsets,
+    their L2-normalized float32 embeddings as a raw row-major matrix and a
+    `meta.json` with the encoder model name, the dimension and an optional
+    fingerprint and stat of the source the corpus was built from. All files are
+    opened as read-only memory maps, so opening a store does not read it and
+    processes opening the same store share the page cache.
+    """
+
+    def __init__(self, path: str):
+        self.__path = path
+        with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+            self.__meta = json.load(f)
+        if self.__meta.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported corpus store format: {self.__meta}")
+
+        num_documents = self.__meta["num_documents"]
+        dimension = self.__meta["dimension"]
+        self.__embeddings = self.__open(
+            EMBEDDINGS_FILE, dtype="<f4", shape=(num_documents, dimension)
+        )
+        offsets = self.__open(OFFSETS_FILE, dtype="<i8", shape=(num_documents + 1,))
+        blob = self.__open(DOCUMENTS_FILE, dtype=np.uint8, shape=(int(offsets[-1]),))
+        self.__documents = DocumentList(blob=blob, offsets=offsets)
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.isfile(os.path.join(path, META_FILE))
+
+    @classmethod
+    def create(
+        cls,
+        path: str,
+        documents: List[str],
+        embeddings: List[List[float]] | np.ndarray,
+        model_name: str,
+        source_fingerprint: Optional[str] = None,
+        source_stat: Optional[Dict[str, Any]] = None,
+    ) -> "CorpusStore":
+        with CorpusStoreWriter(
+            path=path,
+            model_name=model_name,
+            source_fingerprint=source_fingerprint,
+            source_stat=source_stat,
+        ) as writer:
+            writer.add(documents=documents, embeddings=embeddings)
+        return cls(path)
+
+    @property
+    def path(self) -> str:
+        return self.__path
+
+    @property
+    def documents(self) -> DocumentList:
+        return self.__documents
+
+    @property
+    def embeddings(self) -> np.ndarray:
+        """
+        Returns
+        -------
+        np.ndarray Read-only memory map of the L2-normalized float32 embeddings.
+        """
+        return self.__embeddings
+
+    @property
+    def model_name(self) -> str:
+        return self.__meta["model_name"]
+
+    @property
+    def source_fingerprint(self) -> Optional[str]:
+        return self.__meta.get("source_fingerprint")
+
+    @property
+    def source_stat(self) -> Optional[Dict[str, Any]]:
+        return self.__meta.get("source_stat")
+
+    def matches(
+        self,
+        model_name: str,
+        source_fingerprint: Optional[str] = None,
+        source_stat: Optional[Dict[str, Any]] = None,
+    ) -> bool:
+        """
+        Whether the store was built by `model_name` from the source with the given
+        fingerprint and stat, i.e. can be used instead of encoding the source again.
+        Comparing the stat is cheap, computing a fingerprint reads the whole source.
+        """
+        return (
+            self.model_name == model_name
+            and (
+                source_fingerprint is None
+                or self.source_fingerprint == source_fingerprint
+            )
+            and (source_stat is None or self.source_stat == source_stat)
+        )
+
+    def __len__(self) -> int:
+        return len(self.__documents)
+
+    def __open(self, name: str, dtype, shape) -> np.ndarray:
+        # numpy cannot map empty files
+        if np.prod(shape) == 0:
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(
+            os.path.join(self.__path, name), dtype=dtype, mode="r", shape=shape
+        )
+
+
+class CorpusStoreWriter:
+    """
+    Writes a corpus store incrementally, so that a corpus never has to be held in
+    memory as a whole. The store is written to a temporary directory that replaces
+    `path` on `close`; readers never see a partially written store.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        model_name: str,
+        source_fingerprint: Optional[str] = None,
+        source_stat: Optional[Dict[str, Any]] = None,
+    ):
+        self.__path = path
+        self.__partial_path = f"{path}.partial"
+        self.__model_name = model_name
+        self.__source_fingerprint = source_fingerprint
+        self.__source_stat = source_stat
+        self.__dimension: Optional[int] = None
+        self.__num_documents = 0
+        self.__num_bytes = 0
+
+        shutil.rmtree(self.__partial_path, ignore_errors=True)
+        os.makedirs(self.__partial_path)
+        self.__embeddings_file = open(self.__get_path(EMBEDDINGS_FILE), "wb")
+        self.__documents_file = open(self.__get_path(DOCUMENTS_FILE), "wb")
+        self.__offsets_file = open(self.__get_path(OFFSETS_FILE), "wb")
+        self.__offsets_file.write(np.zeros(1, dtype=np.int64).tobytes())
+
+    @property
+    def num_documents(self) -> int:
+        return self.__num_documents
+
+    def add(self, documents: List[str], embeddings: List[List[float]] | np.ndarray):
+        embeddings = normalize_rows(embeddings)
+        if len(documents) != len(embeddings):
+            raise ValueError(
+                f"Got {len(documents)} documents but {len(embeddings)} embeddings."
+            )
+        if not documents:
+            return
+        if self.__dimension is None:
+            self.__dimension = embeddings.shape[1]
+        elif embeddings.shape[1] != self.__dimension:
+            raise ValueError(
+                f"Expected embeddings of dimension {self.__dimension}, "
+                f"got {embeddings.shape[1]}."
+            )
+
+        encoded_documents = [document.encode("utf-8") for document in documents]
+        offsets = self.__num_bytes + np.cumsum(
+            [len(document) for document in encoded_documents], dtype=np.int64
+        )
+        self.__embeddings_file.write(embeddings.astype("<f4", copy=False).tobytes())
+        self.__documents_file.write(b"".join(encoded_documents))
+        self.__offsets_file.write(offsets.astype("<i8", copy=False).tobytes())
+        self.__num_documents += len(documents)
+        self.__num_bytes = int(offsets[-1])
+
+    def close(self) -> CorpusStore:
+        self.__close_files()
+        with open(self.__get_path(META_FILE), "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "format_version": FORMAT_VERSION,
+                    "model_name": self.__model_name,
+                    "dimension": self.__dimension or 0,
+                    "num_documents": self.__num_documents,
+                    "source_fingerprint": self.__source_fingerprint,
+                    "source_stat": self.__source_stat,
+                },
+                f,
+            )
+
+        # swap the directories, so that `path` always holds a complete store
+        old_path = f"{self.__path}.old"
+        shutil.rmtree(old_path, ignore_errors=True)
+        if os.path.exists(self.__path):
+            os.rename(self.__path, old_path)
+        os.rename(self.__partial_path, self.__path)
+        shutil.rmtree(old_path, ignore_errors=True)
+        return CorpusStore(self.__path)
+
+    def abort(self):
+        self.__close_files()
+        shutil.rmtree(self.__partial_path, ignore_errors=True)
+
+    def __enter__(self) -> "CorpusStoreWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def __close_files(self):
+        for f in (self.__embeddings_file, self.__documents_file, self.__offsets_file):
+            f.close()
+
+    def __get_path(self, name: str) -> str:
+        return os.path.join(self.__partial_path, name)
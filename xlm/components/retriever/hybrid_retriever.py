@@ -0,0 +1,239 @@
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from xlm.components.encoder.encoder import ENCODER_ERRORS, Encoder
+from xlm.components.retriever.bm25_index import BM25Index
+from xlm.components.retriever.retriever import Retriever
+from xlm.utils.vectors import normalize_rows, top_k as select_top_k
+
+
+class HybridRetriever(Retriever):
+    """
+    Two-stage retrieval: BM25 over an in-memory inverted index shortlists
+    `num_candidates` documents and only those are scored against the query embedding.
+    Both scores are fused as `dense_weight * cosine + (1 - dense_weight) * bm25`, with
+    BM25 scaled to [0, 1] by the best candidate. If the shortlist has fewer than
+    `top_k` documents, the whole corpus is scored densely.
+
+    Without an encoder, or while the LMS cannot be reached, documents are ranked by
+    their BM25 scores alone, followed by the documents sharing no term with the query.
+    """
+
+    def __init__(
+        self,
+        encoder: Optional[Encoder],
+        corpus_documents: List[str],
+        corpus_embeddings: Optional[List[List[float]] | np.ndarray] = None,
+        num_candidates: int = 100,
+        dense_weight: float = 0.5,
+        bm25_index: Optional[BM25Index] = None,
+    ):
+        self.encoder = encoder
+        self.corpus_documents = corpus_documents
+        self.num_candidates = num_candidates
+        self.dense_weight = dense_weight
+
+        self.__bm25_index = bm25_index or BM25Index()
+        if len(self.__bm25_index) != len(corpus_documents):
+            self.__bm25_index.build(corpus_documents)
+
+        if corpus_embeddings is None and encoder is not None:
+            corpus_embeddings = encoder.encode_array(texts=corpus_documents)
+        self.__corpus_embeddings = (
+            None if corpus_embeddings is None else normalize_rows(corpus_embeddings)
+        )
+
+    @property
+    def bm25_index(self) -> BM25Index:
+        return self.__bm25_index
+
+    @property
+    def corpus_embeddings(self) -> Optional[np.ndarray]:
+        return self.__corpus_embeddings
+
+    def retrieve(
+        self,
+        text: str,
+        top_k: int = 3,
+        return_scores: bool = False,
+    ) -> List[str] | Tuple[List[str], List[float]]:
+        query_embeddings = None
+        if self.__is_dense():
+            try:
+                query_embeddings = self.encoder.encode_array(texts=[text])
+            except ENCODER_ERRORS as e:
+                self.__warn_fallback(e)
+        return self.__retrieve(
+            text=text,
+            query_embeddings=query_embeddings,
+            top_k=top_k,
+            return_scores=return_scores,
+        )
+
+    async def aretrieve(
+        self,
+        text: str,
+        top_k: int = 3,
+        return_scores: bool = False,
+    ) -> List[str] | Tuple[List[str], List[float]]:
+        query_embeddings = None
+        if self.__is_dense():
+            try:
+                query_embeddings = await self.encoder.aencode_array(texts=[text])
+            except ENCODER_ERRORS as e:
+                self.__warn_fallback(e)
+        return self.__retrieve(
+            text=text,
+            query_embeddings=query_embeddings,
+            top_k=top_k,
+            return_scores=return_scores,
+        )
+
+    def retrieve_batch(
+        self,
+        texts: List[str],
+        top_k: int = 3,
+        return_scores: bool = False,
+    ) -> List[List[str]] | List[Tuple[List[str], List[float]]]:
+        query_embeddings = [None] * len(texts)
+        if self.__is_dense() and texts:
+            try:
+                query_embeddings = self.encoder.encode_array(texts=texts)
+            except ENCODER_ERRORS as e:
+                self.__warn_fallback(e)
+        return [
+            self.__retrieve(
+                text=text,
+                query_embeddings=embeddings,
+                top_k=top_k,
+                return_scores=return_scores,
+            )
+            for text, embeddings in zip(texts, query_embeddings)
+        ]
+
+    def score_documents(
+        self,
+        text: str,
+        documents: List[str],
+        query_embeddings: Optional[List[float] | np.ndarray] = None,
+    ) -> List[float]:
+        """
+        Fused scores of `documents`, which are not added to the corpus, on the scale
+        of `retrieve`: BM25 is scaled by the best score of an indexed document and
+        only BM25 is used while the query cannot be encoded.
+
+        Returns
+        -------
+        List[float] The score of every document, in the order of `documents`.
+        """
+        if not documents:
+            return []
+        sparse_scores = self.__bm25_index.score_documents(
+            query=text, documents=documents
+        )
+        if not self.__is_dense():
+            return sparse_scores.tolist()
+        try:
+            if query_embeddings is None:
+                # the query and the documents in one encoder call
+                embeddings = self.encoder.encode_array(texts=[text] + documents)
+                query_embeddings, document_embeddings = embeddings[:1], embeddings[1:]
+            else:
+                document_embeddings = self.encoder.encode_array(texts=documents)
+        except ENCODER_ERRORS as e:
+            self.__warn_fallback(e)
+            return sparse_scores.tolist()
+
+        dense_scores = (
+            normalize_rows(document_embeddings) @ normalize_rows(query_embeddings)[0]
+        )
+        _, best_sparse_scores = self.__bm25_index.search(query=text, top_k=1)
+        return self.__fuse_scores(
+            dense_scores=dense_scores,
+            sparse_scores=sparse_scores,
+            max_sparse_score=best_sparse_scores.max(initial=0),
+        ).tolist()
+
+    def __retrieve(
+        self,
+        text: str,
+        query_embeddings: Optional[np.ndarray],
+        top_k: int,
+        return_scores: bool,
+    ) -> List[str] | Tuple[List[str], List[float]]:
+        candidates, sparse_scores = self.__bm25_index.search(
+            query=text, top_k=max(top_k, self.num_candidates)
+        )
+        if query_embeddings is None:
+            rows, scores = self.__fill_up(
+                candidates=candidates[:top_k], scores=sparse_scores[:top_k], top_k=top_k
+            )
+        else:
+            rows, scores = self.__fuse(
+                query_embedding=normalize_rows(query_embeddings)[0],
+                candidates=candidates,
+                sparse_scores=sparse_scores,
+                top_k=top_k,
+            )
+
+        documents = [self.corpus_documents[row] for row in rows]
+        if return_scores:
+            return documents, scores.tolist()
+        else:
+            return documents
+
+    def __fuse(
+        self,
+        query_embedding: np.ndarray,
+        candidates: np.ndarray,
+        sparse_scores: np.ndarray,
+        top_k: int,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        if len(candidates) < top_k:
+            all_sparse_scores = np.zeros(len(self.corpus_documents), dtype=np.float32)
+            all_sparse_scores[candidates] = sparse_scores
+            candidates = np.arange(len(self.corpus_documents))
+            sparse_scores = all_sparse_scores
+
+        scores = self.__fuse_scores(
+            dense_scores=self.__corpus_embeddings[candidates] @ query_embedding,
+            sparse_scores=sparse_scores,
+            max_sparse_score=sparse_scores.max(initial=0),
+        )
+        best, best_scores = select_top_k(scores=scores, k=top_k)
+        return candidates[best[0]], best_scores[0]
+
+    def __fill_up(
+        self, candidates: np.ndarray, scores: np.ndarray, top_k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        # documents sharing no term with the query follow with a score of 0 in corpus
+        # order, so that BM25 alone also returns `top_k` documents of a large corpus
+        num_missing = min(top_k, len(self.corpus_documents)) - len(candidates)
+        if num_missing <= 0:
+            return candidates, scores
+        others = np.setdiff1d(
+            np.arange(len(self.corpus_documents)), candidates, assume_unique=True
+        )[:num_missing]
+        return (
+            np.concatenate([candidates, others]),
+            np.concatenate([scores, np.zeros(len(others), dtype=scores.dtype)]),
+        )
+
+    def __fuse_scores(
+        self,
+        dense_scores: np.ndarray,
+        sparse_scores: np.ndarray,
+        max_sparse_score: float,
+    ) -> np.ndarray:
+        if max_sparse_score > 0:
+            sparse_scores = sparse_scores / max_sparse_score
+        return (
+            self.dense_weight * dense_scores + (1 - self.dense_weight) * sparse_scores
+        )
+
+    def __is_dense(self) -> bool:
+        return self.encoder is not None and self.__corpus_embeddings is not None
+
+    def __warn_fallback(self, error: Exception):
+        print(f"Warning: could not encode the query ({error}), falling back to BM25.")
@@ -0,0 +1,247 @@
+import math
+from typing import Optional, Tuple
+
+import numpy as np
+
+from xlm.components.retriever.vector_index import VectorIndex
+from xlm.utils.vectors import (
+    assign_clusters,
+    kmeans,
+    normalize_rows,
+    top_k as select_top_k,
+)
+
+
+class IVFIndex(VectorIndex):
+    """
+    Inverted file index: the vectors are clustered into `num_lists` lists by spherical
+    k-means and a query only scans the `nprobe` lists whose centroids are closest to
+    it. More lists make a probe cheaper, more probes raise the recall. Defaults to
+    `sqrt(n)` lists.
+
+    With `num_subquantizers`, vectors are stored product-quantized (IVF-PQ): every
+    vector is split into that many sub-vectors, each stored as the one byte id of its
+    nearest of 256 sub-centroids, and scores are approximated from per-query lookup
+    tables. The dimension must be divisible by `num_subquantizers`.
+
+    Added vectors are kept in a pending buffer that every query scans exactly, until
+    it grows to a sixteenth of the index and is sorted into the existing lists. The
+    lists are not re-clustered, `build` again if the data has drifted a lot.
+    """
+
+    def __init__(
+        self,
+        num_lists: Optional[int] = None,
+        nprobe: int = 16,
+        num_subquantizers: Optional[int] = None,
+        num_iterations: int = 20,
+        max_training_vectors: int = 100000,
+        seed: int = 0,
+    ):
+        self.nprobe = nprobe
+        self.__num_lists = num_lists
+        self.__num_subquantizers = num_subquantizers
+        self.__num_iterations = num_iterations
+        self.__max_training_vectors = max_training_vectors
+        self.__seed = seed
+        self.__centroids = np.empty((0, 0), dtype=np.float32)
+        self.__offsets = np.zeros(1, dtype=np.int64)
+        self.__ids = np.empty(0, dtype=np.int64)
+        self.__vectors: Optional[np.ndarray] = None
+        self.__codebooks: Optional[np.ndarray] = None
+        self.__codes: Optional[np.ndarray] = None
+        self.__pending = np.empty((0, 0), dtype=np.float32)
+
+    @property
+    def num_lists(self) -> int:
+        return len(self.__centroids)
+
+    def build(self, embeddings: np.ndarray):
+        embeddings = normalize_rows(embeddings)
+        if len(embeddings) == 0:
+            self.__centroids = np.empty((0, embeddings.shape[1]), dtype=np.float32)
+            self.__offsets = np.zeros(1, dtype=np.int64)
+            self.__ids = np.empty(0, dtype=np.int64)
+            self.__vectors = self.__pending = embeddings
+            self.__codebooks = self.__codes = None
+            return
+
+        num_lists = self.__num_lists or max(1, int(math.sqrt(len(embeddings))))
+        # k-means needs a few dozen vectors per cluster, not the whole corpus
+        training_vectors = self.__sample(
+            embeddings, size=min(self.__max_training_vectors, 64 * num_lists)
+        )
+        self.__centroids, _ = kmeans(
+            training_vectors,
+            num_clusters=num_lists,
+            num_iterations=self.__num_iterations,
+            spherical=True,
+            seed=self.__seed,
+        )
+        assignments = assign_clusters(embeddings, self.__centroids, spherical=True)
+        # vectors are stored grouped by list, so that a list is one contiguous slice
+        self.__ids = np.argsort(assignments, kind="stable")
+        counts = np.bincount(assignments, minlength=len(self.__centroids))
+        self.__offsets = np.concatenate([[0], np.cumsum(counts)])
+
+        self.__pending = np.empty((0, embeddings.shape[1]), dtype=np.float32)
+        grouped_embeddings = embeddings[self.__ids]
+        if self.__num_subquantizers:
+            self.__codebooks = self.__train_codebooks(
+                self.__sample(embeddings, size=32 * 256)
+            )
+            self.__codes = self.__encode(grouped_embeddings)
+            self.__vectors = None
+        else:
+            self.__vectors = grouped_embeddings
+            self.__codebooks = self.__codes = None
+
+    def add(self, embeddings: np.ndarray):
+        embeddings = normalize_rows(embeddings)
+        if self.num_lists == 0:
+            self.build(embeddings)
+            return
+        self.__pending = np.concatenate([self.__pending, embeddings])
+        if len(self.__pending) >= max(1024, len(self.__ids) // 16):
+            self.__merge_pending()
+
+    def search(
+        self, query_embeddings: np.ndarray, top_k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        query_embeddings = normalize_rows(query_embeddings)
+        ids = np.full((len(query_embeddings), top_k), -1, dtype=np.int64)
+        scores = np.full((len(query_embeddings), top_k), -np.inf, dtype=np.float32)
+        if len(self) == 0:
+            return ids, scores
+
+        probes, _ = select_top_k(
+            scores=query_embeddings @ self.__centroids.T,
+            k=min(self.nprobe, self.num_lists),
+        )
+        for row, (query, lists) in enumerate(zip(query_embeddings, probes)):
+            candidate_ids, candidate_scores = self.__scan(query=query, lists=lists)
+            best, best_scores = select_top_k(scores=candidate_scores, k=top_k)
+            ids[row, : best.shape[1]] = candidate_ids[best[0]]
+            scores[row, : best.shape[1]] = best_scores[0]
+        return ids, scores
+
+    def save(self, path: str):
+        self.__merge_pending()
+        arrays = {
+            "centroids": self.__centroids,
+            "offsets": self.__offsets,
+            "ids": self.__ids,
+            "nprobe": np.array(self.nprobe),
+        }
+        if self.__codes is not None:
+            arrays.update(codebooks=self.__codebooks, codes=self.__codes)
+        else:
+            arrays.update(vectors=self.__vectors)
+        with open(path, "wb") as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> "IVFIndex":
+        with np.load(path) as arrays:
+            is_quantized = "codes" in arrays
+            index = cls(
+                num_lists=len(arrays["centroids"]),
+                nprobe=int(arrays["nprobe"]),
+                num_subquantizers=(arrays["codes"].shape[1] if is_quantized else None),
+            )
+            index.__centroids = arrays["centroids"]
+            index.__offsets = arrays["offsets"]
+            index.__ids = arrays["ids"]
+            if is_quantized:
+                index.__codebooks = arrays["codebooks"]
+                index.__codes = arrays["codes"]
+            else:
+                index.__vectors = arrays["vectors"]
+            index.__pending = np.empty(
+                (0, index.__centroids.shape[1]), dtype=np.float32
+            )
+        return index
+
+    def __len__(self) -> int:
+        return len(self.__ids) + len(self.__pending)
+
+    def __merge_pending(self):
+        if len(self.__pending) == 0:
+            return
+        assignments = np.concatenate(
+            [
+                np.repeat(np.arange(self.num_lists), np.diff(self.__offsets)),
+                assign_clusters(self.__pending, self.__centroids, spherical=True),
+            ]
+        )
+        order = np.argsort(assignments, kind="stable")
+        pending_ids = len(self.__ids) + np.arange(len(self.__pending))
+        self.__ids = np.concatenate([self.__ids, pending_ids])[order]
+        if self.__codes is not None:
+            codes = np.concatenate([self.__codes, self.__encode(self.__pending)])
+            self.__codes = codes[order]
+        else:
+            self.__vectors = np.concatenate([self.__vectors, self.__pending])[order]
+        counts = np.bincount(assignments, minlength=self.num_lists)
+        self.__offsets = np.concatenate([[0], np.cumsum(counts)])
+        self.__pending = self.__pending[:0]
+
+    def __scan(
+        self, query: np.ndarray, lists: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        if self.__codes is not None:
+            # inner products of every sub-vector of the query with every sub-centroid
+            table = np.einsum(
+                "mkd,md->mk",
+                self.__codebooks,
+                query.reshape(self.__num_subquantizers, -1),
+            )
+        # pending vectors are not sorted into lists yet, they are always scanned
+        ids = [len(self.__ids) + np.arange(len(self.__pending))]
+        scores = [self.__pending @ query]
+        for idx in lists:
+            start, end = self.__offsets[idx], self.__offsets[idx + 1]
+            if start == end:
+                continue
+            ids.append(self.__ids[start:end])
+            if self.__codes is None:
+                scores.append(self.__vectors[start:end] @ query)
+            else:
+                codes = self.__codes[start:end]
+                scores.append(
+                    table[np.arange(self.__num_subquantizers), codes].sum(axis=1)
+                )
+        return np.concatenate(ids), np.concatenate(scores)
+
+    def __sample(self, embeddings: np.ndarray, size: int) -> np.ndarray:
+        if len(embeddings) <= size:
+            return embeddings
+        rng = np.random.default_rng(self.__seed)
+        return embeddings[np.sort(rng.choice(len(embeddings), size, replace=False))]
+
+    def __train_codebooks(self, vectors: np.ndarray) -> np.ndarray:
+        if vectors.shape[1] % self.__num_subquantizers:
+            raise ValueError(
+                f"Dimension {vectors.shape[1]} is not divisible by "
+                f"{self.__num_subquantizers} subquantizers."
+            )
+        num_codes = min(256, len(vectors))
+        codebooks = []
+        for sub_vectors in np.split(vectors, self.__num_subquantizers, axis=1):
+            codebook, _ = kmeans(
+                sub_vectors,
+                num_clusters=num_codes,
+                num_iterations=self.__num_iterations,
+                seed=self.__seed,
+            )
+            codebooks.append(codebook)
+        return np.stack(codebooks)
+
+    def __encode(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.empty((len(vectors), self.__num_subquantizers), dtype=np.uint8)
+        sub_vectors = np.split(vectors, self.__num_subquantizers, axis=1)
+        for idx, (codebook, sub_vector) in enumerate(
+            zip(self.__codebooks, sub_vectors)
+        ):
+            codes[:, idx] = assign_clusters(np.ascontiguousarray(sub_vector), codebook)
+        return codes
@@ -0,0 +1,132 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+from xlm.components.retriever.vector_index import VectorIndex
+from xlm.utils.vectors import normalize_rows, top_k as select_top_k
+
+QUANTIZATIONS = ("int8", "binary")
+# number of set bits of every byte value
+POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+
+class QuantizedIndex(VectorIndex):
+    """
+    Exhaustive index over quantized vectors, meant to propose candidates that are
+    re-scored with the float vectors, e.g. by `SBERTRetriever` with `num_candidates`
+    and a memory-mapped corpus store.
+
+    `int8` stores every dimension as a byte scaled by the largest absolute value of
+    that dimension at `build` time (4x smaller than float32) and scores by dot
+    product. `binary` only stores the signs as bits (32x smaller) and scores by the
+    Hamming distance, as `1 - 2 * distance / dimension`.
+    """
+
+    def __init__(self, quantization: str = "int8", chunk_size: int = 4096):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(
+                f"Unknown quantization {quantization}, expected one of {QUANTIZATIONS}."
+            )
+        self.__quantization = quantization
+        self.__chunk_size = chunk_size
+        self.__dimension: Optional[int] = None
+        self.__scales: Optional[np.ndarray] = None
+        self.__codes = np.empty((0, 0), dtype=np.uint8)
+
+    @property
+    def quantization(self) -> str:
+        return self.__quantization
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Memory held by the quantized vectors.
+        """
+        scales = 0 if self.__scales is None else self.__scales.nbytes
+        return self.__codes.nbytes + scales
+
+    def build(self, embeddings: np.ndarray):
+        embeddings = normalize_rows(embeddings)
+        self.__dimension = embeddings.shape[1]
+        if self.__quantization == "int8":
+            max_values = np.abs(embeddings).max(axis=0, initial=0)
+            self.__scales = np.maximum(max_values, 1e-12) / 127
+        self.__codes = self.__quantize(embeddings)
+
+    def add(self, embeddings: np.ndarray):
+        embeddings = normalize_rows(embeddings)
+        if self.__dimension is None or len(self) == 0:
+            self.build(embeddings)
+            return
+        # values beyond the trained range are clipped
+        self.__codes = np.concatenate([self.__codes, self.__quantize(embeddings)])
+
+    def search(
+        self, query_embeddings: np.ndarray, top_k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        query_embeddings = normalize_rows(query_embeddings)
+        ids = np.full((len(query_embeddings), top_k), -1, dtype=np.int64)
+        scores = np.full((len(query_embeddings), top_k), -np.inf, dtype=np.float32)
+        if len(self) == 0:
+            return ids, scores
+
+        # the best hits of every chunk, merged at the end
+        chunk_ids, chunk_scores = [], []
+        for start in range(0, len(self), self.__chunk_size):
+            codes = self.__codes[start : start + self.__chunk_size]
+            best, best_scores = select_top_k(
+                scores=self.__score(query_embeddings, codes), k=top_k
+            )
+            chunk_ids.append(best + start)
+            chunk_scores.append(best_scores)
+        best, best_scores = select_top_k(
+            scores=np.concatenate(chunk_scores, axis=1), k=top_k
+        )
+        best_ids = np.take_along_axis(np.concatenate(chunk_ids, axis=1), best, axis=1)
+        ids[:, : best.shape[1]] = best_ids
+        scores[:, : best.shape[1]] = best_scores
+        return ids, scores
+
+    def save(self, path: str):
+        arrays = {
+            "quantization": np.array(self.__quantization),
+            "dimension": np.array(self.__dimension or 0),
+            "codes": self.__codes,
+        }
+        if self.__scales is not None:
+            arrays.update(scales=self.__scales)
+        with open(path, "wb") as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> "QuantizedIndex":
+        with np.load(path) as arrays:
+            index = cls(quantization=str(arrays["quantization"]))
+            index.__dimension = int(arrays["dimension"]) or None
+            index.__codes = arrays["codes"]
+            if "scales" in arrays:
+                index.__scales = arrays["scales"]
+        return index
+
+    def __len__(self) -> int:
+        return len(self.__codes)
+
+    def __quantize(self, embeddings: np.ndarray) -> np.ndarray:
+        if self.__quantization == "binary":
+            return np.packbits(embeddings > 0, axis=1)
+        codes = np.rint(embeddings / self.__scales)
+        return np.clip(codes, -127, 127).astype(np.int8)
+
+    def __score(self, query_embeddings: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        if self.__quantization == "int8":
+            # the scales are applied to the queries instead of every vector
+            scaled_queries = (query_embeddings * self.__scales).astype(np.float32)
+            return scaled_queries @ codes.astype(np.float32).T
+        query_codes = np.packbits(query_embeddings > 0, axis=1)
+        distances = np.stack(
+            [
+                POPCOUNT[np.bitwise_xor(codes, query_code)].sum(axis=1, dtype=np.int32)
+                for query_code in query_codes
+            ]
+        )
+        return (1 - 2 * distances / self.__dimension).astype(np.float32)
@@ -1,5 +1,8 @@
+import asyncio
 from abc import ABC, abstractmethod
-from typing import List
+from typing import List, Optional, Tuple
+
+import numpy as np
 
 
 class Retriever(ABC):
@@ -10,3 +13,63 @@ class Retriever(ABC):
         top_k: int = 3,
         return_scores: bool = False,
     ) -> List[str]: ...
+
+    async def aretrieve(
+        self,
+        text: str,
+        top_k: int = 3,
+        return_scores: bool = False,
+    ) -> List[str]:
+        return await asyncio.to_thread(
+            self.retrieve, text=text, top_k=top_k, return_scores=return_scores
+        )
+
+    def retrieve_batch(
+        self,
+        texts: List[str],
+        top_k: int = 3,
+        return_scores: bool = False,
+    ) -> List[List[str]] | List[Tuple[List[str], List[float]]]:
+        """
+        Retrieves the documents of every query in `texts`, one query after another.
+        Retrievers that can score several queries at once override this.
+
+        Returns
+        -------
+        List[List[str]] | List[Tuple[List[str], List[float]]] The result of
+        `retrieve` for every query.
+        """
+        return [
+            self.retrieve(text=text, top_k=top_k, return_scores=return_scores)
+            for text in texts
+        ]
+
+    def score_documents(
+        self,
+        text: str,
+        documents: List[str],
+        query_embeddings: Optional[List[float] | np.ndarray] = None,
+    ) -> List[float]:
+        """
+        Scores `documents` as candidates for the query `text` without changing the
+        retriever's corpus, on the scale of the scores returned by `retrieve`. Dense
+        retrievers use `query_embeddings` instead of encoding `text` if given.
+
+        Returns
+        -------
+        List[float] The score of every document, in the order of `documents`.
+        """
+        raise NotImplementedError(f"{type(self).__name__} cannot score documents.")
+
+    def score_documents_batch(
+        self, texts: List[str], documents: List[List[str]]
+    ) -> List[List[float]]:
+        """
+        Returns
+        -------
+        List[List[float]] The result of `score_documents` for every query.
+        """
+        return [
+            self.score_documents(text=text, documents=group)
+            for text, group in zip(texts, documents)
+        ]
@@ -1,10 +1,16 @@
-from typing import List, Dict, Tuple
+from threading import Lock
+from typing import Hashable, List, Dict, Optional, Tuple
 
-import torch
-from sentence_transformers.util import semantic_search
+import numpy as np
 
 from xlm.components.encoder.encoder import Encoder
+from xlm.components.retriever.corpus_store import CorpusStore
 from xlm.components.retriever.retriever import Retriever
+from xlm.components.retriever.vector_index import VectorIndex
+from xlm.utils.batching import flatten, unflatten
+from xlm.utils.vectors import normalize_rows, top_k as select_top_k
+
+SCORES_CHUNK_SIZE = 1 << 24
 
 
 class SBERTRetriever(Retriever):
@@ -13,20 +19,160 @@ class SBERTRetriever(Retriever):
         encoder: Encoder,
         max_context_length: int = 100,
         num_threads: int = 10,
-        corpus_embeddings: List[List[float]] = None,
+        corpus_embeddings: List[List[float]] | np.ndarray = None,
         corpus_documents: List[str] = None,
+        index: Optional[VectorIndex] = None,
+        num_candidates: Optional[int] = None,
+        corpus_store: Optional[CorpusStore] = None,
     ):
         self.encoder = encoder
+        self.__index = None
+        self.__num_candidates = num_candidates
+        self.__lock = Lock()
 
         self.max_context_length = max_context_length
         self.__num_threads = num_threads
 
-        self.corpus_documents = corpus_documents
-
-        if not corpus_embeddings:
-            self.corpus_embeddings = self.encode_corpus(texts=corpus_documents)
+        if corpus_store is not None:
+            # the store holds normalized float32 embeddings, they are mapped as is
+            self.corpus_documents = corpus_store.documents
+            self.__set_corpus(embeddings=corpus_store.embeddings, is_owned=False)
         else:
-            self.corpus_embeddings = corpus_embeddings
+            self.corpus_documents = corpus_documents
+            if corpus_embeddings is None or len(corpus_embeddings) == 0:
+                self.corpus_embeddings = self.encode_corpus(texts=corpus_documents)
+            else:
+                self.corpus_embeddings = corpus_embeddings
+
+        # a loaded index that matches the corpus is used as is
+        if index is not None and len(index) != len(self.corpus_embeddings):
+            index.build(self.corpus_embeddings)
+        self.__index = index
+
+    @classmethod
+    def from_corpus_store(
+        cls, encoder: Encoder, corpus_store: CorpusStore, **kwargs
+    ) -> "SBERTRetriever":
+        if not corpus_store.matches(model_name=encoder.model_name):
+            raise ValueError(
+                f"Corpus store {corpus_store.path} was built with "
+                f"{corpus_store.model_name}, not {encoder.model_name}."
+            )
+        return cls(encoder=encoder, corpus_store=corpus_store, **kwargs)
+
+    @property
+    def index(self) -> Optional[VectorIndex]:
+        return self.__index
+
+    @property
+    def corpus_embeddings(self) -> np.ndarray:
+        """
+        Returns
+        -------
+        np.ndarray C-contiguous float32 matrix of the L2-normalized corpus embeddings,
+        including the rows of removed documents until `compact` is called.
+        """
+        return self.__corpus_embeddings
+
+    @corpus_embeddings.setter
+    def corpus_embeddings(self, corpus_embeddings: List[List[float]] | np.ndarray):
+        # normalized once here, so a query only costs one matrix-vector product
+        with self.__lock:
+            self.__set_corpus(embeddings=normalize_rows(corpus_embeddings))
+            if self.__index is not None:
+                self.__index.build(self.__corpus_embeddings)
+
+    @property
+    def num_documents(self) -> int:
+        """
+        Number of retrievable documents, i.e. without removed ones.
+        """
+        return len(self.__corpus_embeddings) - self.__num_deleted
+
+    def add_documents(
+        self, documents: List[str], ids: Optional[List[Hashable]] = None
+    ) -> List[Hashable]:
+        """
+        Encodes `documents` and appends them to the corpus and its index. Without
+        `ids`, the documents get the next free integer ids. Ids are stable: they do
+        not change when other documents are added or removed.
+
+        Returns
+        -------
+        List[Hashable] The ids of the added documents.
+        """
+        if ids is None:
+            ids = list(range(self.__next_id, self.__next_id + len(documents)))
+        self.__check_ids(documents=documents, ids=ids)
+        self.__check_new(ids=ids)
+        if documents:
+            embeddings = self.encode_corpus(texts=documents)
+            with self.__lock:
+                # another update may have added them while encoding
+                self.__check_new(ids=ids)
+                self.__append(documents=documents, embeddings=embeddings, ids=ids)
+        return ids
+
+    def remove_documents(self, ids: List[Hashable]):
+        """
+        Removes documents from the results right away. Their rows are only dropped
+        from memory by `compact`.
+        """
+        with self.__lock:
+            self.__remove(ids=ids)
+
+    def upsert(self, documents: List[str], ids: List[Hashable]) -> List[Hashable]:
+        """
+        Adds the documents with new ids and replaces the ones whose text changed.
+        Only those are encoded.
+
+        Returns
+        -------
+        List[Hashable] The ids of the added or replaced documents.
+        """
+        self.__check_ids(documents=documents, ids=ids)
+        changed = [
+            (document, id_)
+            for document, id_ in zip(documents, ids)
+            if self.__get_row(id_) is None
+            or self.corpus_documents[self.__get_row(id_)] != document
+        ]
+        if not changed:
+            return []
+
+        changed_documents, changed_ids = (list(items) for items in zip(*changed))
+        embeddings = self.encode_corpus(texts=changed_documents)
+        with self.__lock:
+            self.__remove(
+                ids=[id_ for id_ in changed_ids if self.__get_row(id_) is not None]
+            )
+            self.__append(
+                documents=changed_documents, embeddings=embeddings, ids=changed_ids
+            )
+        return changed_ids
+
+    def compact(self):
+        """
+        Drops the rows of removed documents and rebuilds the index.
+        """
+        with self.__lock:
+            if not self.__num_deleted:
+                return
+            keep = ~self.__deleted
+            row_ids = [
+                id_ for id_, is_kept in zip(self.__get_row_ids(), keep) if is_kept
+            ]
+            self.corpus_documents = [
+                document
+                for document, is_kept in zip(self.corpus_documents, keep)
+                if is_kept
+            ]
+            next_id = self.__next_id
+            self.__set_corpus(embeddings=self.__corpus_embeddings[keep])
+            self.__set_ids(row_ids)
+            self.__next_id = next_id
+            if self.__index is not None:
+                self.__index.build(self.__corpus_embeddings)
 
     def retrieve_documents_with_scores(
         self,
@@ -34,11 +180,7 @@ class SBERTRetriever(Retriever):
         top_k: int = 3,
     ) -> List[str]:
         query_embeddings = self.encode_queries(text=text)
-        results = self.search(
-            query_embeddings=query_embeddings,
-            corpus_embeddings=self.corpus_embeddings,
-            top_k=top_k,
-        )
+        results = self.search(query_embeddings=query_embeddings, top_k=top_k)
         return results
 
     def retrieve(
@@ -47,36 +189,336 @@ class SBERTRetriever(Retriever):
         top_k: int = 3,
         return_scores: bool = False,
     ) -> List[str] | Tuple[List[str], List[float]]:
-        result = self.retrieve_documents_with_scores(text=text, top_k=top_k)
-        idxes = []
-        scores = []
-        for item in result[0]:
-            idxes.append(item["corpus_id"])
-            scores.append(item["score"])
-        documents = [self.corpus_documents[idx] for idx in idxes]
+        query_embeddings = self.encode_queries(text=text)
+        rows, scores = self.__search_rows(
+            query_embeddings=query_embeddings, top_k=top_k
+        )[0]
+        return self.__get_documents(
+            rows=rows, scores=scores, return_scores=return_scores
+        )
+
+    async def aretrieve(
+        self,
+        text: str,
+        top_k: int = 3,
+        return_scores: bool = False,
+    ) -> List[str] | Tuple[List[str], List[float]]:
+        query_embeddings = await self.encoder.aencode_array(texts=[text])
+        rows, scores = self.__search_rows(
+            query_embeddings=query_embeddings, top_k=top_k
+        )[0]
+        return self.__get_documents(
+            rows=rows, scores=scores, return_scores=return_scores
+        )
+
+    def retrieve_batch(
+        self,
+        texts: List[str],
+        top_k: int = 3,
+        return_scores: bool = False,
+    ) -> List[List[str]] | List[Tuple[List[str], List[float]]]:
+        """
+        Encodes all queries with one request and scores them against the corpus as
+        one matrix product.
+
+        Returns
+        -------
+        List[List[str]] | List[Tuple[List[str], List[float]]] The result of
+        `retrieve` for every query.
+        """
+        if not texts:
+            return []
+        query_embeddings = self.encoder.encode_array(texts=texts)
+        return [
+            self.__get_documents(rows=rows, scores=scores, return_scores=return_scores)
+            for rows, scores in self.__search_rows(
+                query_embeddings=query_embeddings, top_k=top_k
+            )
+        ]
+
+    def score_documents(
+        self,
+        text: str,
+        documents: List[str],
+        query_embeddings: Optional[List[float] | np.ndarray] = None,
+    ) -> List[float]:
+        """
+        Cosine similarities of the query with `documents`, which are encoded but not
+        added to the corpus. Pass `query_embeddings` if the query is already encoded.
+
+        Returns
+        -------
+        List[float] The score of every document, in the order of `documents`.
+        """
+        if not documents:
+            return []
+        if query_embeddings is None:
+            # the query and the documents in one encoder call
+            embeddings = self.encoder.encode_array(texts=[text] + documents)
+            query_embeddings, document_embeddings = embeddings[:1], embeddings[1:]
+        else:
+            document_embeddings = self.encode_corpus(texts=documents)
+        scores = (
+            normalize_rows(document_embeddings) @ normalize_rows(query_embeddings)[0]
+        )
+        return scores.tolist()
+
+    def score_documents_batch(
+        self, texts: List[str], documents: List[List[str]]
+    ) -> List[List[float]]:
+        """
+        Like `score_documents` for several queries, with one encoder call for all
+        queries and documents.
+
+        Returns
+        -------
+        List[List[float]] The scores of the documents of every query, in order.
+        """
+        flat_documents, sizes = flatten(documents)
+        if not flat_documents:
+            return [[] for _ in texts]
+        embeddings = normalize_rows(
+            self.encoder.encode_array(texts=texts + flat_documents)
+        )
+        query_embeddings, document_embeddings = (
+            embeddings[: len(texts)],
+            embeddings[len(texts) :],
+        )
+        query_rows = np.repeat(np.arange(len(texts)), sizes)
+        # row-wise dot products of every document with its own query
+        scores = np.einsum(
+            "ij,ij->i", document_embeddings, query_embeddings[query_rows]
+        )
+        return unflatten(scores.tolist(), sizes)
+
+    def __get_documents(
+        self, rows: np.ndarray, scores: np.ndarray, return_scores: bool
+    ) -> List[str] | Tuple[List[str], List[float]]:
+        documents = [self.corpus_documents[row] for row in rows]
 
         if return_scores:
-            return documents, scores
+            return documents, scores.tolist()
         else:
             return documents
 
-    def encode_corpus(self, texts: List[str]) -> List[List[float]]:
-        corpus_embeddings = self.encoder.encode(texts=texts)
+    def encode_corpus(self, texts: List[str]) -> np.ndarray:
+        corpus_embeddings = self.encoder.encode_array(texts=texts)
         return corpus_embeddings
 
-    def encode_queries(self, text: str) -> List[float]:
-        query_embeddings = self.encoder.encode(texts=[text])
+    def encode_queries(self, text: str) -> np.ndarray:
+        query_embeddings = self.encoder.encode_array(texts=[text])
         return query_embeddings
 
     def search(
         self,
-        query_embeddings: List[float],
-        corpus_embeddings: List[List[float]],
-        top_k: int,
+        query_embeddings: List[float] | np.ndarray,
+        corpus_embeddings: Optional[List[List[float]] | np.ndarray] = None,
+        top_k: int = 3,
     ) -> List[List[Dict[str, float]]]:
-        result = semantic_search(
-            query_embeddings=torch.Tensor(query_embeddings),
-            corpus_embeddings=torch.Tensor(corpus_embeddings),
+        """
+        Cosine similarity search of every query against `corpus_embeddings`, which
+        defaults to the retriever's corpus. The retriever's corpus is searched through
+        its index, if it has one: the index proposes `num_candidates` (at least
+        `top_k`) candidates, which are re-scored exactly.
+
+        Returns
+        -------
+        List[List[Dict[str, float]]] For every query, the `top_k` best hits as
+        `{"corpus_id": ..., "score": ...}`, best first. For the retriever's corpus,
+        `corpus_id` is the document id, otherwise the row of `corpus_embeddings`.
+        """
+        if corpus_embeddings is None:
+            return [
+                [
+                    {"corpus_id": self.__get_id(row), "score": score}
+                    for row, score in zip(rows.tolist(), scores.tolist())
+                ]
+                for rows, scores in self.__search_rows(
+                    query_embeddings=query_embeddings, top_k=top_k
+                )
+            ]
+
+        indices, top_scores = self.__search_matrix(
+            query_embeddings=normalize_rows(query_embeddings),
+            corpus_embeddings=normalize_rows(corpus_embeddings),
             top_k=top_k,
         )
-        return result
+        return [
+            [
+                {"corpus_id": idx, "score": score}
+                for idx, score in zip(row_indices.tolist(), row_scores.tolist())
+            ]
+            for row_indices, row_scores in zip(indices, top_scores)
+        ]
+
+    def __search_rows(
+        self, query_embeddings: List[float] | np.ndarray, top_k: int
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        query_embeddings = normalize_rows(query_embeddings)
+        if self.__index is not None:
+            with self.__lock:
+                return self.__search_index(
+                    query_embeddings=query_embeddings, top_k=top_k
+                )
+        # updates replace the corpus view and the tombstones instead of modifying
+        # them, so the search itself does not need to hold the lock
+        with self.__lock:
+            corpus_embeddings, deleted = self.__corpus_embeddings, self.__deleted
+        indices, scores = self.__search_matrix(
+            query_embeddings=query_embeddings,
+            corpus_embeddings=corpus_embeddings,
+            top_k=top_k,
+            deleted=deleted,
+        )
+        return list(zip(indices, scores))
+
+    def __search_matrix(
+        self,
+        query_embeddings: np.ndarray,
+        corpus_embeddings: np.ndarray,
+        top_k: int,
+        deleted: Optional[np.ndarray] = None,
+    ) -> Tuple[List[np.ndarray], List[np.ndarray]]:
+        if len(corpus_embeddings) == 0:
+            empty = [np.empty(0, dtype=np.int64)] * len(query_embeddings)
+            return empty, [np.empty(0, dtype=np.float32)] * len(query_embeddings)
+        indices, top_scores = [], []
+        # bounds the score matrix of a large query batch to ~64MB
+        chunk_size = max(1, SCORES_CHUNK_SIZE // len(corpus_embeddings))
+        for start in range(0, len(query_embeddings), chunk_size):
+            scores = query_embeddings[start : start + chunk_size] @ corpus_embeddings.T
+            if deleted is not None:
+                scores[:, deleted] = -np.inf
+            chunk_indices, chunk_scores = select_top_k(scores=scores, k=top_k)
+            # fewer live documents than `top_k`
+            is_live = np.isfinite(chunk_scores)
+            indices.extend(row[mask] for row, mask in zip(chunk_indices, is_live))
+            top_scores.extend(row[mask] for row, mask in zip(chunk_scores, is_live))
+        return indices, top_scores
+
+    def __search_index(
+        self, query_embeddings: np.ndarray, top_k: int
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        num_candidates = max(top_k, self.__num_candidates or top_k)
+        candidates, _ = self.__index.search(
+            query_embeddings=query_embeddings,
+            top_k=min(num_candidates + self.__num_deleted, len(self.__index)),
+        )
+        results = []
+        for query, rows in zip(query_embeddings, candidates):
+            rows = rows[rows >= 0]
+            if self.__deleted is not None:
+                rows = rows[~self.__deleted[rows]]
+            scores = self.__corpus_embeddings[rows] @ query
+            best, best_scores = select_top_k(scores=scores, k=top_k)
+            results.append((rows[best[0]], best_scores[0]))
+        return results
+
+    def __set_corpus(self, embeddings: np.ndarray, is_owned: bool = True):
+        self.__corpus_embeddings = embeddings
+        # rows are appended into spare capacity of an owned buffer
+        self.__buffer = embeddings if is_owned else None
+        self.__deleted: Optional[np.ndarray] = None
+        self.__num_deleted = 0
+        # as long as no custom ids are used, the id of a document is its row
+        self.__row_ids: Optional[List[Hashable]] = None
+        self.__id_rows: Optional[Dict[Hashable, int]] = None
+        self.__next_id = len(embeddings)
+
+    def __set_ids(self, row_ids: List[Hashable]):
+        self.__row_ids = row_ids
+        self.__id_rows = {
+            id_: row
+            for row, id_ in enumerate(row_ids)
+            if self.__deleted is None or not self.__deleted[row]
+        }
+
+    def __get_row_ids(self) -> List[Hashable]:
+        if self.__row_ids is None:
+            return list(range(len(self.__corpus_embeddings)))
+        return self.__row_ids
+
+    def __get_id(self, row: int) -> Hashable:
+        return row if self.__row_ids is None else self.__row_ids[row]
+
+    def __get_row(self, id_: Hashable) -> Optional[int]:
+        if self.__id_rows is not None:
+            return self.__id_rows.get(id_)
+        is_row = isinstance(id_, (int, np.integer)) and not isinstance(id_, bool)
+        if not is_row or not 0 <= id_ < len(self.__corpus_embeddings):
+            return None
+        if self.__deleted is not None and self.__deleted[id_]:
+            return None
+        return int(id_)
+
+    def __check_ids(self, documents: List[str], ids: List[Hashable]):
+        if len(ids) != len(documents):
+            raise ValueError(f"Got {len(documents)} documents but {len(ids)} ids.")
+        if len(set(ids)) != len(ids):
+            raise ValueError("Document ids must be unique.")
+
+    def __check_new(self, ids: List[Hashable]):
+        existing_ids = [id_ for id_ in ids if self.__get_row(id_) is not None]
+        if existing_ids:
+            raise ValueError(
+                f"Documents {existing_ids} already exist, use upsert to replace them."
+            )
+
+    def __append(
+        self, documents: List[str], embeddings: np.ndarray, ids: List[Hashable]
+    ):
+        embeddings = normalize_rows(embeddings)
+        num_rows = len(self.__corpus_embeddings)
+        if self.__row_ids is None and ids != list(range(num_rows, num_rows + len(ids))):
+            self.__set_ids(self.__get_row_ids())
+
+        self.__corpus_embeddings = self.__grow(embeddings)
+        if not isinstance(self.corpus_documents, list):
+            self.corpus_documents = list(self.corpus_documents or [])
+        self.corpus_documents.extend(documents)
+        if self.__row_ids is not None:
+            self.__row_ids.extend(ids)
+            self.__id_rows.update(zip(ids, range(num_rows, num_rows + len(ids))))
+        if self.__deleted is not None:
+            self.__deleted = np.concatenate(
+                [self.__deleted, np.zeros(len(ids), dtype=bool)]
+            )
+        integer_ids = [id_ for id_ in ids if isinstance(id_, (int, np.integer))]
+        self.__next_id = max([self.__next_id, *(id_ + 1 for id_ in integer_ids)])
+        if self.__index is not None:
+            self.__index.add(embeddings)
+
+    def __grow(self, embeddings: np.ndarray) -> np.ndarray:
+        num_rows, num_new_rows = len(self.__corpus_embeddings), len(embeddings)
+        if num_rows and embeddings.shape[1] != self.__corpus_embeddings.shape[1]:
+            raise ValueError(
+                f"Expected embeddings of dimension "
+                f"{self.__corpus_embeddings.shape[1]}, got {embeddings.shape[1]}."
+            )
+        if self.__buffer is None or len(self.__buffer) < num_rows + num_new_rows:
+            # doubling the capacity keeps appends amortized O(1) per row
+            capacity = max(2 * num_rows, num_rows + num_new_rows, 1024)
+            buffer = np.empty((capacity, embeddings.shape[1]), dtype=np.float32)
+            buffer[:num_rows] = self.__corpus_embeddings
+            self.__buffer = buffer
+        self.__buffer[num_rows : num_rows + num_new_rows] = embeddings
+        return self.__buffer[: num_rows + num_new_rows]
+
+    def __remove(self, ids: List[Hashable]):
+        rows = [self.__get_row(id_) for id_ in ids]
+        unknown_ids = [id_ for id_, row in zip(ids, rows) if row is None]
+        if unknown_ids:
+            raise ValueError(f"Unknown document ids: {unknown_ids}")
+        if not rows:
+            return
+        deleted = (
+            np.zeros(len(self.__corpus_embeddings), dtype=bool)
+            if self.__deleted is None
+            else self.__deleted.copy()
+        )
+        deleted[rows] = True
+        self.__num_deleted = int(deleted.sum())
+        self.__deleted = deleted
+        if self.__id_rows is not None:
+            for id_ in ids:
+                del self.__id_rows[id_]
@@ -0,0 +1,209 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from xlm.components.encoder.encoder import Encoder
+from xlm.components.retriever.corpus_store import CorpusStore
+from xlm.components.retriever.retriever import Retriever
+from xlm.utils.vectors import normalize_rows, top_k as select_top_k
+
+# the corpus store opened by a worker process, see `_open_corpus_store`
+_worker_corpus_store: Optional[CorpusStore] = None
+
+
+def _open_corpus_store(path: str):
+    global _worker_corpus_store
+    _worker_corpus_store = CorpusStore(path)
+
+
+def _search_shard(
+    start: int, end: int, query_embeddings: np.ndarray, top_k: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    scores = query_embeddings @ _worker_corpus_store.embeddings[start:end].T
+    ids, top_scores = select_top_k(scores=scores, k=top_k)
+    return ids + start, top_scores
+
+
+class ShardedRetriever(Retriever):
+    """
+    Dense retriever over a corpus store that is split into `num_shards` row ranges
+    and searched by `num_workers` processes. Every worker memory-maps the same store,
+    so the shards are shared through the page cache instead of being copied, and a
+    query is fanned out to all shards at once. The per-shard top-k hits are merged
+    in this process, which also holds the documents.
+
+    Call `close` to stop the workers.
+    """
+
+    def __init__(
+        self,
+        encoder: Optional[Encoder],
+        corpus_store: CorpusStore,
+        num_shards: Optional[int] = None,
+        num_workers: Optional[int] = None,
+    ):
+        self.encoder = encoder
+        self.corpus_documents = corpus_store.documents
+        self.__corpus_store = corpus_store
+        num_workers = num_workers or os.cpu_count() or 1
+        num_shards = max(1, min(num_shards or num_workers, len(corpus_store)))
+        bounds = np.linspace(0, len(corpus_store), num_shards + 1).astype(int)
+        self.__shards = list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+        # spawned workers do not inherit the threads and sockets of this process
+        self.__executor = ProcessPoolExecutor(
+            max_workers=num_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_open_corpus_store,
+            initargs=(corpus_store.path,),
+        )
+
+    @property
+    def num_shards(self) -> int:
+        return len(self.__shards)
+
+    def retrieve(
+        self,
+        text: str,
+        top_k: int = 3,
+        return_scores: bool = False,
+    ) -> List[str] | Tuple[List[str], List[float]]:
+        return self.retrieve_batch(
+            texts=[text], top_k=top_k, return_scores=return_scores
+        )[0]
+
+    async def aretrieve(
+        self,
+        text: str,
+        top_k: int = 3,
+        return_scores: bool = False,
+    ) -> List[str] | Tuple[List[str], List[float]]:
+        query_embeddings = normalize_rows(
+            await self.encoder.aencode_array(texts=[text])
+        )
+        futures = self.__submit(query_embeddings=query_embeddings, top_k=top_k)
+        results = await asyncio.gather(*[asyncio.wrap_future(f) for f in futures])
+        rows, scores = self.__merge(results=results, top_k=top_k, num_queries=1)
+        return self.__get_documents(
+            rows=rows[0], scores=scores[0], return_scores=return_scores
+        )
+
+    def retrieve_batch(
+        self,
+        texts: List[str],
+        top_k: int = 3,
+        return_scores: bool = False,
+    ) -> List[List[str]] | List[Tuple[List[str], List[float]]]:
+        if not texts:
+            return []
+        rows, scores = self.__search_rows(
+            query_embeddings=self.encoder.encode_array(texts=texts), top_k=top_k
+        )
+        return [
+            self.__get_documents(
+                rows=row_ids, scores=row_scores, return_scores=return_scores
+            )
+            for row_ids, row_scores in zip(rows, scores)
+        ]
+
+    def search(
+        self, query_embeddings: List[float] | np.ndarray, top_k: int = 3
+    ) -> List[List[Dict[str, float]]]:
+        """
+        Returns
+        -------
+        List[List[Dict[str, float]]] For every query, the `top_k` best hits as
+        `{"corpus_id": ..., "score": ...}`, best first, like `SBERTRetriever.search`.
+        """
+        rows, scores = self.__search_rows(
+            query_embeddings=query_embeddings, top_k=top_k
+        )
+        return [
+            [
+                {"corpus_id": row, "score": score}
+                for row, score in zip(row_ids.tolist(), row_scores.tolist())
+            ]
+            for row_ids, row_scores in zip(rows, scores)
+        ]
+
+    def score_documents(
+        self,
+        text: str,
+        documents: List[str],
+        query_embeddings: Optional[List[float] | np.ndarray] = None,
+    ) -> List[float]:
+        """
+        Cosine similarities of the query with `documents`, which are encoded in this
+        process and not added to the corpus store.
+
+        Returns
+        -------
+        List[float] The score of every document, in the order of `documents`.
+        """
+        if not documents:
+            return []
+        if query_embeddings is None:
+            # the query and the documents in one encoder call
+            embeddings = self.encoder.encode_array(texts=[text] + documents)
+            query_embeddings, document_embeddings = embeddings[:1], embeddings[1:]
+        else:
+            document_embeddings = self.encoder.encode_array(texts=documents)
+        scores = (
+            normalize_rows(document_embeddings) @ normalize_rows(query_embeddings)[0]
+        )
+        return scores.tolist()
+
+    def close(self):
+        self.__executor.shutdown()
+
+    def __enter__(self) -> "ShardedRetriever":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __search_rows(
+        self, query_embeddings: List[float] | np.ndarray, top_k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        query_embeddings = normalize_rows(query_embeddings)
+        futures = self.__submit(query_embeddings=query_embeddings, top_k=top_k)
+        return self.__merge(
+            results=[future.result() for future in futures],
+            top_k=top_k,
+            num_queries=len(query_embeddings),
+        )
+
+    def __submit(self, query_embeddings: np.ndarray, top_k: int) -> List[Future]:
+        if len(self.__corpus_store) == 0:
+            return []
+        return [
+            self.__executor.submit(_search_shard, start, end, query_embeddings, top_k)
+            for start, end in self.__shards
+        ]
+
+    def __merge(
+        self,
+        results: List[Tuple[np.ndarray, np.ndarray]],
+        top_k: int,
+        num_queries: int,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        if not results:
+            empty = np.empty((num_queries, 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+        ids = np.concatenate([shard_ids for shard_ids, _ in results], axis=1)
+        scores = np.concatenate([shard_scores for _, shard_scores in results], axis=1)
+        best, best_scores = select_top_k(scores=scores, k=top_k)
+        return np.take_along_axis(ids, best, axis=1), best_scores
+
+    def __get_documents(
+        self, rows: np.ndarray, scores: np.ndarray, return_scores: bool
+    ) -> List[str] | Tuple[List[str], List[float]]:
+        documents = [self.corpus_documents[row] for row in rows]
+
+        if return_scores:
+            return documents, scores.tolist()
+        else:
+            return documents
@@ -0,0 +1,45 @@
+from abc import ABC, abstractmethod
+from typing import Tuple
+
+import numpy as np
+
+
+class VectorIndex(ABC):
+    """
+    Maximum inner product index over L2-normalized float32 vectors. The ids returned
+    by `search` are row numbers of the matrix the index was built from.
+    """
+
+    @abstractmethod
+    def build(self, embeddings: np.ndarray): ...
+
+    @abstractmethod
+    def add(self, embeddings: np.ndarray):
+        """
+        Appends vectors without rebuilding the index. They get the ids following the
+        ones already indexed.
+        """
+        ...
+
+    @abstractmethod
+    def search(
+        self, query_embeddings: np.ndarray, top_k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns
+        -------
+        Tuple[np.ndarray, np.ndarray] Ids and scores of shape
+        (len(query_embeddings), top_k), best first. Rows with fewer than `top_k`
+        hits are padded with id -1 and score -inf.
+        """
+        ...
+
+    @abstractmethod
+    def save(self, path: str): ...
+
+    @classmethod
+    @abstractmethod
+    def load(cls, path: str) -> "VectorIndex": ...
+
+    @abstractmethod
+    def __len__(self) -> int: ...
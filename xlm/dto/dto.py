@@ -5,14 +5,33 @@ from pydantic import BaseModel
 
 class FeatureImportance(BaseModel):
     feature: str
-    score: float
+    # None for features that were not evaluated
+    score: Optional[float]
     token_field: Optional[str] = None
+    # unset for the features an explanation with a budget did not score
+    evaluated: bool = True
 
 
 class ExplanationDto(BaseModel):
     explanations: List[FeatureImportance]
     input_text: str
     output_text: Optional[str] = None
+    # set while `GenericExplainer.explain_iter` has not scored all features yet
+    is_partial: bool = False
+
+
+class ExplanationBudget(BaseModel):
+    """
+    Limits of an explanation: at most `max_calls` perturbations are sent to the model,
+    no results are waited for after `deadline` seconds, and the explanation stops once
+    the `top_k` most important features have kept their ranking for `patience`
+    scored features (never if `patience` is None).
+    """
+
+    max_calls: Optional[int] = None
+    deadline: Optional[float] = None
+    top_k: int = 5
+    patience: Optional[int] = 5
 
 
 class ExplanationGranularity(str, Enum):
@@ -32,3 +51,12 @@ class RagOutput(BaseModel):
     prompt: str
     generated_responses: List[str]
     metadata: Dict[str, Any]
+
+
+class IngestProgress(BaseModel):
+    num_passages: int = 0
+    num_duplicates: int = 0
+    num_bytes_read: int = 0
+    total_bytes: Optional[int] = None
+    elapsed_seconds: float = 0.0
+    passages_per_second: float = 0.0
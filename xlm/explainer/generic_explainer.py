@@ -1,13 +1,25 @@
+import re
+import time
 from abc import abstractmethod, ABC
-from typing import List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 
-from xlm.dto.dto import ExplanationGranularity, ExplanationDto, FeatureImportance
+from xlm.dto.dto import (
+    ExplanationBudget,
+    ExplanationGranularity,
+    ExplanationDto,
+    FeatureImportance,
+)
 from xlm.explainer.explainer import Explainer
 from xlm.modules.comparator.comparator import Comparator
 from xlm.modules.perturber.perturber import Perturber
 from xlm.modules.tokenizer.custom_tokenizer import CustomTokenizer
 from xlm.modules.tokenizer.tokenizer import Tokenizer
-from xlm.utils.scores import sort_similarity_scores
+from xlm.utils.pipeline import run_pipeline
+from xlm.utils.scores import normalize_scores, sort_similarity_scores
+
+WORD_PATTERN = re.compile(r"\w+")
+# workers per stage of a pipelined explanation whose model has no thread count
+DEFAULT_NUM_THREADS = 10
 
 
 class GenericExplainer(Explainer):
@@ -16,7 +28,7 @@ class GenericExplainer(Explainer):
         perturber: Perturber,
         comparator: Comparator,
         tokenizer: Tokenizer = CustomTokenizer(),
-        num_threads: Optional[int] = 10,
+        num_threads: Optional[int] = None,
     ):
         self.tokenizer = tokenizer
         self.perturber = perturber
@@ -26,6 +38,14 @@ class GenericExplainer(Explainer):
     @abstractmethod
     def get_reference(self, input_text: str): ...
 
+    def get_num_threads(self) -> int:
+        """
+        Workers per stage of a pipelined explanation: `num_threads` if it is set,
+        otherwise explainers take it from their model, so that the explainer can
+        keep as many requests in flight as the model sends.
+        """
+        return self.num_threads or DEFAULT_NUM_THREADS
+
     @abstractmethod
     def get_features(
         self,
@@ -54,6 +74,41 @@ class GenericExplainer(Explainer):
         do_normalize_scores: bool,
     ): ...
 
+    def get_post_perturbation_results_batch(
+        self, input_texts: List[str], perturbations: List[List[str]]
+    ) -> List[List[str] | List[float]]:
+        """
+        Results of the perturbations of several inputs. Explainers that can send the
+        perturbations of all inputs to the model at once override this.
+        """
+        return [
+            self.get_post_perturbation_results(
+                input_text=input_text, perturbations=input_perturbations
+            )
+            for input_text, input_perturbations in zip(input_texts, perturbations)
+        ]
+
+    def get_comparator_scores_batch(
+        self,
+        reference_texts: List[str],
+        reference_scores: List[float],
+        results: List[List[str] | List[float]],
+        do_normalize_scores: bool,
+    ) -> List[List[float]]:
+        return [
+            self.get_comparator_scores(
+                reference_text=reference_text,
+                reference_score=reference_score,
+                results=input_results,
+                do_normalize_scores=do_normalize_scores,
+            )
+            if len(input_results)
+            else []
+            for reference_text, reference_score, input_results in zip(
+                reference_texts, reference_scores, results
+            )
+        ]
+
     def explain(
         self,
         user_input: str,
@@ -62,7 +117,22 @@ class GenericExplainer(Explainer):
         do_normalize_comparator_scores: bool = True,
         reference_text: Optional[str] = None,
         reference_score: Optional[str] = None,
+        pipelined: bool = False,
+        budget: Optional[ExplanationBudget] = None,
     ) -> ExplanationDto:
+        """
+        With `pipelined`, every feature is perturbed, sent to the model and compared on
+        its own: a perturbation goes to the model as soon as it exists and a response
+        to the comparator as soon as it returns, with up to `get_num_threads()`
+        requests in flight per stage. This overlaps the stages instead of waiting for
+        the slowest request of each, but gives up the batching of the model calls.
+
+        A `budget` implies `pipelined`. The features are scored in the order of
+        `get_feature_priorities` until the budget is used up. The others follow the
+        ranked features without a score and with `evaluated` unset, and `is_partial`
+        is set.
+        """
+        start_time = time.monotonic()
         features = self.get_features(
             input_text=user_input,
             reference_text=reference_text,
@@ -70,6 +140,29 @@ class GenericExplainer(Explainer):
             granularity=granularity,
         )
 
+        if budget is not None:
+            return self.__explain_with_budget(
+                input_text=user_input,
+                reference_text=reference_text,
+                reference_score=reference_score,
+                features=features,
+                budget=budget,
+                do_normalize_scores=do_normalize_comparator_scores,
+                start_time=start_time,
+            )
+
+        if pipelined:
+            scores = self.__get_pipelined_scores(
+                input_text=user_input,
+                reference_text=reference_text,
+                reference_score=reference_score,
+                features=features,
+                do_normalize_scores=do_normalize_comparator_scores,
+            )
+            return self.__get_explanation_dto(
+                features=features, scores=scores, input_text=user_input
+            )
+
         perturbations = self.get_perturbations(
             input_text=user_input,
             reference_text=reference_text,
@@ -97,12 +190,269 @@ class GenericExplainer(Explainer):
 
         return explanation_dto
 
+    def get_feature_priorities(
+        self, input_text: str, reference_text: Optional[str], features: List[str]
+    ) -> List[float]:
+        """
+        Priorities of the features for explanations with a budget, the highest are
+        scored first and ties keep the order of the features. By default, the number
+        of distinct words a feature shares with the input and the reference text, so
+        longer features and features that also occur in the other text come first.
+        """
+        input_words = set(WORD_PATTERN.findall(input_text.lower()))
+        reference_words = set(WORD_PATTERN.findall((reference_text or "").lower()))
+        priorities = []
+        for feature in features:
+            words = set(WORD_PATTERN.findall(feature.lower()))
+            priorities.append(len(words & input_words) + len(words & reference_words))
+        return priorities
+
+    def explain_iter(
+        self,
+        user_input: str,
+        granularity: ExplanationGranularity,
+        do_normalize_comparator_scores: bool = True,
+        reference_text: Optional[str] = None,
+        reference_score: Optional[float] = None,
+    ) -> Iterator[ExplanationDto]:
+        """
+        Explains like `explain` with `pipelined`, but yields a partial explanation of
+        the features scored so far every time a perturbation has been compared. The
+        scores of a partial explanation are only normalized over its own features.
+
+        Returns
+        -------
+        Iterator[ExplanationDto] Partial explanations, with `is_partial` set, followed
+        by the explanation of all features.
+        """
+        features = self.get_features(
+            input_text=user_input,
+            reference_text=reference_text,
+            reference_score=reference_score,
+            granularity=granularity,
+        )
+
+        scores = {}
+        for idx, score in self.__iter_pipelined_scores(
+            input_text=user_input,
+            reference_text=reference_text,
+            reference_score=reference_score,
+            features=features,
+        ):
+            scores[idx] = score
+            if len(scores) == len(features):
+                break
+            yield self.__get_explanation_dto(
+                features=[features[i] for i in scores],
+                scores=self.__normalize_scores(
+                    scores=list(scores.values()),
+                    do_normalize_scores=do_normalize_comparator_scores,
+                ),
+                input_text=user_input,
+                is_partial=True,
+            )
+
+        yield self.__get_explanation_dto(
+            features=features,
+            scores=self.__normalize_scores(
+                scores=[scores[idx] for idx in range(len(features))],
+                do_normalize_scores=do_normalize_comparator_scores,
+            ),
+            input_text=user_input,
+        )
+
+    def explain_batch(
+        self,
+        user_inputs: List[str],
+        granularity: ExplanationGranularity,
+        do_normalize_comparator_scores: bool = True,
+        reference_texts: Optional[List[str]] = None,
+        reference_scores: Optional[List[float]] = None,
+    ) -> List[ExplanationDto]:
+        """
+        Explains several inputs like `explain`, but the perturbations of all inputs
+        are sent to the model and to the comparator together, which keeps their
+        batches full, and the results are scattered back to their inputs.
+
+        Returns
+        -------
+        List[ExplanationDto] The explanation of every input, in order.
+        """
+        reference_texts = reference_texts or [None] * len(user_inputs)
+        reference_scores = reference_scores or [None] * len(user_inputs)
+
+        features = [
+            self.get_features(
+                input_text=user_input,
+                reference_text=reference_text,
+                reference_score=reference_score,
+                granularity=granularity,
+            )
+            for user_input, reference_text, reference_score in zip(
+                user_inputs, reference_texts, reference_scores
+            )
+        ]
+
+        perturbations = [
+            self.get_perturbations(
+                input_text=user_input,
+                reference_text=reference_text,
+                features=input_features,
+            )
+            for user_input, reference_text, input_features in zip(
+                user_inputs, reference_texts, features
+            )
+        ]
+
+        responses = self.get_post_perturbation_results_batch(
+            input_texts=user_inputs, perturbations=perturbations
+        )
+
+        scores = self.get_comparator_scores_batch(
+            reference_texts=reference_texts,
+            reference_scores=reference_scores,
+            results=responses,
+            do_normalize_scores=do_normalize_comparator_scores,
+        )
+
+        return [
+            self.__get_explanation_dto(
+                features=input_features, scores=input_scores, input_text=user_input
+            )
+            for user_input, input_features, input_scores in zip(
+                user_inputs, features, scores
+            )
+        ]
+
+    def __explain_with_budget(
+        self,
+        input_text: str,
+        reference_text: str,
+        reference_score: float,
+        features: List[str],
+        budget: ExplanationBudget,
+        do_normalize_scores: bool,
+        start_time: float,
+    ) -> ExplanationDto:
+        priorities = self.get_feature_priorities(
+            input_text=input_text, reference_text=reference_text, features=features
+        )
+        order = sorted(range(len(features)), key=lambda idx: -priorities[idx])
+        if budget.max_calls is not None:
+            order = order[: budget.max_calls]
+
+        scores: Dict[int, float] = {}
+        top_features, num_unchanged = None, 0
+        iterator = self.__iter_pipelined_scores(
+            input_text=input_text,
+            reference_text=reference_text,
+            reference_score=reference_score,
+            features=[features[idx] for idx in order],
+            deadline=None if budget.deadline is None else start_time + budget.deadline,
+        )
+        try:
+            for position, score in iterator:
+                scores[order[position]] = score
+                if budget.patience is None or len(scores) < budget.top_k:
+                    continue
+                # the highest scores are the most important features, as highlighted
+                # by the Visualizer
+                ranking = sorted(scores, key=scores.get, reverse=True)[: budget.top_k]
+                num_unchanged = num_unchanged + 1 if ranking == top_features else 0
+                top_features = ranking
+                if num_unchanged >= budget.patience:
+                    break
+        finally:
+            # stops the requests that are still queued
+            iterator.close()
+
+        explanation_dto = self.__get_explanation_dto(
+            features=[features[idx] for idx in scores],
+            scores=self.__normalize_scores(
+                scores=list(scores.values()), do_normalize_scores=do_normalize_scores
+            ),
+            input_text=input_text,
+            is_partial=len(scores) < len(features),
+        )
+        # unknown rather than unimportant, so they are not ranked
+        explanation_dto.explanations.extend(
+            FeatureImportance(feature=feature, score=None, evaluated=False)
+            for idx, feature in enumerate(features)
+            if idx not in scores
+        )
+        return explanation_dto
+
+    def __get_pipelined_scores(
+        self,
+        input_text: str,
+        reference_text: str,
+        reference_score: float,
+        features: List[str],
+        do_normalize_scores: bool,
+    ) -> List[float]:
+        scores = [0.0] * len(features)
+        for idx, score in self.__iter_pipelined_scores(
+            input_text=input_text,
+            reference_text=reference_text,
+            reference_score=reference_score,
+            features=features,
+        ):
+            scores[idx] = score
+        return self.__normalize_scores(
+            scores=scores, do_normalize_scores=do_normalize_scores
+        )
+
+    def __iter_pipelined_scores(
+        self,
+        input_text: str,
+        reference_text: str,
+        reference_score: float,
+        features: List[str],
+        deadline: Optional[float] = None,
+    ) -> Iterator[Tuple[int, float]]:
+        def perturb(feature: str) -> str:
+            return self.get_perturbations(
+                input_text=input_text, reference_text=reference_text, features=[feature]
+            )[0]
+
+        def get_result(perturbation: str) -> str | float:
+            return self.get_post_perturbation_results(
+                input_text=input_text, perturbations=[perturbation]
+            )[0]
+
+        def compare(result: str | float) -> float:
+            # normalized over all features by `__normalize_scores`
+            return self.get_comparator_scores(
+                reference_text=reference_text,
+                reference_score=reference_score,
+                results=[result],
+                do_normalize_scores=False,
+            )[0]
+
+        num_workers = self.get_num_threads()
+        yield from run_pipeline(
+            items=features,
+            stages=[(perturb, 1), (get_result, num_workers), (compare, num_workers)],
+            queue_size=2 * num_workers,
+            deadline=deadline,
+        )
+
+    def __normalize_scores(
+        self, scores: List[float], do_normalize_scores: bool
+    ) -> List[float]:
+        # the comparators reverse normalized similarities, which is the same as
+        # normalizing the reversed ones
+        if not do_normalize_scores or not scores:
+            return scores
+        return [float(score) for score in normalize_scores(scores=scores)]
+
     def __get_explanation_dto(
         self,
         features: List[str],
         scores: List[float],
         input_text: str,
         output_text: str = None,
+        is_partial: bool = False,
     ) -> ExplanationDto:
         features, scores = self.__sort_scores(features, scores)
         return ExplanationDto(
@@ -112,6 +462,7 @@ class GenericExplainer(Explainer):
             ],
             input_text=input_text,
             output_text=output_text,
+            is_partial=is_partial,
         )
 
     def __sort_scores(
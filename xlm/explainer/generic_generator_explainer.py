@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 
 from xlm.components.generator.generator import Generator
 from xlm.dto.dto import ExplanationGranularity
@@ -7,6 +7,7 @@ from xlm.modules.comparator.comparator import Comparator
 from xlm.modules.perturber.perturber import Perturber
 from xlm.modules.tokenizer.custom_tokenizer import CustomTokenizer
 from xlm.modules.tokenizer.tokenizer import Tokenizer
+from xlm.utils.batching import flatten, unflatten
 
 
 class GenericGeneratorExplainer(GenericExplainer):
@@ -16,12 +17,21 @@ class GenericGeneratorExplainer(GenericExplainer):
         comparator: Comparator,
         generator: Generator,
         tokenizer: Tokenizer = CustomTokenizer(),
+        num_threads: Optional[int] = None,
     ):
         super().__init__(
-            tokenizer=tokenizer, perturber=perturber, comparator=comparator
+            tokenizer=tokenizer,
+            perturber=perturber,
+            comparator=comparator,
+            num_threads=num_threads,
         )
         self.generator = generator
 
+    def get_num_threads(self) -> int:
+        return self.num_threads or getattr(
+            self.generator, "num_threads", super().get_num_threads()
+        )
+
     def get_features(
         self,
         input_text: str,
@@ -53,6 +63,31 @@ class GenericGeneratorExplainer(GenericExplainer):
         responses = self.generator.generate(texts=perturbations)
         return responses
 
+    def get_post_perturbation_results_batch(
+        self, input_texts: List[str], perturbations: List[List[str]]
+    ) -> List[List[str]]:
+        # one generate call for the perturbations of all inputs
+        flat_perturbations, sizes = flatten(perturbations)
+        responses = (
+            self.generator.generate(texts=flat_perturbations)
+            if flat_perturbations
+            else []
+        )
+        return unflatten(responses, sizes)
+
+    def get_comparator_scores_batch(
+        self,
+        reference_texts: List[str],
+        reference_scores: List[float],
+        results: List[List[str]],
+        do_normalize_scores: bool,
+    ) -> List[List[float]]:
+        return self.comparator.compare_batch(
+            reference_texts=reference_texts,
+            texts=results,
+            do_normalize_scores=do_normalize_scores,
+        )
+
     def get_comparator_scores(
         self,
         reference_text: str,
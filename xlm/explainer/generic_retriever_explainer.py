@@ -1,5 +1,10 @@
-from typing import List, Tuple
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
 
+import numpy as np
+
+from xlm.components.client.single_flight import SingleFlight
+from xlm.components.encoder.encoder import ENCODER_ERRORS
 from xlm.components.retriever.retriever import Retriever
 from xlm.dto.dto import ExplanationGranularity
 from xlm.explainer.generic_explainer import GenericExplainer
@@ -8,6 +13,9 @@ from xlm.modules.perturber.perturber import Perturber
 from xlm.modules.tokenizer.custom_tokenizer import CustomTokenizer
 from xlm.modules.tokenizer.tokenizer import Tokenizer
 
+# number of queries whose embeddings are kept
+QUERY_CACHE_SIZE = 32
+
 
 class GenericRetrieverExplainer(GenericExplainer):
     def __init__(
@@ -16,11 +24,18 @@ class GenericRetrieverExplainer(GenericExplainer):
         comparator: Comparator,
         retriever: Retriever,
         tokenizer: Tokenizer = CustomTokenizer(),
+        num_threads: Optional[int] = None,
     ):
         super().__init__(
-            tokenizer=tokenizer, perturber=perturber, comparator=comparator
+            tokenizer=tokenizer,
+            perturber=perturber,
+            comparator=comparator,
+            num_threads=num_threads,
         )
         self.retriever = retriever
+        self.__query_embeddings: Dict[str, np.ndarray] = {}
+        self.__lock = Lock()
+        self.__single_flight = SingleFlight()
 
     def get_features(
         self,
@@ -45,25 +60,26 @@ class GenericRetrieverExplainer(GenericExplainer):
         retrieved_documents, reference_scores = self.retriever.retrieve(
             text=input_text, top_k=3, return_scores=True
         )
+        if not retrieved_documents:
+            raise ValueError(f"No document was retrieved for: {input_text}")
         return retrieved_documents[0], reference_scores[0]
 
     def get_post_perturbation_results(self, input_text: str, perturbations: List[str]):
-        perturbed_document_embeddings = self.retriever.encoder.encode(
-            texts=perturbations
+        # scored in the order of the perturbations, the retriever's corpus is not
+        # touched, so concurrent explanations and RAG queries do not interfere
+        return self.retriever.score_documents(
+            text=input_text,
+            documents=perturbations,
+            query_embeddings=self.__get_query_embeddings(input_text=input_text),
         )
-        self.retriever.corpus_embeddings = perturbed_document_embeddings
-        self.retriever.corpus_documents = perturbations
 
-        retrieved_perturbed_documents, scores_with_perturbed_documents = (
-            self.retriever.retrieve(
-                text=input_text,
-                top_k=len(self.retriever.corpus_documents),
-                return_scores=True,
-            )
+    def get_post_perturbation_results_batch(
+        self, input_texts: List[str], perturbations: List[List[str]]
+    ) -> List[List[float]]:
+        return self.retriever.score_documents_batch(
+            texts=input_texts, documents=perturbations
         )
 
-        return scores_with_perturbed_documents
-
     def get_comparator_scores(
         self,
         reference_text: str,
@@ -77,3 +93,27 @@ class GenericRetrieverExplainer(GenericExplainer):
             do_normalize_scores=do_normalize_scores,
         )
         return scores
+
+    def __get_query_embeddings(self, input_text: str) -> Optional[np.ndarray]:
+        # encoded once per query instead of with every call of `score_documents`,
+        # which the pipelined explanation makes for every perturbation
+        encoder = getattr(self.retriever, "encoder", None)
+        if encoder is None:
+            return None
+        with self.__lock:
+            if input_text in self.__query_embeddings:
+                return self.__query_embeddings[input_text]
+        # encoded without holding the lock, so other queries are not held up by the
+        # round trip, concurrent callers with the same query share one request
+        try:
+            query_embeddings = self.__single_flight.do(
+                key=input_text, fn=lambda: encoder.encode_array(texts=[input_text])
+            )
+        except ENCODER_ERRORS:
+            # the retriever handles the error, e.g. by falling back to BM25
+            return None
+        with self.__lock:
+            if len(self.__query_embeddings) >= QUERY_CACHE_SIZE:
+                self.__query_embeddings.pop(next(iter(self.__query_embeddings)))
+            self.__query_embeddings[input_text] = query_embeddings
+        return query_embeddings
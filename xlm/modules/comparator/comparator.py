@@ -13,3 +13,28 @@ class Comparator(ABC):
         List[float] Scores between 0 and 1. The higher the score, the more the sentences differ.
         """
         ...
+
+    def compare_batch(
+        self,
+        reference_texts: List[str],
+        texts: List[List[str]],
+        do_normalize_scores: bool = True,
+    ) -> List[List[float]]:
+        """
+        Compares every list of `texts` with its reference text. Comparators that
+        can compare all texts at once override this.
+
+        Returns
+        -------
+        List[List[float]] The result of `compare` for every reference text.
+        """
+        return [
+            self.compare(
+                reference_text=reference_text,
+                texts=group,
+                do_normalize_scores=do_normalize_scores,
+            )
+            if group
+            else []
+            for reference_text, group in zip(reference_texts, texts)
+        ]
@@ -1,7 +1,10 @@
 from typing import List
-from scipy import spatial
+
+import numpy as np
+
 from xlm.modules.comparator.comparator import Comparator
 from xlm.components.encoder.encoder import Encoder
+from xlm.utils.batching import flatten, unflatten
 from xlm.utils.scores import normalize_scores, reverse_scores
 
 
@@ -16,16 +19,41 @@ class EmbeddingComparator(Comparator):
     def compare(
         self, reference_text: str, texts: List[str], do_normalize_scores: bool = True
     ) -> List[float]:
-        embeddings = self.__encoder.encode(texts=texts + [reference_text])
-        vectors: List[List[float]] = embeddings[:-1]
-        ref_vector: List[float] = embeddings[-1]
-        scores = []
-        for vector in vectors:
-            scores.append(self.__get_cosine_similarity(x=vector, y=ref_vector))
+        embeddings = self.__encoder.encode_array(texts=texts + [reference_text])
+        vectors: np.ndarray = embeddings[:-1]
+        ref_vector: np.ndarray = embeddings[-1]
+        scores = self.__get_cosine_similarities(x=vectors, y=ref_vector).tolist()
         if do_normalize_scores:
             scores = normalize_scores(scores=scores)
         scores = reverse_scores(scores=scores)
         return scores
 
-    def __get_cosine_similarity(self, x: List[float], y: List[float]):
-        return 1 - spatial.distance.cosine(x, y)
+    def compare_batch(
+        self,
+        reference_texts: List[str],
+        texts: List[List[str]],
+        do_normalize_scores: bool = True,
+    ) -> List[List[float]]:
+        # one encoder call for the texts and reference texts of all groups
+        flat_texts, sizes = flatten(texts)
+        embeddings = self.__encoder.encode_array(texts=flat_texts + reference_texts)
+        vectors = unflatten(embeddings[: len(flat_texts)], sizes)
+        ref_vectors = embeddings[len(flat_texts) :]
+
+        results = []
+        for group_vectors, ref_vector in zip(vectors, ref_vectors):
+            if not group_vectors:
+                results.append([])
+                continue
+            scores = self.__get_cosine_similarities(
+                x=np.stack(group_vectors), y=ref_vector
+            ).tolist()
+            if do_normalize_scores:
+                scores = normalize_scores(scores=scores)
+            results.append(reverse_scores(scores=scores))
+        return results
+
+    def __get_cosine_similarities(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        x = x.astype(np.float64)
+        y = y.astype(np.float64)
+        return (x @ y) / (np.linalg.norm(x, axis=1) * np.linalg.norm(y))
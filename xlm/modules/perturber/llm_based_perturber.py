@@ -1,5 +1,5 @@
-from typing import List
-from requests import Session
+from typing import List, Optional, Union
+from xlm.components.client.lms_client import LMSClient
 from xlm.components.generator.llm_generator import LLMGenerator
 from xlm.modules.perturber.perturber import Perturber
 from xlm.registry import DEFAULT_LMS_ENDPOINT
@@ -10,11 +10,12 @@ class LLMBasedPerturber(Perturber):
         self,
         template_path: str,
         model_name: str = "gpt-3.5-turbo",
-        endpoint: str = DEFAULT_LMS_ENDPOINT,
+        endpoint: Union[str, List[str]] = DEFAULT_LMS_ENDPOINT,
+        client: Optional[LMSClient] = None,
     ):
         self.__model_name = model_name
         self.__generator = LLMGenerator(
-            session=Session(), endpoint=endpoint, model_name=model_name
+            client=client, endpoint=endpoint, model_name=model_name
         )
         self.__prompt_template = self.__read_prompt_template(path=template_path)
 
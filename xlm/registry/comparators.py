@@ -1,4 +1,3 @@
-from requests import Session
 from xlm.modules.comparator.embedding_comparator import EmbeddingComparator
 from xlm.modules.comparator.generic_comparator import (
     LevenshteinComparator,
@@ -6,6 +5,7 @@ from xlm.modules.comparator.generic_comparator import (
 )
 from xlm.modules.comparator.n_gram_overlap_comparator import NGramOverlapComparator
 from xlm.modules.comparator.score_comaprator import ScoreComparator
+from xlm.components.encoder.embedding_cache import EmbeddingCache
 from xlm.components.encoder.encoder import Encoder
 from xlm.registry import DEFAULT_LMS_ENDPOINT
 from xlm.registry.encoder import load_encoder
@@ -17,7 +17,7 @@ sentence_transformers_based_comparator = EmbeddingComparator(
     encoder=Encoder(
         model_name="sentence-transformers",
         endpoint=DEFAULT_LMS_ENDPOINT,
-        session=Session(),
+        cache=EmbeddingCache(),
     )
 )
 score_comparator = ScoreComparator()
@@ -1,9 +1,24 @@
+from typing import List, Optional, Union
+
+from xlm.components.client.lms_client import LMSClient
+from xlm.components.encoder.embedding_cache import EmbeddingCache
 from xlm.components.encoder.encoder import Encoder
 from xlm.registry import DEFAULT_LMS_ENDPOINT
 
 
-def load_encoder(model_name: str, endpoint: str = DEFAULT_LMS_ENDPOINT):
+def load_encoder(
+    model_name: str,
+    endpoint: Union[str, List[str]] = DEFAULT_LMS_ENDPOINT,
+    max_batch_size: Optional[int] = 64,
+    max_tokens_per_batch: Optional[int] = None,
+    cache_path: Optional[str] = None,
+    client: Optional[LMSClient] = None,
+):
     return Encoder(
         model_name=model_name,
         endpoint=endpoint,
+        max_batch_size=max_batch_size,
+        max_tokens_per_batch=max_tokens_per_batch,
+        cache=EmbeddingCache(path=cache_path),
+        client=client,
     )
@@ -1,5 +1,3 @@
-from requests import Session
-
 # from xlm.explainer.aleph_alpha_explainer import AlephAlphaExplainer
 from xlm.explainer.explainer import Explainer
 from xlm.explainer.generic_explainer import GenericExplainer
@@ -22,8 +20,12 @@ def load_explainer(
     model_name: str,
     comparator_name: str,
     lms_endpoint: str = DEFAULT_LMS_ENDPOINT,
+    num_threads: int = 64,
 ) -> Explainer:
-    generator = LLMGenerator(session=Session(), endpoint=lms_endpoint)
+    # the explainer keeps as many perturbations in flight as the generator sends
+    generator = LLMGenerator(
+        endpoint=lms_endpoint, model_name=model_name, num_threads=num_threads
+    )
 
     if explainer_name == "aleph_alpha_explainer":
         # explainer = AlephAlphaExplainer(generator=generator)
@@ -1,12 +1,24 @@
+from typing import List, Optional, Union
+
+from xlm.components.client.lms_client import LMSClient
 from xlm.components.generator.llm_generator import LLMGenerator
+from xlm.components.generator.response_cache import ResponseCache
 from xlm.registry import DEFAULT_LMS_ENDPOINT
 
 
 def load_generator(
     generator_model_name: str,
     split_lines: bool,
-    lms_endpoint: str = DEFAULT_LMS_ENDPOINT,
+    lms_endpoint: Union[str, List[str]] = DEFAULT_LMS_ENDPOINT,
+    batch_size: int = 1,
+    cache_path: Optional[str] = None,
+    client: Optional[LMSClient] = None,
 ):
     return LLMGenerator(
-        endpoint=lms_endpoint, model_name=generator_model_name, split_lines=split_lines
+        endpoint=lms_endpoint,
+        model_name=generator_model_name,
+        split_lines=split_lines,
+        batch_size=batch_size,
+        cache=ResponseCache(path=cache_path),
+        client=client,
     )
@@ -1,5 +1,5 @@
 from typing import Dict
-import requests
+from xlm.components.client.lms_client import get_default_client
 from xlm.registry import DEFAULT_LMS_ENDPOINT
 
 
@@ -23,7 +23,7 @@ def get_models_based_on_condition(
     lms_endpoint: str = DEFAULT_LMS_ENDPOINT,
     condition: callable = lambda value: True,
 ) -> Dict[str, str]:
-    response = requests.get(f"{lms_endpoint}/available_models")
+    response = get_default_client().get(url=f"{lms_endpoint}/available_models")
     if response.status_code == 200:
         result = response.json()
         models_dict = {key: key for key, value in result.items() if condition(value)}
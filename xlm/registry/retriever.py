@@ -1,10 +1,83 @@
+from typing import List, Optional, Union
+
+from xlm.components.retriever.corpus_ingest import CorpusIngester
+from xlm.components.retriever.corpus_store import CorpusStore
+from xlm.components.retriever.hybrid_retriever import HybridRetriever
 from xlm.components.retriever.sbert_retriever import SBERTRetriever
+from xlm.components.retriever.sharded_retriever import ShardedRetriever
 from xlm.registry.encoder import load_encoder
 
 
-def load_retriever(encoder_model_name: str, lms_endpoint: str, data_path: str):
-    encoder = load_encoder(model_name=encoder_model_name, endpoint=lms_endpoint)
-    with open(data_path, encoding="utf-8") as f:
-        data = f.readlines()
-    corpus_documents = [item.strip() for item in data if item.strip()]
-    return SBERTRetriever(encoder=encoder, corpus_documents=corpus_documents)
+def load_retriever(
+    encoder_model_name: str,
+    lms_endpoint: Union[str, List[str]],
+    data_path: str,
+    embedding_cache_path: Optional[str] = None,
+    corpus_store_path: Optional[str] = None,
+    max_passage_tokens: int = 192,
+    passage_overlap: int = 32,
+    num_shards: Optional[int] = None,
+    rebuild: bool = False,
+):
+    """
+    Every line of `data_path` is split into passages of at most `max_passage_tokens`
+    tokens. With `corpus_store_path`, the passages are streamed into a store there
+    on the first call and memory-mapped on later calls, as long as neither the
+    encoder, the passage settings nor the size and modification time of `data_path`
+    changed, or until `rebuild` is set. With `num_shards` as well, the store is
+    searched by a pool of worker processes.
+    """
+    encoder = load_encoder(
+        model_name=encoder_model_name,
+        endpoint=lms_endpoint,
+        cache_path=embedding_cache_path,
+    )
+    ingester = CorpusIngester(
+        encoder=encoder, max_tokens=max_passage_tokens, overlap=passage_overlap
+    )
+    if corpus_store_path is None:
+        return SBERTRetriever(
+            encoder=encoder,
+            corpus_documents=ingester.read_passages(data_path=data_path),
+        )
+
+    corpus_store = None
+    if not rebuild and CorpusStore.exists(corpus_store_path):
+        # the source is not read, so that opening the store stays instant
+        corpus_store = CorpusStore(corpus_store_path)
+        if not corpus_store.matches(
+            model_name=encoder.model_name, source_stat=ingester.stat(data_path)
+        ):
+            corpus_store = None
+    if corpus_store is None:
+        corpus_store = ingester.ingest(
+            data_path=data_path, store_path=corpus_store_path
+        )
+
+    if num_shards:
+        return ShardedRetriever(
+            encoder=encoder, corpus_store=corpus_store, num_shards=num_shards
+        )
+    return SBERTRetriever.from_corpus_store(encoder=encoder, corpus_store=corpus_store)
+
+
+def load_hybrid_retriever(
+    encoder_model_name: str,
+    lms_endpoint: Union[str, List[str]],
+    data_path: str,
+    embedding_cache_path: Optional[str] = None,
+    num_candidates: int = 100,
+    dense_weight: float = 0.5,
+):
+    encoder = load_encoder(
+        model_name=encoder_model_name,
+        endpoint=lms_endpoint,
+        cache_path=embedding_cache_path,
+    )
+    ingester = CorpusIngester(encoder=encoder)
+    return HybridRetriever(
+        encoder=encoder,
+        corpus_documents=ingester.read_passages(data_path=data_path),
+        num_candidates=num_candidates,
+        dense_weight=dense_weight,
+    )
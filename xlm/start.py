@@ -25,17 +25,23 @@ if __name__ == "__main__":
     lms_endpoint = "http://localhost:9985"
     # data_path = "data/climate_change.txt"
     data_path = "data/rise_of_ai.txt"
+    embedding_cache_path = ".cache/embeddings.sqlite"
+    response_cache_path = ".cache/responses.sqlite"
+    corpus_store_path = ".cache/corpus/rise_of_ai"
     prompt_template = "Context: {context}\nQuestion: {question}\n\nAnswer:"
 
     retriever = load_retriever(
         encoder_model_name=encoder_model_name,
         lms_endpoint=lms_endpoint,
         data_path=data_path,
+        embedding_cache_path=embedding_cache_path,
+        corpus_store_path=corpus_store_path,
     )
     generator = load_generator(
         generator_model_name=generator_model_name,
         lms_endpoint=lms_endpoint,
         split_lines=False,
+        cache_path=response_cache_path,
     )
     rag_system = load_rag_system(
         retriever=retriever, generator=generator, prompt_template=prompt_template
@@ -1,4 +1,5 @@
-from typing import List, Optional
+import asyncio
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
 
 import gradio as gr
 from gradio.components import Markdown
@@ -106,7 +107,7 @@ class RagExplainerUI:
 
         return demo
 
-    def run(
+    async def run(
         self,
         user_input: str,
         granularity: ExplanationGranularity,
@@ -115,54 +116,23 @@ class RagExplainerUI:
         lower_percentile: str,
         perturber_name: str,
         comparator_name: str,
-    ):
+    ) -> AsyncIterator[Tuple[str, str, str, str, str, str]]:
+        """
+        Yields the outputs again every time an explanation has scored another
+        feature, so that the highlighted texts fill in while the explainers run.
+        """
         if len(user_input) == 0:
             gr.Error("Please provide an input!")
-            return None
-
-        rag_output = self.rag_system.run(user_input=user_input)
-
-        retriever_explanation_granularity = ExplanationGranularity.WORD_LEVEL
-        retriever_explanation_dto = self.retriever_explainer.explain(
-            user_input=user_input,
-            reference_text=rag_output.retrieved_documents[0],
-            reference_score=rag_output.retriever_scores[0],
-            granularity=retriever_explanation_granularity,
-            do_normalize_comparator_scores=True,
-        )
-
-        retriever_explanations_vis = self.__visualize_explanations(
-            text_to_visualize=rag_output.retrieved_documents[0],
-            explanation_dto=retriever_explanation_dto,
-            granularity=retriever_explanation_granularity,
-            upper_percentile=85,
-            middle_percentile=75,
-            lower_percentile=10,
-        )
-
-        generator_explanation_granularity = ExplanationGranularity.SENTENCE_LEVEL
-        generator_explanation_dto = self.generator_explainer.explain(
-            user_input=rag_output.prompt,
-            reference_text=rag_output.generated_responses[0],
-            reference_score=None,
-            granularity=generator_explanation_granularity,
-            do_normalize_comparator_scores=True,
-        )
-
-        generator_explanations_vis = self.__visualize_explanations(
-            text_to_visualize=rag_output.prompt,
-            explanation_dto=generator_explanation_dto,
-            granularity=generator_explanation_granularity,
-            upper_percentile=85,
-            middle_percentile=65,
-            lower_percentile=5,
-        )
+            return
 
+        rag_output = await self.rag_system.arun(user_input=user_input)
         retrieved_document = rag_output.retrieved_documents[0]
         prompt = rag_output.prompt
         generated_response = rag_output.generated_responses[0]
+        retriever_explanations_vis = retrieved_document
+        generator_explanations_vis = prompt
 
-        return (
+        yield (
             user_input,
             retrieved_document,
             prompt,
@@ -171,6 +141,60 @@ class RagExplainerUI:
             generator_explanations_vis,
         )
 
+        retriever_explanation_granularity = ExplanationGranularity.WORD_LEVEL
+        async for retriever_explanation_dto in self.__iterate_in_thread(
+            self.retriever_explainer.explain_iter(
+                user_input=user_input,
+                reference_text=retrieved_document,
+                reference_score=rag_output.retriever_scores[0],
+                granularity=retriever_explanation_granularity,
+                do_normalize_comparator_scores=True,
+            )
+        ):
+            retriever_explanations_vis = self.__visualize_explanations(
+                text_to_visualize=retrieved_document,
+                explanation_dto=retriever_explanation_dto,
+                granularity=retriever_explanation_granularity,
+                upper_percentile=85,
+                middle_percentile=75,
+                lower_percentile=10,
+            )
+            yield (
+                user_input,
+                retrieved_document,
+                prompt,
+                generated_response,
+                retriever_explanations_vis,
+                generator_explanations_vis,
+            )
+
+        generator_explanation_granularity = ExplanationGranularity.SENTENCE_LEVEL
+        async for generator_explanation_dto in self.__iterate_in_thread(
+            self.generator_explainer.explain_iter(
+                user_input=prompt,
+                reference_text=generated_response,
+                reference_score=None,
+                granularity=generator_explanation_granularity,
+                do_normalize_comparator_scores=True,
+            )
+        ):
+            generator_explanations_vis = self.__visualize_explanations(
+                text_to_visualize=prompt,
+                explanation_dto=generator_explanation_dto,
+                granularity=generator_explanation_granularity,
+                upper_percentile=85,
+                middle_percentile=65,
+                lower_percentile=5,
+            )
+            yield (
+                user_input,
+                retrieved_document,
+                prompt,
+                generated_response,
+                retriever_explanations_vis,
+                generator_explanations_vis,
+            )
+
     def get_retriever_explainer(self) -> GenericRetrieverExplainer:
         retriever_perturber = load_perturber(
             perturber_name=self.retriever_perturber_name
@@ -336,6 +360,16 @@ class RagExplainerUI:
             generator_vis,
         )
 
+    async def __iterate_in_thread(
+        self, explanations: Iterator[ExplanationDto]
+    ) -> AsyncIterator[ExplanationDto]:
+        # the explainers are blocking, keep them off the event loop
+        while True:
+            explanation_dto = await asyncio.to_thread(next, explanations, None)
+            if explanation_dto is None:
+                return
+            yield explanation_dto
+
     def __visualize_explanations(
         self,
         text_to_visualize: str,
@@ -345,6 +379,8 @@ class RagExplainerUI:
         middle_percentile: Optional[int] = 75,
         lower_percentile: Optional[int] = 10,
     ) -> str:
+        if not explanation_dto.explanations:
+            return text_to_visualize
         segregator = PercentileBasedCategorizer(
             upper_bound_percentile=upper_percentile,
             middle_bound_percentile=middle_percentile,
@@ -0,0 +1,109 @@
+import asyncio
+import json
+from threading import Lock
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+import aiohttp
+
+
+class AsyncResponse:
+    """
+    Fully read response of an `AsyncHTTPClient` request. Mirrors the parts of
+    `requests.Response` the LMS clients use, so response handling can be shared
+    between the blocking and the asynchronous code paths.
+    """
+
+    def __init__(self, status_code: int, headers: Mapping[str, str], content: bytes):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+
+class AsyncHTTPClient:
+    """
+    Lazily creates one `aiohttp.ClientSession` per event loop and bounds the number
+    of requests in flight with a semaphore, so a single loop can keep many requests
+    outstanding without a thread per request. A session is closed by `close` or
+    when the tasks of its loop are cancelled on shutdown, as `asyncio.run` does.
+    """
+
+    def __init__(self, max_concurrent_requests: int = 64, timeout: float = 300):
+        self.__max_concurrent_requests = max_concurrent_requests
+        self.__timeout = timeout
+        self.__lock = Lock()
+        self.__sessions: Dict[
+            asyncio.AbstractEventLoop,
+            Tuple[aiohttp.ClientSession, asyncio.Semaphore, asyncio.Task],
+        ] = {}
+
+    async def post(
+        self, url: str, params: Optional[Dict[str, Any]] = None, **kwargs
+    ) -> AsyncResponse:
+        session, semaphore = self.__get_session()
+        async with semaphore:
+            async with session.post(
+                url, params=self.__format_params(params), **kwargs
+            ) as response:
+                content = await response.read()
+                return AsyncResponse(
+                    status_code=response.status,
+                    headers=response.headers.copy(),
+                    content=content,
+                )
+
+    async def close(self):
+        """
+        Closes the sessions of all loops. Sessions of other loops are closed when
+        their loop runs next.
+        """
+        loop = asyncio.get_running_loop()
+        with self.__lock:
+            sessions, self.__sessions = self.__sessions, {}
+        for session_loop, (session, _, closer) in sessions.items():
+            if session_loop is loop:
+                closer.cancel()
+                await session.close()
+            elif not session_loop.is_closed():
+                session_loop.call_soon_threadsafe(closer.cancel)
+
+    def __get_session(self) -> Tuple[aiohttp.ClientSession, asyncio.Semaphore]:
+        loop = asyncio.get_running_loop()
+        with self.__lock:
+            if loop not in self.__sessions or self.__sessions[loop][0].closed:
+                # sessions and semaphores are bound to the loop they were created in
+                session = aiohttp.ClientSession(
+                    timeout=aiohttp.ClientTimeout(total=self.__timeout),
+                    connector=aiohttp.TCPConnector(
+                        limit=self.__max_concurrent_requests
+                    ),
+                )
+                self.__sessions[loop] = (
+                    session,
+                    asyncio.Semaphore(self.__max_concurrent_requests),
+                    loop.create_task(self.__close_on_cancel(session)),
+                )
+                # the sessions of closed loops were closed before their loop
+                for closed_loop in [key for key in self.__sessions if key.is_closed()]:
+                    del self.__sessions[closed_loop]
+            session, semaphore, _ = self.__sessions[loop]
+            return session, semaphore
+
+    @staticmethod
+    async def __close_on_cancel(session: aiohttp.ClientSession):
+        # waits until its loop shuts down, a session is bound to the loop it was
+        # created in and cannot be closed once that loop is closed
+        try:
+            await asyncio.get_running_loop().create_future()
+        finally:
+            await session.close()
+
+    def __format_params(self, params: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        # yarl rejects booleans, send them the way requests does
+        return {
+            key: str(value) if isinstance(value, bool) else value
+            for key, value in (params or {}).items()
+            if value is not None
+        }
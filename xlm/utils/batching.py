@@ -0,0 +1,79 @@
+from typing import Callable, List, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+def estimate_num_tokens(text: str) -> int:
+    return max(1, len(text.split()))
+
+
+def make_batches(
+    texts: List[str],
+    max_batch_size: Optional[int] = None,
+    max_tokens_per_batch: Optional[int] = None,
+    length_fn: Callable[[str], int] = estimate_num_tokens,
+) -> List[List[int]]:
+    """
+    Groups the indices of `texts` into batches of similar length. Texts are sorted by
+    their estimated length so that a batch padded to its longest member wastes as
+    little as possible. A batch is closed as soon as adding the next text would exceed
+    `max_batch_size` texts or `max_tokens_per_batch` padded tokens.
+
+    Returns
+    -------
+    List[List[int]] Indices into `texts`, one list per batch.
+    """
+    if not texts:
+        return []
+
+    lengths = [length_fn(text) for text in texts]
+    order = sorted(range(len(texts)), key=lambda idx: lengths[idx])
+
+    batches = []
+    batch = []
+    for idx in order:
+        # texts are sorted ascending, so the new text is the longest of the batch
+        padded_tokens = (len(batch) + 1) * lengths[idx]
+        if batch and (
+            (max_batch_size and len(batch) >= max_batch_size)
+            or (max_tokens_per_batch and padded_tokens > max_tokens_per_batch)
+        ):
+            batches.append(batch)
+            batch = []
+        batch.append(idx)
+    batches.append(batch)
+    return batches
+
+
+def deduplicate(texts: List[str]) -> Tuple[List[str], List[int]]:
+    """
+    Returns
+    -------
+    Tuple[List[str], List[int]] The unique texts in order of first occurrence and, for
+    every input text, the position of its unique text, such that
+    `[unique_texts[idx] for idx in inverse] == texts`.
+    """
+    positions = {}
+    inverse = [positions.setdefault(text, len(positions)) for text in texts]
+    return list(positions), inverse
+
+
+def flatten(groups: List[List[T]]) -> Tuple[List[T], List[int]]:
+    """
+    Returns
+    -------
+    Tuple[List[T], List[int]] The items of all groups in one list and the size of
+    every group, to scatter results back with `unflatten`.
+    """
+    return [item for group in groups for item in group], [
+        len(group) for group in groups
+    ]
+
+
+def unflatten(items: Sequence[T], sizes: List[int]) -> List[List[T]]:
+    groups = []
+    start = 0
+    for size in sizes:
+        groups.append(list(items[start : start + size]))
+        start += size
+    return groups
@@ -0,0 +1,160 @@
+import hashlib
+import os
+import sqlite3
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional
+
+
+def hash_key(*parts: Any) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class CacheStats:
+    def __init__(self):
+        self.__lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hits: int = 0, misses: int = 0):
+        with self.__lock:
+            self.hits += hits
+            self.misses += misses
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hit_rate}
+
+
+class LRUCache:
+    def __init__(self, max_size: int = 10000):
+        self.__max_size = max_size
+        self.__items = OrderedDict()
+        self.__lock = Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self.__lock:
+            if key not in self.__items:
+                return None
+            self.__items.move_to_end(key)
+            return self.__items[key]
+
+    def put(self, key: Hashable, value: Any):
+        with self.__lock:
+            self.__items[key] = value
+            self.__items.move_to_end(key)
+            while len(self.__items) > self.__max_size:
+                self.__items.popitem(last=False)
+
+    def clear(self):
+        with self.__lock:
+            self.__items.clear()
+
+    def __len__(self) -> int:
+        return len(self.__items)
+
+
+class SQLiteCache:
+    """
+    Persistent key-value store backed by a single SQLite file. Values are stored as
+    raw bytes, serialization is left to the caller.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.__lock = Lock()
+        self.__connection = sqlite3.connect(path, check_same_thread=False)
+        with self.__lock:
+            self.__connection.execute("PRAGMA journal_mode=WAL")
+            self.__connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB)"
+            )
+            self.__connection.commit()
+
+    def get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        result = {}
+        # stay below SQLite's limit of host parameters per statement
+        for start in range(0, len(keys), 500):
+            chunk = keys[start : start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            with self.__lock:
+                rows = self.__connection.execute(
+                    f"SELECT key, value FROM cache WHERE key IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+            result.update(rows)
+        return result
+
+    def put_many(self, items: Dict[str, bytes]):
+        with self.__lock:
+            self.__connection.executemany(
+                "INSERT OR REPLACE INTO cache (key, value) VALUES (?, ?)",
+                items.items(),
+            )
+            self.__connection.commit()
+
+    def __len__(self) -> int:
+        with self.__lock:
+            return self.__connection.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+
+class TieredCache:
+    """
+    Two-tier cache: a bounded in-memory LRU in front of an optional on-disk store.
+    Disk hits are promoted to memory. Keys must be strings, values are converted with
+    `serialize` / `deserialize` when they cross the disk boundary.
+    """
+
+    def __init__(
+        self,
+        serialize: Callable[[Any], bytes],
+        deserialize: Callable[[bytes], Any],
+        max_size: int = 10000,
+        path: Optional[str] = None,
+    ):
+        self.__serialize = serialize
+        self.__deserialize = deserialize
+        self.__memory = LRUCache(max_size=max_size)
+        self.__disk = SQLiteCache(path=path) if path else None
+        self.stats = CacheStats()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        missing = []
+        for key in keys:
+            value = self.__memory.get(key)
+            if value is None:
+                missing.append(key)
+            else:
+                found[key] = value
+
+        if missing and self.__disk is not None:
+            for key, raw in self.__disk.get_many(missing).items():
+                value = self.__deserialize(raw)
+                self.__memory.put(key, value)
+                found[key] = value
+
+        self.stats.record(hits=len(found), misses=len(keys) - len(found))
+        return found
+
+    def put_many(self, items: Dict[str, Any]):
+        for key, value in items.items():
+            self.__memory.put(key, value)
+        if self.__disk is not None and items:
+            self.__disk.put_many(
+                {key: self.__serialize(value) for key, value in items.items()}
+            )
+
+    def __len__(self) -> int:
+        return len(self.__memory)
@@ -27,7 +27,15 @@ class PercentileBasedCategorizer(Categorizer):
             self,
             explanations: ExplanationDto,
     ) -> Tuple[List[str], List[str], List[str]]:
-        scores = [explanation.score for explanation in explanations.explanations]
+        # features without a score were not evaluated and are never categorized
+        evaluated = [
+            explanation
+            for explanation in explanations.explanations
+            if explanation.score is not None
+        ]
+        if not evaluated:
+            return [], [], []
+        scores = [explanation.score for explanation in evaluated]
         scores = np.asarray(scores)
         upper_bound = np.percentile(scores, self.__upper_bound_percentile)
         mid_bound = np.percentile(scores, self.__middle_bound_percentile)
@@ -35,17 +43,17 @@ class PercentileBasedCategorizer(Categorizer):
 
         pos_features = [
             explanation.feature
-            for explanation in explanations.explanations
+            for explanation in evaluated
             if explanation.score >= upper_bound and explanation.score != 0
         ]
         mid_features = [
             explanation.feature
-            for explanation in explanations.explanations
+            for explanation in evaluated
             if upper_bound > explanation.score >= mid_bound > 0 and explanation.score != 0
         ]
         low_features = [
             explanation.feature
-            for explanation in explanations.explanations
+            for explanation in evaluated
             if mid_bound > explanation.score >= lower_bound > 0 and explanation.score != 0
         ]
 
@@ -0,0 +1,114 @@
+import time
+from queue import Empty, Full, Queue
+from threading import Event, Lock, Thread
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+# marks the end of the items in a queue
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def run_pipeline(
+    items: Iterable[Any],
+    stages: List[Tuple[Callable[[Any], Any], int]],
+    queue_size: int = 16,
+    deadline: Optional[float] = None,
+) -> Iterator[Tuple[int, Any]]:
+    """
+    Runs every item through `stages`, each a function with its number of worker
+    threads. Stages are connected by queues of at most `queue_size` items, so an item
+    reaches the next stage as soon as it is processed, every stage works while the
+    others do, and a fast stage cannot run far ahead of a slow one. The first error
+    of any stage stops the pipeline and is raised here. Once `deadline`, a
+    `time.monotonic` value, has passed, the iteration ends without the items that are
+    still in the pipeline.
+
+    Returns
+    -------
+    Iterator[Tuple[int, Any]] The position of every item in `items` with the result
+    of the last stage, in the order in which they complete.
+    """
+    stop = Event()
+    queues = [Queue(maxsize=queue_size) for _ in stages] + [Queue(maxsize=queue_size)]
+
+    def put(queue: Queue, item) -> bool:
+        # gives up once the pipeline stops, so that no thread blocks forever
+        while not stop.is_set():
+            try:
+                queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                continue
+        return False
+
+    def feed():
+        try:
+            for idx, item in enumerate(items):
+                if not put(queues[0], (idx, item)):
+                    return
+        except BaseException as e:
+            put(queues[-1], _Failure(e))
+            return
+        for _ in range(stages[0][1]):
+            put(queues[0], _DONE)
+
+    def work(
+        stage_idx: int, fn: Callable[[Any], Any], remaining: List[int], lock: Lock
+    ):
+        inbox, outbox = queues[stage_idx], queues[stage_idx + 1]
+        while not stop.is_set():
+            try:
+                item = inbox.get(timeout=0.1)
+            except Empty:
+                continue
+            if item is _DONE:
+                break
+            idx, value = item
+            try:
+                result = fn(value)
+            except BaseException as e:
+                put(queues[-1], _Failure(e))
+                return
+            if not put(outbox, (idx, result)):
+                return
+        with lock:
+            remaining[0] -= 1
+            is_last = remaining[0] == 0
+        # the last worker of a stage tells the workers of the next one to finish
+        if is_last:
+            num_next_workers = (
+                stages[stage_idx + 1][1] if stage_idx + 1 < len(stages) else 1
+            )
+            for _ in range(num_next_workers):
+                put(outbox, _DONE)
+
+    threads = [Thread(target=feed, daemon=True)]
+    for stage_idx, (fn, num_workers) in enumerate(stages):
+        remaining, lock = [num_workers], Lock()
+        threads.extend(
+            Thread(target=work, args=(stage_idx, fn, remaining, lock), daemon=True)
+            for _ in range(num_workers)
+        )
+    for thread in threads:
+        thread.start()
+
+    try:
+        while True:
+            if deadline is None:
+                item = queues[-1].get()
+            else:
+                try:
+                    item = queues[-1].get(timeout=max(deadline - time.monotonic(), 0))
+                except Empty:
+                    break
+            if item is _DONE:
+                break
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
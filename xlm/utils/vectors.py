@@ -0,0 +1,113 @@
+from typing import List, Tuple
+
+import numpy as np
+
+
+def normalize_rows(embeddings: List[List[float]] | np.ndarray) -> np.ndarray:
+    """
+    Returns
+    -------
+    np.ndarray C-contiguous float32 matrix whose rows have unit L2 norm, so that dot
+    products between normalized rows are cosine similarities. All-zero rows stay zero.
+    """
+    embeddings = np.array(embeddings, dtype=np.float32, order="C")
+    if embeddings.ndim == 1:
+        # a single vector, or an empty list of vectors
+        embeddings = embeddings.reshape((1, -1) if embeddings.size else (0, 0))
+    if embeddings.size == 0:
+        return embeddings
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    np.divide(embeddings, np.maximum(norms, 1e-12), out=embeddings)
+    return embeddings
+
+
+def top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Selects the `k` highest scores of every row in O(n) with `argpartition` and only
+    sorts the selected ones.
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray] Column indices and scores of shape
+    (len(scores), min(k, n)), best first.
+    """
+    scores = np.atleast_2d(scores)
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        empty = np.empty((len(scores), 0))
+        return empty.astype(np.int64), empty.astype(scores.dtype)
+    if k < scores.shape[1]:
+        indices = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        indices = np.broadcast_to(np.arange(k), (len(scores), k))
+    selected = np.take_along_axis(scores, indices, axis=1)
+    order = np.argsort(-selected, axis=1, kind="stable")
+    return (
+        np.take_along_axis(indices, order, axis=1),
+        np.take_along_axis(selected, order, axis=1),
+    )
+
+
+def kmeans(
+    vectors: np.ndarray,
+    num_clusters: int,
+    num_iterations: int = 20,
+    spherical: bool = False,
+    seed: int = 0,
+    chunk_size: int = 65536,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Lloyd's k-means. With `spherical`, vectors are assigned by the largest dot product
+    and centroids are re-normalized, which clusters unit vectors by cosine similarity.
+    Empty clusters are re-seeded with random vectors.
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray] The float32 centroids of shape
+    (num_clusters, dimension) and the cluster of every vector.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    num_clusters = min(num_clusters, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), num_clusters, replace=False)].copy()
+
+    for _ in range(num_iterations):
+        assignments = assign_clusters(
+            vectors, centroids, spherical=spherical, chunk_size=chunk_size
+        )
+        counts = np.bincount(assignments, minlength=num_clusters)
+        empty = counts == 0
+        # sum up every cluster as one contiguous run of the vectors sorted by cluster
+        starts = (np.cumsum(counts) - counts)[~empty]
+        sorted_vectors = vectors[np.argsort(assignments, kind="stable")]
+        sums = np.add.reduceat(sorted_vectors, starts, axis=0)
+        centroids[~empty] = sums / counts[~empty, None]
+        centroids[empty] = vectors[rng.choice(len(vectors), empty.sum())]
+        if spherical:
+            centroids = normalize_rows(centroids)
+
+    assignments = assign_clusters(
+        vectors, centroids, spherical=spherical, chunk_size=chunk_size
+    )
+    return centroids, assignments
+
+
+def assign_clusters(
+    vectors: np.ndarray,
+    centroids: np.ndarray,
+    spherical: bool = False,
+    chunk_size: int = 65536,
+) -> np.ndarray:
+    """
+    Returns
+    -------
+    np.ndarray The index of the nearest centroid of every vector, computed in chunks
+    of `chunk_size` vectors to bound the memory of the distance matrix.
+    """
+    # ||x - c||^2 = ||x||^2 - 2 x.c + ||c||^2, the first term is the same for all c
+    offsets = 0 if spherical else -0.5 * np.einsum("ij,ij->i", centroids, centroids)
+    assignments = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), chunk_size):
+        scores = vectors[start : start + chunk_size] @ centroids.T + offsets
+        assignments[start : start + chunk_size] = np.argmax(scores, axis=1)
+    return assignments
@@ -6,6 +6,7 @@ from xlm.dto.dto import ExplanationDto, ExplanationGranularity
 UPPER_COLOR = "#D4EFDF"  # green
 MID_COLOR = "#FBFBB8BF"  # amber
 LOW_COLOR = "black"
+NOT_EVALUATED_COLOR = "#9E9E9E"  # grey
 
 
 class Visualizer:
@@ -35,6 +36,23 @@ class Visualizer:
             low_features = []
 
         for explanation in explanations.explanations:
+            if not explanation.evaluated:
+                # unknown rather than unimportant, e.g. beyond the budget
+                token_str = (
+                    '<span title="not evaluated"style="font-style:italic;color:'
+                    + NOT_EVALUATED_COLOR
+                    + '">'
+                    + explanation.feature
+                    + "</span>"
+                )
+                highlighted_text = self.__highlight(
+                    text=highlighted_text,
+                    feature=explanation.feature,
+                    token_str=token_str,
+                    granularity=granularity,
+                )
+                continue
+
             score = round(explanation.score, 2)
 
             if score == 0:
@@ -71,13 +89,12 @@ class Visualizer:
                     + "</span>"
                 )
 
-            if granularity == ExplanationGranularity.WORD_LEVEL:
-                pattern = (
-                    r"\b" + re.escape(explanation.feature) + r"\b"
-                )  # needed to separate word boundaries
-            else:
-                pattern = re.escape(explanation.feature)
-            highlighted_text = re.sub(pattern, token_str, highlighted_text)
+            highlighted_text = self.__highlight(
+                text=highlighted_text,
+                feature=explanation.feature,
+                token_str=token_str,
+                granularity=granularity,
+            )
 
         if avoid_exp_label:
             vis = "<p>" + highlighted_text + "</p>"
@@ -88,12 +105,16 @@ class Visualizer:
         if avoid_legend:
             html_str = vis
         else:
-            legend = self.build_legend()
+            legend = self.build_legend(
+                show_not_evaluated=not all(
+                    explanation.evaluated for explanation in explanations.explanations
+                )
+            )
             html_str = legend + vis
 
         return html_str
 
-    def build_legend(self):
+    def build_legend(self, show_not_evaluated: bool = False):
         legend = "<p align='right'"
         legend += (
             '<span title="' + '"style="color:' + LOW_COLOR + '">' + "💡" + "</span>"
@@ -125,5 +146,30 @@ class Visualizer:
             + " very important "
             + "</span>"
         )
+        if show_not_evaluated:
+            legend += "&emsp;"
+            legend += (
+                '<span title="'
+                + '"style="font-style:italic;color:'
+                + NOT_EVALUATED_COLOR
+                + '">'
+                + "not evaluated"
+                + "</span>"
+            )
         legend += "</p>"
         return legend
+
+    def __highlight(
+        self,
+        text: str,
+        feature: str,
+        token_str: str,
+        granularity: ExplanationGranularity,
+    ) -> str:
+        if granularity == ExplanationGranularity.WORD_LEVEL:
+            pattern = (
+                r"\b" + re.escape(feature) + r"\b"
+            )  # needed to separate word boundaries
+        else:
+            pattern = re.escape(feature)
+        return re.sub(pattern, token_str, text)